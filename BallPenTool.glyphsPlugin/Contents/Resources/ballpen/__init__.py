@@ -0,0 +1,6 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — fonctions de calcul indépendantes de Glyphs
+#
+###########################################################################################################
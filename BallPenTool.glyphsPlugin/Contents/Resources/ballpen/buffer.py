@@ -0,0 +1,98 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — tampon de capture des échantillons (mouseDown_ / mouseDragged_)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+from array import array
+from ballpen.core import Point
+
+# Colonnes float64 préallouées, agrandies par doublement : un échantillon
+# accepté coûte quelques écritures dans des tableaux au lieu d'un objet Python
+# par point. Le tampon est vidé (pas libéré) entre deux tracés.
+#
+# `version` change à chaque modification et n'est jamais remis à zéro : avec
+# le lissage et l'épaisseur, il suffit à reconnaître un état déjà dessiné
+# (aperçu mémorisé dans plugin.py), même quand seul le dernier point bouge.
+DEFAULT_CAPACITY = 1024
+
+
+def _zeros(count):
+    return array("d", bytes(8 * count))
+
+
+class StrokeBuffer(object):
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, pressures=False, times=False):
+        self._capacity = max(1, capacity)
+        self._count = 0
+        self.version = 0
+        self._xs = _zeros(self._capacity)
+        self._ys = _zeros(self._capacity)
+        self._pressures = _zeros(self._capacity) if pressures else None
+        self._times = _zeros(self._capacity) if times else None
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        # Accès ponctuel compatible avec une liste de points (.x / .y)
+        if isinstance(index, slice):
+            return [Point(self._xs[i], self._ys[i]) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("StrokeBuffer index out of range")
+        return Point(self._xs[index], self._ys[index])
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield Point(self._xs[i], self._ys[i])
+
+    def _grow(self):
+        extra = self._capacity
+        for column in (self._xs, self._ys, self._pressures, self._times):
+            if column is not None:
+                column.extend(_zeros(extra))
+        self._capacity += extra
+
+    def append(self, x, y, pressure=0.0, time=0.0):
+        i = self._count
+        if i == self._capacity:
+            self._grow()
+        self._xs[i] = x
+        self._ys[i] = y
+        if self._pressures is not None:
+            self._pressures[i] = pressure
+        if self._times is not None:
+            self._times[i] = time
+        self._count = i + 1
+        self.version += 1
+
+    def replace_last(self, x, y, pressure=0.0, time=0.0):
+        # Extrémité flottante de la capture décimée (voir ballpen/decimate.py)
+        i = self._count - 1
+        if i < 0:
+            raise IndexError("replace_last on an empty StrokeBuffer")
+        self._xs[i] = x
+        self._ys[i] = y
+        if self._pressures is not None:
+            self._pressures[i] = pressure
+        if self._times is not None:
+            self._times[i] = time
+        self.version += 1
+
+    def clear(self):
+        self._count = 0
+        self.version += 1
+
+    def coordinates(self):
+        # Copies (memcpy) des colonnes utiles, lisibles par index
+        return self._xs[:self._count], self._ys[:self._count]
+
+    def pressures(self):
+        return self._pressures[:self._count] if self._pressures is not None else None
+
+    def times(self):
+        return self._times[:self._count] if self._times is not None else None
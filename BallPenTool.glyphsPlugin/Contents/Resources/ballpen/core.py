@@ -0,0 +1,681 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — géométrie et pipeline d'ajustement (sans dépendance à Glyphs ni AppKit)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+from array import array
+from collections import namedtuple
+from itertools import chain
+from ballpen.rdp import rdp_indices, rdp_importance
+from ballpen.visvalingam import visvalingam_indices, visvalingam_levels
+from ballpen.schneider import fit_cubics
+# ----------------------------------------------------------
+# Constantes
+# ----------------------------------------------------------
+MIN_SEGMENT_LENGTH = 5.0 # Seuil pour forcer une ligne droite aux extrémités
+PINCH_FACTOR = 0.25      # 25% de la longueur du segment d'ancrage
+NUM_END_POINTS = 5       # Points bruts traités par simplify_ends à chaque extrémité
+VECTORIZED_MIN_POINTS = 64  # En dessous, NumPy coûte plus qu'il ne rapporte
+# Simplificateurs disponibles (préférence de l'outil)
+RDP = "rdp"
+VISVALINGAM = "visvalingam"
+VISVALINGAM_AREA_FACTOR = 4.0  # aire minimale = facteur × epsilon², réglé sur benchmarks/strokes
+# Ajustement des courbes : B-spline (une cubique par point simplifié) ou
+# B-spline recompressée par moindres carrés (le moins de cubiques possible)
+BSPLINE = "bspline"
+LEAST_SQUARES = "least_squares"
+LEAST_SQUARES_TOLERANCE = 0.5  # erreur de l'ajustement = tolérance × epsilon (plus la flèche ci-dessous)
+LEAST_SQUARES_FLATNESS = 0.25  # flèche maximale de l'échantillonnage de la B-spline, en fraction de l'erreur
+# Types de nœuds (mêmes valeurs que GSLINE / GSCURVE / GSOFFCURVE)
+LINE = "line"
+CURVE = "curve"
+OFFCURVE = "offcurve"
+# ----------------------------------------------------------
+# Type de point léger
+# ----------------------------------------------------------
+# Même interface que NSPoint (.x / .y, indexable) : les NSPoint renvoyés par
+# Glyphs peuvent être passés tels quels, et les Point sont acceptés partout
+# où AppKit attend un NSPoint.
+Point = namedtuple("Point", ["x", "y"])
+
+_vectorized = None
+def vectorized_backend():
+    # Import différé : NumPy n'est chargé qu'au premier long tracé
+    global _vectorized
+    if _vectorized is None:
+        try:
+            from ballpen import vectorized
+        except ImportError:
+            vectorized = False
+        _vectorized = vectorized
+    return _vectorized or None
+
+# ----------------------------------------------------------
+# Fonctions utilitaires
+# ----------------------------------------------------------
+def distance(p1, p2):
+    return math.hypot(p2.x - p1.x, p2.y - p1.y)
+def distance_point_segment(p, a, b):
+    x, y = p.x, p.y
+    x1, y1 = a.x, a.y
+    x2, y2 = b.x, b.y
+    dx = x2 - x1
+    dy = y2 - y1
+    if dx == 0 and dy == 0:
+        return math.hypot(x - x1, y - y1)
+    t = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
+    t = max(0.0, min(1.0, t))
+    projx = x1 + t * dx
+    projy = y1 + t * dy
+    return math.hypot(x - projx, y - projy)
+def coordinates(points):
+    # Colonnes x / y : lues directement dans un StrokeBuffer, extraites sinon
+    if hasattr(points, "coordinates"):
+        return points.coordinates()
+    return [p.x for p in points], [p.y for p in points]
+
+def rdp_simplify(points, epsilon):
+    if len(points) < 3:
+        return points[:]
+    xs, ys = coordinates(points)
+    return [points[i] for i in rdp_indices(xs, ys, epsilon)]
+
+def visvalingam_area(simplify_epsilon):
+    # Seuil d'aire correspondant au curseur Lissage : même nombre de nœuds
+    # qu'avec RDP, à peu près, sur le corpus de référence
+    return VISVALINGAM_AREA_FACTOR * simplify_epsilon * simplify_epsilon
+
+def simplify_indices(xs, ys, simplify_epsilon, simplifier=RDP):
+    if simplifier == VISVALINGAM:
+        return visvalingam_indices(xs, ys, visvalingam_area(simplify_epsilon))
+    return rdp_indices(xs, ys, simplify_epsilon)
+
+def simplify_ends_indices(xs, ys, num_points_to_process=5, epsilon_ends=1.0):
+    n = len(xs)
+    if n < 2: return list(range(n))
+    if n <= num_points_to_process * 2: return rdp_indices(xs, ys, epsilon_ends)
+
+    simplified_start = rdp_indices(xs, ys, epsilon_ends, 0, num_points_to_process - 1)
+    simplified_end = rdp_indices(xs, ys, epsilon_ends, n - num_points_to_process, n - 1)
+
+    junction_start_index = len(simplified_start) - 1
+    junction_end_index = n - len(simplified_end)
+
+    kept = []
+    for i in chain(simplified_start, range(junction_start_index, junction_end_index), simplified_end):
+        if not kept or math.hypot(xs[kept[-1]] - xs[i], ys[kept[-1]] - ys[i]) > 0.1: kept.append(i)
+    return kept
+
+def simplify_ends(points, num_points_to_process=5, epsilon_ends=1.0):
+    xs, ys = coordinates(points)
+    return [points[i] for i in simplify_ends_indices(xs, ys, num_points_to_process, epsilon_ends)]
+
+def cleanup_endpoints(points, min_distance=5.0):
+    if len(points) < 3: return points[:]
+    start_point = points[0]
+    end_point = points[-1]
+    cleaned_points = [start_point]
+    for i in range(1, len(points) - 1):
+        p = points[i]
+        if not (distance(p, start_point) < min_distance or distance(p, end_point) < min_distance):
+            cleaned_points.append(p)
+            
+    if distance(cleaned_points[-1], end_point) > 1e-6: cleaned_points.append(end_point)
+    return cleaned_points
+
+def pt_add(a, b): return Point(a.x + b.x, a.y + b.y)
+def pt_sub(a, b): return Point(a.x - b.x, a.y - b.y)
+def pt_mul(a, s): return Point(a.x * s, a.y * s)
+def pt_div(a, s): return Point(a.x / s, a.y / s)
+
+def pt_limit_length(vector, max_length):
+    length = distance(Point(0, 0), vector)
+    if length > max_length and length > 1e-6:
+        return pt_mul(vector, max_length / length)
+    return vector
+
+def make_tangent_symmetric(p_anchor, p_control_out):
+    return pt_sub(pt_mul(p_anchor, 2.0), p_control_out)
+
+def align_tangent(p_anchor, p_control_in, p_control_out, p_original):
+    # Poignée sortante dans le prolongement de la poignée entrante, longueur conservée
+    vector = pt_sub(p_anchor, p_control_in)
+    length = distance(Point(0, 0), vector)
+    if length < 1e-6:
+        return p_control_out
+    return pt_add(p_anchor, pt_mul(vector, distance(p_original, p_control_out) / length))
+
+def b_spline_to_bezier(points):
+    n = len(points)
+    if n < 2: return []
+    if n == 2:
+        p0, p1 = points
+        c1 = pt_add(p0, pt_mul(pt_sub(p1, p0), 1/3))
+        c2 = pt_add(p0, pt_mul(pt_sub(p1, p0), 2/3))
+        return [(p0, c1, c2, p1)]
+    padded = [points[0], points[0]] + points[:] + [points[-1], points[-1]]
+    beziers = []
+    for i in range(len(padded) - 3):
+        beziers.append(b_spline_segment(padded[i], padded[i + 1], padded[i + 2], padded[i + 3]))
+    return [seg for seg in beziers if not is_degenerate_segment(seg)]
+
+def b_spline_segment(P0, P1, P2, P3):
+    Q0 = pt_div(pt_add(pt_add(P0, pt_mul(P1, 4.0)), P2), 6.0)
+    Q1 = pt_div(pt_add(pt_mul(P1, 4.0), pt_mul(P2, 2.0)), 6.0)
+    Q2 = pt_div(pt_add(pt_mul(P1, 2.0), pt_mul(P2, 4.0)), 6.0)
+    Q3 = pt_div(pt_add(pt_add(P1, pt_mul(P2, 4.0)), P3), 6.0)
+    return (Q0, Q1, Q2, Q3)
+
+def least_squares_to_bezier(beziers, error):
+    # La B-spline lisse déjà le bruit de la tablette : elle est échantillonnée
+    # puis réajustée avec le moins de cubiques possible (Schneider). Au moins
+    # deux points par segment, davantage s'il est courbé : la ligne brisée
+    # reste à LEAST_SQUARES_FLATNESS × erreur de la B-spline (la flèche d'un
+    # morceau décroît comme le carré de leur nombre)
+    if len(beziers) < 2:
+        return beziers
+    xs = [beziers[0][0].x]
+    ys = [beziers[0][0].y]
+    flatness = LEAST_SQUARES_FLATNESS * error
+    for p0, c1, c2, p1 in beziers:
+        bulge = max(distance_point_segment(c1, p0, p1), distance_point_segment(c2, p0, p1))
+        count = max(2, int(math.ceil(math.sqrt(0.75 * bulge / flatness)))) if flatness > 0.0 else 2
+        for k in range(1, count + 1):
+            t = k / count
+            s = 1.0 - t
+            b0, b1, b2, b3 = s * s * s, 3.0 * s * s * t, 3.0 * s * t * t, t * t * t
+            xs.append(b0 * p0.x + b1 * c1.x + b2 * c2.x + b3 * p1.x)
+            ys.append(b0 * p0.y + b1 * c1.y + b2 * c2.y + b3 * p1.y)
+    fitted = [tuple(Point(x, y) for x, y in seg) for seg in fit_cubics(xs, ys, error)]
+    return [seg for seg in fitted if not is_degenerate_segment(seg)]
+
+def is_degenerate_segment(seg):
+    return abs(seg[0].x - seg[3].x) <= 1e-6 and abs(seg[0].y - seg[3].y) <= 1e-6
+
+def trim_segment(points, trim_length, from_start=True):
+    # Renvoie la liste elle-même si le tracé est plus court que trim_length
+    d = 0
+    if from_start:
+        for i in range(len(points) - 1):
+            seg_len = distance(points[i], points[i + 1])
+            if d + seg_len >= trim_length:
+                ratio = (trim_length - d) / seg_len
+                new_p = Point(points[i].x + (points[i + 1].x - points[i].x) * ratio, points[i].y + (points[i + 1].y - points[i].y) * ratio)
+                return [new_p] + points[i + 1:]
+            d += seg_len
+        return points
+    else:
+        for i in range(len(points) - 1, 0, -1):
+            seg_len = distance(points[i], points[i - 1])
+            if d + seg_len >= trim_length:
+                ratio = (trim_length - d) / seg_len
+                new_p = Point(points[i].x + (points[i - 1].x - points[i].x) * ratio, points[i].y + (points[i - 1].y - points[i].y) * ratio)
+                return points[:i] + [new_p]
+            d += seg_len
+        return points
+
+def trim_ends(points, trim_length=2.0):
+    if len(points) < 3:
+        return points[:]
+    trim = trim_length * 2.0 
+    trimmed = trim_segment(points, trim, from_start=True)
+    trimmed = trim_segment(trimmed, trim, from_start=False)
+    if distance(trimmed[0], trimmed[1]) < 0.1 and len(trimmed) > 2:
+        trimmed = trimmed[1:]
+    if distance(trimmed[-1], trimmed[-2]) < 0.1 and len(trimmed) > 2:
+        trimmed = trimmed[:-1]
+    return trimmed
+
+
+# FONCTION CLAMPING GÉNÉRIQUE (utilisée par mouseUp et background)
+def apply_clamping(beziers):
+    if not beziers:
+        return beziers, None, None
+    
+    # Le dictionnaire sera retourné pour le repère visuel
+    clamped_points = {'start': None, 'end': None}
+    
+    # --- Traitement du segment de début (p0, c1, c2, p1) ---
+    p0_first, c1_first, c2_first, p1_first = beziers[0]
+    
+    vec_p0_p1 = pt_sub(p1_first, p0_first)
+    len_p0_p1 = distance(Point(0, 0), vec_p0_p1)
+    
+    if len_p0_p1 < MIN_SEGMENT_LENGTH:
+        # Segment trop court: forcer C1 = P0 pour faire une ligne droite
+        if distance(c1_first, p0_first) > 0.1:
+            c1_first = p0_first
+            clamped_points['start'] = p0_first
+    elif len_p0_p1 > 1e-6:
+        max_c1_len = len_p0_p1 * PINCH_FACTOR
+        vec_p0_c1 = pt_sub(c1_first, p0_first)
+        
+        unit_vec_p0_p1 = pt_div(vec_p0_p1, len_p0_p1)
+        dot_product = vec_p0_c1.x * unit_vec_p0_p1.x + vec_p0_c1.y * unit_vec_p0_p1.y
+        
+        if dot_product < 0:
+            c1_first = pt_add(p0_first, pt_mul(unit_vec_p0_p1, max_c1_len))
+            clamped_points['start'] = c1_first
+        else:
+            vec_p0_c1_limited = pt_limit_length(vec_p0_c1, max_c1_len)
+            c1_first_new = pt_add(p0_first, vec_p0_c1_limited)
+            if distance(c1_first_new, c1_first) > 0.1:
+                c1_first = c1_first_new
+                clamped_points['start'] = c1_first
+
+    beziers[0] = (p0_first, c1_first, c2_first, p1_first)
+
+    # --- Traitement du segment de fin (p0_last, c1_last, c2_last, p1_last) ---
+    p0_last, c1_last, c2_last, p1_last = beziers[-1]
+    
+    vec_p0_p1_last = pt_sub(p1_last, p0_last)
+    len_p0_p1_last = distance(Point(0, 0), vec_p0_p1_last)
+
+    if len_p0_p1_last < MIN_SEGMENT_LENGTH:
+        # Segment trop court: forcer C2 = P1 pour faire une ligne droite
+        if distance(c2_last, p1_last) > 0.1:
+            c2_last = p1_last
+            clamped_points['end'] = p1_last
+    elif len_p0_p1_last > 1e-6:
+        max_c2_len = len_p0_p1_last * PINCH_FACTOR
+        vec_p1_c2 = pt_sub(c2_last, p1_last)
+
+        unit_vec_p0_p1_last = pt_div(vec_p0_p1_last, len_p0_p1_last)
+        unit_vec_p1_p0_last = pt_mul(unit_vec_p0_p1_last, -1) 
+        dot_product = vec_p1_c2.x * unit_vec_p1_p0_last.x + vec_p1_c2.y * unit_vec_p1_p0_last.y
+        
+        if dot_product < 0:
+            c2_last = pt_add(p1_last, pt_mul(unit_vec_p1_p0_last, max_c2_len))
+            clamped_points['end'] = c2_last
+        else:
+            vec_p1_c2_limited = pt_limit_length(vec_p1_c2, max_c2_len)
+            c2_last_new = pt_add(p1_last, vec_p1_c2_limited)
+            if distance(c2_last_new, c2_last) > 0.1:
+                c2_last = c2_last_new
+                clamped_points['end'] = c2_last
+
+    beziers[-1] = (p0_last, c1_last, c2_last, p1_last)
+    
+    # Renvoyer les beziers modifiés et les points de contrôle modifiés pour le repère
+    return beziers, clamped_points['start'], clamped_points['end']
+
+
+# PIPELINE COMPLET (référence pour mouseUp)
+def fit_stroke(points, simplify_epsilon, stroke_width, simplifier=RDP, fitter=BSPLINE):
+    xs, ys = coordinates(points)
+
+    # 1. Pré-simplification des extrémités
+    pre_simplified = simplify_ends_indices(xs, ys, num_points_to_process=NUM_END_POINTS, epsilon_ends=1.0)
+    pre_xs = [xs[i] for i in pre_simplified]
+    pre_ys = [ys[i] for i in pre_simplified]
+
+    # 2. Simplification globale, RDP ou Visvalingam (seuls les points conservés deviennent des Point)
+    kept = simplify_indices(pre_xs, pre_ys, simplify_epsilon, simplifier)
+    if len(kept) < 2:
+        kept = range(len(pre_xs))
+    simplified_points = [Point(pre_xs[i], pre_ys[i]) for i in kept]
+
+    # 3. Nettoyage des points d'ancrage près des extrémités (distance=5.0)
+    simplified_points = cleanup_endpoints(simplified_points, min_distance=5.0)
+
+    # 4. Trim et Bézier
+    simplified_points = trim_ends(simplified_points, trim_length=stroke_width * 0.05)
+    return simplified_points, fit_beziers(simplified_points, simplify_epsilon, fitter)
+
+def fit_beziers(simplified_points, simplify_epsilon, fitter=BSPLINE):
+    beziers = b_spline_to_bezier(simplified_points)
+    if fitter == LEAST_SQUARES:
+        beziers = least_squares_to_bezier(beziers, simplify_epsilon * LEAST_SQUARES_TOLERANCE)
+    return beziers
+
+# PIPELINE + CLAMPING, avec le noyau NumPy si disponible
+def fit_stroke_clamped(points, simplify_epsilon, stroke_width, simplifier=RDP, fitter=BSPLINE):
+    # Visvalingam reste en pur Python : le tas ne se vectorise pas
+    vectorized = vectorized_backend() if len(points) >= VECTORIZED_MIN_POINTS and simplifier == RDP else None
+    if vectorized is None:
+        simplified_points, beziers = fit_stroke(points, simplify_epsilon, stroke_width, simplifier, fitter)
+        beziers, start_clamped_point, end_clamped_point = apply_clamping(beziers)
+        return simplified_points, beziers, start_clamped_point, end_clamped_point
+    simplified, beziers = vectorized.fit_stroke(vectorized.as_array(points), simplify_epsilon, stroke_width)
+    # Conversion en Point uniquement à la sortie
+    simplified_points = [Point(x, y) for x, y in simplified.tolist()]
+    if fitter == LEAST_SQUARES:
+        beziers = [tuple(Point(x, y) for x, y in seg) for seg in beziers.tolist()]
+        beziers = least_squares_to_bezier(beziers, simplify_epsilon * LEAST_SQUARES_TOLERANCE)
+        beziers, start_clamped_point, end_clamped_point = apply_clamping(beziers)
+        return simplified_points, beziers, start_clamped_point, end_clamped_point
+    beziers, start_clamped, end_clamped = vectorized.apply_clamping(beziers)
+    beziers = [tuple(Point(x, y) for x, y in seg) for seg in beziers.tolist()]
+    start_clamped_point = Point(*start_clamped.tolist()) if start_clamped is not None else None
+    end_clamped_point = Point(*end_clamped.tolist()) if end_clamped is not None else None
+    return simplified_points, beziers, start_clamped_point, end_clamped_point
+
+
+# NŒUDS DU CHEMIN (même construction que mouseUp, avec alignement C1 symétrique)
+def stroke_nodes(simplified_points, beziers, symmetric=True):
+    # Liste de (position, type, smooth) dans l'ordre de path.nodes. Les
+    # poignées des moindres carrés sont alignées mais de longueurs différentes :
+    # symmetric=False garde leur longueur et ne corrige que la direction
+    # après l'arrondi du nœud.
+    if not beziers:
+        return [(Point(round(pt.x), round(pt.y)), LINE, False) for pt in simplified_points]
+    nodes = []
+    previous_c2 = None
+    for p0, c1, c2, p1 in beziers:
+        p0_rounded = Point(round(p0.x), round(p0.y))
+        p1_rounded = Point(round(p1.x), round(p1.y))
+        if previous_c2 is None:
+            nodes.append((p0_rounded, LINE, True))
+            nodes.append((c1, OFFCURVE, False))
+        elif symmetric:
+            nodes.append((make_tangent_symmetric(p0_rounded, previous_c2), OFFCURVE, False))
+        else:
+            nodes.append((align_tangent(p0_rounded, previous_c2, c1, p0), OFFCURVE, False))
+        nodes.append((c2, OFFCURVE, False))
+        nodes.append((p1_rounded, CURVE, True))
+        previous_c2 = c2
+    return nodes
+
+
+# ----------------------------------------------------------
+# Moteur incrémental pour l'aperçu (background)
+# ----------------------------------------------------------
+# Le préfixe de simplify_ends est gardé entre deux mouseDragged_ (les points
+# du milieu ne bougent plus une fois à NUM_END_POINTS de la fin). La
+# simplification ne porte que sur la queue, depuis le dernier sommet figé :
+# les sommets qu'elle garde à plus de FREEZE_LAG sommets de la fin sont figés
+# à leur tour. Chaque morceau est une simplification RDP (ou Visvalingam) de
+# ses points, l'aperçu reste donc à epsilon du tracé, mais il peut s'écarter
+# légèrement du chemin que mouseUp_ pose après une simplification globale.
+# Les débuts de cleanup_endpoints, de trim_ends et les segments B-spline qui
+# ne dépendent que de sommets figés sont calculés une seule fois ; seule la
+# fin est refaite. Quand elle repasse près de sommets figés, que
+# cleanup_endpoints retire, la B-spline est refaite à partir du premier
+# d'entre eux. Une queue sans sommet à figer (trait droit) est simplifiée à
+# epsilon / 2 au-delà de MAX_TAIL_POINTS, puis coupée en son milieu si
+# besoin : chaque point reste à epsilon de la ligne brisée. L'aperçu reste
+# une B-spline avec l'ajustement LEAST_SQUARES : les moindres carrés ne sont
+# faits qu'au mouseUp_.
+FREEZE_LAG = 5              # derniers sommets de la queue encore mobiles, jamais figés
+MAX_TAIL_POINTS = 256       # au-delà, la queue est coupée même sans sommet à figer
+CLEANUP_DISTANCE = 5.0      # min_distance de cleanup_endpoints
+
+class StrokeEngine(object):
+
+    def __init__(self, points, simplifier=RDP):
+        self.points = points      # StrokeBuffer (ou liste de points) en cours de capture
+        self.simplifier = simplifier
+        self._pre = array("l")    # index bruts du préfixe stable de simplify_ends(points)
+        self._pre_xs = array("d") # et leurs coordonnées
+        self._pre_ys = array("d")
+        self._pre_index = None    # prochain index brut à examiner pour _pre
+        self._params = None       # (epsilon, épaisseur) des sommets figés
+        self._reset_frozen()
+
+    def _reset_frozen(self):
+        self._anchor = 0          # index dans _pre du dernier sommet figé
+        self._frozen = []         # sommets figés, départ compris
+        self._clean = []          # sommets figés hors départ, moins ceux proches du départ
+        self._grid = {}           # cellule de CLEANUP_DISTANCE -> index dans _clean
+        self._head = None         # début de trim_ends : (points, index du premier sommet de _clean gardé)
+        self._stable = []         # segments B-spline qui ne dépendent que de sommets figés
+        self._stable_at = array("l", [0])  # segments gardés parmi les n premiers calculés (dégénérés compris)
+
+    def _extend_pre(self, xs, ys):
+        pre = self._pre
+        if self._pre_index is None:
+            # Début du tracé : même traitement que simplify_ends
+            simplified_start = rdp_indices(xs, ys, 1.0, 0, NUM_END_POINTS - 1)
+            for i in simplified_start:
+                if not pre or math.hypot(xs[pre[-1]] - xs[i], ys[pre[-1]] - ys[i]) > 0.1:
+                    pre.append(i)
+                    self._pre_xs.append(xs[i])
+                    self._pre_ys.append(ys[i])
+            self._pre_index = len(simplified_start) - 1
+        # Les points du milieu ne dépendent plus de la fin du tracé
+        stop = len(xs) - NUM_END_POINTS
+        for i in range(self._pre_index, stop):
+            if math.hypot(xs[pre[-1]] - xs[i], ys[pre[-1]] - ys[i]) > 0.1:
+                pre.append(i)
+                self._pre_xs.append(xs[i])
+                self._pre_ys.append(ys[i])
+        self._pre_index = max(self._pre_index, stop)
+
+    def _end_indices(self, xs, ys):
+        # Fin de simplify_ends(points), recalculée à chaque aperçu
+        n = len(xs)
+        simplified_end = rdp_indices(xs, ys, 1.0, n - NUM_END_POINTS, n - 1)
+        junction_end_index = n - len(simplified_end)
+        last = self._pre[-1]
+        end_indices = []
+        for i in chain(range(self._pre_index, junction_end_index), simplified_end):
+            if math.hypot(xs[last] - xs[i], ys[last] - ys[i]) > 0.1:
+                end_indices.append(i)
+                last = i
+        return end_indices
+
+    def _simplify(self, pre_xs, pre_ys, simplify_epsilon):
+        # Même choix de noyau que fit_stroke_clamped
+        if self.simplifier == RDP and len(pre_xs) >= VECTORIZED_MIN_POINTS:
+            vectorized = vectorized_backend()
+            if vectorized is not None:
+                xy = vectorized.np.column_stack((vectorized.np.frombuffer(pre_xs, dtype=vectorized.np.float64), vectorized.np.frombuffer(pre_ys, dtype=vectorized.np.float64)))
+                return vectorized.rdp_indices(xy, simplify_epsilon).tolist()
+        # Appel direct (pas simplify_indices) : une seule mesure par aperçu
+        if self.simplifier == VISVALINGAM:
+            return visvalingam_indices(pre_xs, pre_ys, visvalingam_area(simplify_epsilon))
+        return rdp_indices(pre_xs, pre_ys, simplify_epsilon)
+
+    def _freeze(self, p, trim):
+        frozen = self._frozen
+        frozen.append(p)
+        if len(frozen) == 1 or distance(p, frozen[0]) < CLEANUP_DISTANCE:
+            return
+        self._clean.append(p)
+        cell = (math.floor(p.x / CLEANUP_DISTANCE), math.floor(p.y / CLEANUP_DISTANCE))
+        self._grid.setdefault(cell, []).append(len(self._clean) - 1)
+        if self._head is None:
+            # Début de trim_ends : il ne dépend que des premiers sommets
+            points = [frozen[0]] + self._clean
+            trimmed = trim_segment(points, trim, from_start=True)
+            if trimmed is points or len(trimmed) < 3:
+                return
+            body_from = len(points) - len(trimmed)
+            head = trimmed[:1] if distance(trimmed[0], trimmed[1]) >= 0.1 else []
+            self._head = (head, body_from)
+
+    def _freeze_tail(self, tail_xs, tail_ys, kept, stable, trim, lag=FREEZE_LAG):
+        # Fige les sommets gardés loin de la fin ; renvoie la position dans kept du premier sommet non figé
+        first = 1
+        anchor = self._anchor
+        for k in kept[1:len(kept) - 1 - lag]:
+            if k >= stable or k == 0:
+                break
+            self._freeze(Point(tail_xs[k], tail_ys[k]), trim)
+            self._anchor = anchor + k
+            first += 1
+        return first
+
+    def _near_end(self, end_point):
+        # Index des sommets de _clean que cleanup_endpoints retire près de la fin
+        cx = math.floor(end_point.x / CLEANUP_DISTANCE)
+        cy = math.floor(end_point.y / CLEANUP_DISTANCE)
+        near = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for i in self._grid.get((gx, gy), ()):
+                    if distance(self._clean[i], end_point) < CLEANUP_DISTANCE:
+                        near.append(i)
+        return sorted(near)
+
+    def _finish(self, tail_points, stroke_width):
+        # Calcul complet sur les sommets figés et la queue (début du tracé)
+        simplified_points = cleanup_endpoints(self._frozen + tail_points, min_distance=CLEANUP_DISTANCE)
+        simplified_points = trim_ends(simplified_points, trim_length=stroke_width * 0.05)
+        return apply_clamping(b_spline_to_bezier(simplified_points))
+
+    def preview(self, simplify_epsilon, stroke_width):
+        points = self.points
+        if len(points) < 2:
+            return [], None, None
+        if len(points) <= NUM_END_POINTS * 2:
+            # Tracé court : le pipeline complet ne coûte presque rien
+            _, beziers = fit_stroke(points, simplify_epsilon, stroke_width, self.simplifier)
+            return apply_clamping(beziers)
+
+        xs, ys = coordinates(points)
+        self._extend_pre(xs, ys)
+        trim = stroke_width * 0.05 * 2.0
+        if self._params != (simplify_epsilon, stroke_width):
+            self._params = (simplify_epsilon, stroke_width)
+            self._reset_frozen()
+            self._freeze(Point(self._pre_xs[0], self._pre_ys[0]), trim)
+
+        # Simplification de la queue seulement, depuis le dernier sommet figé
+        end = self._end_indices(xs, ys)
+        anchor = self._anchor
+        tail_xs = self._pre_xs[anchor:] + array("d", [xs[i] for i in end])
+        tail_ys = self._pre_ys[anchor:] + array("d", [ys[i] for i in end])
+        kept = list(self._simplify(tail_xs, tail_ys, simplify_epsilon))
+        if len(kept) < 2:
+            kept = list(range(len(tail_xs)))
+        stable = len(self._pre) - anchor
+        first = self._freeze_tail(tail_xs, tail_ys, kept, stable, trim)
+        if first == 1 and len(tail_xs) > MAX_TAIL_POINTS:
+            # Queue trop longue : simplification plus fine, sinon coupe au milieu
+            kept = list(self._simplify(tail_xs, tail_ys, simplify_epsilon * 0.5))
+            first = self._freeze_tail(tail_xs, tail_ys, kept, stable, trim)
+            if first == 1 and len(kept) == 2:
+                kept = [0, stable // 2, len(tail_xs) - 1]
+                first = self._freeze_tail(tail_xs, tail_ys, kept, stable, trim, lag=0)
+        tail_points = [Point(tail_xs[k], tail_ys[k]) for k in kept[first:]]
+        if len(tail_points) < 1 or self._head is None:
+            return self._finish(tail_points, stroke_width)
+
+        # Fin de cleanup_endpoints : les sommets figés proches de la fin sont
+        # retirés, et la B-spline refaite à partir du premier d'entre eux
+        head, body_from = self._head
+        clean = self._clean
+        start_point = self._frozen[0]
+        end_point = tail_points[-1]
+        removed = self._near_end(end_point)
+        if removed and removed[0] <= body_from:
+            return self._finish(tail_points, stroke_width)
+        first_removed = removed[0] if removed else len(clean)
+        removed = set(removed)
+        rest = [clean[i] for i in range(first_removed, len(clean)) if i not in removed]
+        frozen_count = len(head) + len(clean) - body_from
+        split = len(head) + first_removed - body_from
+
+        def frozen_at(k):
+            k = max(k, 0)
+            return head[k] if k < len(head) else clean[body_from + k - len(head)]
+
+        tail = [rest[-1] if rest else frozen_at(split - 1)]
+        for p in tail_points[:-1]:
+            if not (distance(p, start_point) < CLEANUP_DISTANCE or distance(p, end_point) < CLEANUP_DISTANCE):
+                tail.append(p)
+        if distance(tail[-1], end_point) > 1e-6:
+            tail.append(end_point)
+
+        # Fin de trim_ends, sans toucher aux sommets figés
+        trimmed = trim_segment(tail, trim, from_start=False)
+        if trimmed is tail:
+            return self._finish(tail_points, stroke_width)
+        if distance(trimmed[-1], trimmed[-2]) < 0.1:
+            trimmed = trimmed[:-1]
+        rest += trimmed[1:]
+
+        # B-spline : le segment j dépend des points j-2 à j+1 de
+        # [tête, _clean[body_from:], queue] ; ceux qui ne dépendent que de
+        # sommets figés sont calculés une seule fois
+        stable_at = self._stable_at
+        for j in range(len(stable_at) - 1, frozen_count - 1):
+            seg = b_spline_segment(frozen_at(j - 2), frozen_at(j - 1), frozen_at(j), frozen_at(j + 1))
+            if not is_degenerate_segment(seg):
+                self._stable.append(seg)
+            stable_at.append(len(self._stable))
+        count = split + len(rest)
+
+        def at(k):
+            k = min(max(k, 0), count - 1)
+            return frozen_at(k) if k < split else rest[k - split]
+
+        beziers = self._stable[:stable_at[split - 1]]
+        for j in range(split - 1, count + 1):
+            seg = b_spline_segment(at(j - 2), at(j - 1), at(j), at(j + 1))
+            if not is_degenerate_segment(seg):
+                beziers.append(seg)
+        return apply_clamping(beziers)
+
+
+# ----------------------------------------------------------
+# Niveaux de lissage d'un tracé terminé (curseur Lissage)
+# ----------------------------------------------------------
+# L'epsilon à partir duquel RDP supprime chaque point pré-simplifié (ou son
+# aire effective pour Visvalingam) est calculé une seule fois par tracé ; un
+# niveau de lissage n'est ensuite qu'un filtre sur ce seuil, sans nouvelle
+# simplification. Même résultat que fit_stroke. Le constructeur ne fait que
+# copier les coordonnées : la pré-simplification et les niveaux attendent le
+# premier mouvement du curseur, hors de la pause de mouseUp_. Pas de noyau
+# NumPy ici : la recherche du point le plus éloigné, plage par plage, coûte
+# plus cher en appels NumPy qu'en pur Python sur le corpus.
+class StrokeLevels(object):
+
+    def __init__(self, points, simplifier=RDP, fitter=BSPLINE):
+        self.simplifier = simplifier
+        self.fitter = fitter
+        self._raw = coordinates(points)  # copie : le tampon est vidé après mouseUp_
+        self._xs = None           # points pré-simplifiés, calculés au premier niveau demandé
+        self._ys = None
+        self._levels = None       # epsilon de suppression par point, idem
+        self._params = None
+        self._preview = None
+
+    def __len__(self):
+        return len(self.coordinates()[0])
+
+    def coordinates(self):
+        if self._xs is None:
+            xs, ys = self._raw
+            pre_simplified = simplify_ends_indices(xs, ys, num_points_to_process=NUM_END_POINTS, epsilon_ends=1.0)
+            self._xs = array("d", [xs[i] for i in pre_simplified])
+            self._ys = array("d", [ys[i] for i in pre_simplified])
+            self._raw = None
+        return self._xs, self._ys
+
+    def levels(self):
+        if self._levels is None:
+            xs, ys = self.coordinates()
+            if self.simplifier == VISVALINGAM:
+                self._levels = visvalingam_levels(xs, ys)
+            else:
+                self._levels = rdp_importance(xs, ys)
+        return self._levels
+
+    def simplified(self, simplify_epsilon):
+        xs, ys = self.coordinates()
+        if self.simplifier == VISVALINGAM:
+            area = visvalingam_area(simplify_epsilon)
+            kept = [i for i, level in enumerate(self.levels()) if level >= area]
+        else:
+            kept = [i for i, level in enumerate(self.levels()) if level > simplify_epsilon]
+        if len(kept) < 2:
+            kept = range(len(xs))
+        return [Point(xs[i], ys[i]) for i in kept]
+
+    def fit(self, simplify_epsilon, stroke_width):
+        simplified_points = cleanup_endpoints(self.simplified(simplify_epsilon), min_distance=5.0)
+        simplified_points = trim_ends(simplified_points, trim_length=stroke_width * 0.05)
+        return simplified_points, fit_beziers(simplified_points, simplify_epsilon, self.fitter)
+
+    def preview(self, simplify_epsilon, stroke_width):
+        # background est rappelé bien plus souvent que le curseur ne bouge
+        if self._params != (simplify_epsilon, stroke_width):
+            _, beziers = self.fit(simplify_epsilon, stroke_width)
+            self._preview = apply_clamping(beziers)
+            self._params = (simplify_epsilon, stroke_width)
+        return self._preview
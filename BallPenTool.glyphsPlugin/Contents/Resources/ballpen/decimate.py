@@ -0,0 +1,116 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — décimation des échantillons pendant la capture (optionnelle)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+from itertools import chain
+from ballpen.core import NUM_END_POINTS
+from ballpen.rdp import rdp_indices
+
+# Fenêtre glissante (à la Lang) : depuis le dernier point gardé (l'ancre), les
+# échantillons reçus sont remplacés par le segment ancre → dernier échantillon
+# tant qu'aucun d'eux ne s'en écarte de plus de la tolérance. Le tampon ne
+# contient que les points gardés et une extrémité flottante, réécrite à chaque
+# échantillon (StrokeBuffer.replace_last) : seul le dernier index change, ce
+# que StrokeEngine accepte, puisqu'il recalcule la fin du tracé à chaque aperçu.
+#
+# Mémoire : un point est gardé à chaque sortie de la tolérance, ou toutes les
+# MAX_WINDOW échantillons. Sur un tracé régulier, elle suit la complexité du
+# dessin plutôt que la durée du geste (long : 290 points sur 4626). Un tracé
+# tremblé dont l'amplitude dépasse la tolérance garderait presque tout
+# (long-jittery : 4049 sur 4388, et une tolérance plus large n'y change pas
+# grand-chose) : dès que MAX_KEPT points ont été gardés depuis la dernière
+# compaction, ils sont compactés par RDP à la tolérance de compaction (début
+# brut et NUM_END_POINTS derniers points exceptés). Chaque point n'est
+# compacté qu'une fois ; la mémoire suit alors la complexité du dessin à
+# cette tolérance, plus MAX_KEPT points au plus (long-jittery : 837). À
+# epsilon, la compaction garde à peu près les sommets que la simplification
+# retiendra de toute façon.
+#
+# Garantie : chaque échantillon brut est à la tolérance près du segment qui le
+# remplace, chaque segment décimé à la tolérance de compaction près de celui
+# qui le remplace, et RDP garde chaque point à epsilon près du polygone
+# simplifié ; ce polygone reste donc à (1 + TOLERANCE_FACTOR +
+# COMPACTION_FACTOR) × epsilon des échantillons bruts (epsilon hors
+# décimation). Les courbes ajustées ensuite ne sont pas bornées de même : RDP
+# peut retenir d'autres sommets, et la courbe obtenue s'écarte de celle du
+# tracé complet de l'ordre de 2 × epsilon sur benchmarks/strokes (comme deux
+# ajustements de tracés presque identiques).
+TOLERANCE_FACTOR = 0.1    # tolérance = facteur × simplifyEpsilon, réglé sur benchmarks/strokes
+COMPACTION_FACTOR = 1.0   # tolérance de compaction = facteur × simplifyEpsilon
+MAX_WINDOW = 64           # échantillons vérifiés au plus par nouvel échantillon
+MAX_KEPT = 512            # points gardés depuis la dernière compaction
+
+
+class StreamingDecimator(object):
+
+    def __init__(self, points, tolerance, window=MAX_WINDOW, raw_start=NUM_END_POINTS, compaction=0.0, limit=MAX_KEPT):
+        self.points = points          # StrokeBuffer vidé par mouseDown_
+        self.tolerance = tolerance
+        self.window = window
+        self.raw_start = max(1, raw_start)  # début gardé tel quel, comme pour simplify_ends
+        self.compaction = compaction  # tolérance de compaction, 0 : pas de plafond
+        self.limit = limit
+        self.compactions = 0          # change quand les index du tampon sont réécrits
+        self.received = 0
+        self._compacted = 0           # index du dernier point compacté
+        self._anchor = None
+        self._xs = []                 # échantillons depuis l'ancre (le dernier est l'extrémité flottante)
+        self._ys = []
+
+    def append(self, x, y, pressure=0.0, time=0.0):
+        self.received += 1
+        points = self.points
+        if len(points) < self.raw_start:
+            points.append(x, y, pressure, time)
+            self._anchor = (x, y)
+            return
+        xs, ys = self._xs, self._ys
+        if xs and len(xs) < self.window and self._covers(x, y):
+            points.replace_last(x, y, pressure, time)
+        else:
+            # L'extrémité flottante devient un point gardé
+            if xs:
+                self._anchor = (xs[-1], ys[-1])
+                del xs[:], ys[:]
+            points.append(x, y, pressure, time)
+            if self.compaction > 0.0 and len(points) - self._compacted > self.limit:
+                self._compact()
+        xs.append(x)
+        ys.append(y)
+
+    def _compact(self):
+        # Points gardés depuis la dernière compaction, simplifiés par RDP ; le
+        # tampon est réécrit, ses index changent (voir compactions)
+        points = self.points
+        count = len(points)
+        first = max(self.raw_start - 1, self._compacted)
+        last = count - 1 - NUM_END_POINTS
+        if last - first < 2:
+            return
+        xs, ys = points.coordinates()
+        pressures, times = points.pressures(), points.times()
+        kept = rdp_indices(xs, ys, self.compaction, first, last)
+        points.clear()
+        for i in chain(range(first), kept, range(last + 1, count)):
+            points.append(xs[i], ys[i], pressures[i] if pressures is not None else 0.0, times[i] if times is not None else 0.0)
+        self._compacted = first + len(kept) - 1
+        self.compactions += 1
+
+    def _covers(self, x, y):
+        # Tous les échantillons de la fenêtre à moins de la tolérance du segment ancre → (x, y)
+        ax, ay = self._anchor
+        dx, dy = x - ax, y - ay
+        length2 = dx * dx + dy * dy
+        tolerance = self.tolerance
+        for px, py in zip(self._xs, self._ys):
+            if length2 == 0.0:
+                t = 0.0
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length2))
+            if math.hypot(px - ax - t * dx, py - ay - t * dy) > tolerance:
+                return False
+        return True
@@ -0,0 +1,120 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — index des extrémités de chemins ouverts et raccord des tracés
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+from ballpen.core import LINE, CURVE, OFFCURVE, make_tangent_symmetric, align_tangent, pt_add, pt_sub
+
+# Grille régulière : chaque extrémité est rangée dans sa case, une recherche
+# dans un rayon ne visite que les cases qu'il recouvre. Construite une fois
+# par calque (voir plugin.py), puis tenue à jour à chaque tracé ajouté ou
+# raccordé, sans reparcourir tous les chemins à chaque mouseUp_.
+CELL_SIZE = 32.0          # unités de fonte
+
+START = 0
+END = 1
+
+
+class EndpointGrid(object):
+
+    def __init__(self, cell=CELL_SIZE):
+        self.cell = cell
+        self._cells = {}          # (i, j) -> {clé: (x, y)}
+        self._where = {}          # clé -> (i, j)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def add(self, key, x, y):
+        self.discard(key)
+        where = self._cell(x, y)
+        self._cells.setdefault(where, {})[key] = (x, y)
+        self._where[key] = where
+
+    def discard(self, key):
+        where = self._where.pop(key, None)
+        if where is None:
+            return
+        bucket = self._cells[where]
+        del bucket[key]
+        if not bucket:
+            del self._cells[where]
+
+    def position(self, key):
+        where = self._where.get(key)
+        return None if where is None else self._cells[where][key]
+
+    def nearest(self, x, y, radius, accept=None):
+        # (clé, distance) de l'extrémité la plus proche à moins de `radius`,
+        # ou None ; accept(clé) écarte les candidats refusés
+        best = None
+        i0, j0 = self._cell(x - radius, y - radius)
+        i1, j1 = self._cell(x + radius, y + radius)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = self._cells.get((i, j))
+                if not bucket:
+                    continue
+                for key, (px, py) in list(bucket.items()):   # accept peut déplacer une clé
+                    d = math.hypot(px - x, py - y)
+                    if d <= radius and (best is None or d < best[1]) and (accept is None or accept(key)):
+                        best = (key, d)
+        return best
+
+
+# ----------------------------------------------------------
+# Nœuds de chemins ouverts [(Point, type, smooth)], comme stroke_nodes
+# ----------------------------------------------------------
+def reverse_nodes(nodes):
+    # Même chemin parcouru à l'envers : le type d'un point sur la courbe
+    # décrit le segment qui y arrive, il est donc recalculé
+    out = []
+    for position, node_type, smooth in reversed(nodes):
+        if node_type != OFFCURVE:
+            node_type = CURVE if out and out[-1][1] == OFFCURVE else LINE
+        out.append((position, node_type, smooth))
+    return out
+
+def join_nodes(head, tail, keep_head=True):
+    # Chemin `head` prolongé par `tail` : la fin de l'un et le début de
+    # l'autre sont confondus au point gardé (celui de `head` si keep_head),
+    # et la poignée de l'autre côté est alignée sur celle du côté gardé,
+    # symétrique comme dans stroke_nodes
+    anchor = head[-1][0] if keep_head else tail[0][0]
+    head = list(head)
+    tail = list(tail)
+    if keep_head:
+        moved, index, step = tail, 0, 1
+    else:
+        moved, index, step = head, len(head) - 1, -1
+    # Le point déplacé emmène sa poignée
+    delta = pt_sub(anchor, moved[index][0])
+    moved[index] = (anchor,) + tuple(moved[index][1:])
+    handle = index + step
+    if 0 <= handle < len(moved) and moved[handle][1] == OFFCURVE:
+        moved[handle] = (pt_add(moved[handle][0], delta),) + tuple(moved[handle][1:])
+
+    # Seul le côté ajouté est modifié ; s'il commence par un segment droit,
+    # le raccord reste anguleux
+    kept, other, other_index = (head, tail, 1) if keep_head else (tail, head, -2)
+    smooth = False
+    if len(kept) > 1 and len(other) > 1 and other[other_index][1] == OFFCURVE:
+        kept_handle = kept[-2] if keep_head else kept[1]
+        if kept_handle[1] == OFFCURVE:
+            position = make_tangent_symmetric(anchor, kept_handle[0])
+        else:
+            # Segment droit du côté gardé : poignée dans son prolongement, longueur conservée
+            position = align_tangent(anchor, kept_handle[0], other[other_index][0], anchor)
+        other[other_index] = (position, OFFCURVE, False)
+        smooth = True
+    head_type = head[-1][1]
+    return head[:-1] + [(anchor, head_type, smooth)] + tail[1:]
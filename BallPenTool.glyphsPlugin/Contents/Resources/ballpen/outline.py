@@ -0,0 +1,385 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — contour d'un tracé (bouts et jonctions ronds, épaisseur fixe ou variable)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+from ballpen.core import Point, LINE, CURVE, OFFCURVE
+from ballpen.width import width_at
+
+# Le chemin ouvert posé par mouseUp_ (strokeWidth, lineCapStart / lineCapEnd
+# ronds) est développé en un contour fermé, sans passer par Glyphs :
+#
+#   côté droit dans le sens du tracé, bout rond, côté droit du tracé inversé
+#   (le côté gauche, parcouru à l'envers), bout rond
+#
+# soit un contour dans le sens inverse des aiguilles d'une montre. Chaque
+# cubique est décalée de la demi-épaisseur par une cubique de mêmes tangentes,
+# poignées mises à l'échelle par la courbure aux extrémités (1 - d·κ) ; si
+# l'écart avec le vrai décalage dépasse TOLERANCE en t = ¼, ½, ¾, la cubique
+# est coupée en deux (MAX_DEPTH fois au plus). Jonctions : arc de cercle à
+# l'extérieur du virage, passage par le nœud à l'intérieur (comme Skia).
+#
+# Épaisseur variable (images clés de ballpen/width.py) : le décalage d de
+# chaque segment devient une fonction de t, linéaire par morceaux en abscisse
+# curviligne ; la pente de d entre dans les poignées, la subdivision reste
+# pilotée par le même écart à TOLERANCE.
+TOLERANCE = 0.25         # unités de fonte
+MAX_DEPTH = 5            # au plus 2⁵ cubiques par segment et par côté
+JOIN_EPSILON = 0.01      # en dessous, les deux décalages se touchent déjà
+
+
+# ----------------------------------------------------------
+# Cubiques : segments de quatre couples (x, y)
+# ----------------------------------------------------------
+def _point(seg, t):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = seg
+    s = 1.0 - t
+    b0, b1, b2, b3 = s * s * s, 3.0 * s * s * t, 3.0 * s * t * t, t * t * t
+    return b0 * x0 + b1 * x1 + b2 * x2 + b3 * x3, b0 * y0 + b1 * y1 + b2 * y2 + b3 * y3
+
+def _derivatives(seg, t):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = seg
+    s = 1.0 - t
+    dx = 3.0 * (s * s * (x1 - x0) + 2.0 * s * t * (x2 - x1) + t * t * (x3 - x2))
+    dy = 3.0 * (s * s * (y1 - y0) + 2.0 * s * t * (y2 - y1) + t * t * (y3 - y2))
+    ddx = 6.0 * (s * (x2 - 2.0 * x1 + x0) + t * (x3 - 2.0 * x2 + x1))
+    ddy = 6.0 * (s * (y2 - 2.0 * y1 + y0) + t * (y3 - 2.0 * y2 + y1))
+    return dx, dy, ddx, ddy
+
+def _unit(x, y):
+    length = math.hypot(x, y)
+    if length < 1e-9:
+        return None
+    return x / length, y / length
+
+def _tangent(seg, t):
+    dx, dy, _, _ = _derivatives(seg, t)
+    unit = _unit(dx, dy)
+    if unit is not None:
+        return unit
+    # Poignée nulle à une extrémité : direction vers le premier point distinct
+    p0, c1, c2, p1 = seg
+    candidates = ((c1, p0), (c2, p0), (p1, p0)) if t < 0.5 else ((p1, c2), (p1, c1), (p1, p0))
+    for (ax, ay), (bx, by) in candidates:
+        unit = _unit(ax - bx, ay - by)
+        if unit is not None:
+            return unit
+    return None
+
+def _curvature(seg, t):
+    dx, dy, ddx, ddy = _derivatives(seg, t)
+    speed = math.hypot(dx, dy)
+    if speed < 1e-9:
+        return 0.0
+    return (dx * ddy - dy * ddx) / (speed * speed * speed)
+
+def _at(d, t):
+    return d(t) if callable(d) else d
+
+def _slope(d, t, h=1e-3):
+    # dd/dt, unilatérale vers l'intérieur du segment
+    if not callable(d):
+        return 0.0
+    return (d(t + h) - d(t)) / h if t < 0.5 else (d(t) - d(t - h)) / h
+
+def _restrict(d, t0, t1):
+    # Décalage d'un morceau [t0, t1] du segment, reparamétré sur 0..1
+    if not callable(d):
+        return d
+    return lambda s: d(t0 + (t1 - t0) * s)
+
+def _offset_point(seg, t, d):
+    x, y = _point(seg, t)
+    tx, ty = _tangent(seg, t)
+    return x - ty * d, y + tx * d
+
+def _split_at(seg, t):
+    # de Casteljau en t quelconque
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = seg
+    def mix(a, b):
+        return a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t
+    a, b, c = mix((x0, y0), (x1, y1)), mix((x1, y1), (x2, y2)), mix((x2, y2), (x3, y3))
+    ab, bc = mix(a, b), mix(b, c)
+    m = mix(ab, bc)
+    return ((x0, y0), a, ab, m), (m, bc, c, (x3, y3))
+
+def _split(seg):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = seg
+    ax, ay = (x0 + x1) * 0.5, (y0 + y1) * 0.5
+    bx, by = (x1 + x2) * 0.5, (y1 + y2) * 0.5
+    cx, cy = (x2 + x3) * 0.5, (y2 + y3) * 0.5
+    abx, aby = (ax + bx) * 0.5, (ay + by) * 0.5
+    bcx, bcy = (bx + cx) * 0.5, (by + cy) * 0.5
+    mx, my = (abx + bcx) * 0.5, (aby + bcy) * 0.5
+    return ((x0, y0), (ax, ay), (abx, aby), (mx, my)), ((mx, my), (bcx, bcy), (cx, cy), (x3, y3))
+
+def _polygon_length(seg):
+    return sum(math.hypot(seg[i + 1][0] - seg[i][0], seg[i + 1][1] - seg[i][1]) for i in range(3))
+
+def _is_degenerate(seg):
+    (x0, y0) = seg[0]
+    return all(abs(x - x0) < 1e-9 and abs(y - y0) < 1e-9 for x, y in seg[1:])
+
+
+# ----------------------------------------------------------
+# Décalage d'un segment (d > 0 : à gauche du sens de parcours)
+# ----------------------------------------------------------
+def _offset_cubic(seg, d):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = seg
+    d0, d1 = _at(d, 0.0), _at(d, 1.0)
+    q0 = _offset_point(seg, 0.0, d0)
+    q3 = _offset_point(seg, 1.0, d1)
+    # Les poignées du décalage s'allongent à l'extérieur du virage
+    f0 = max(0.0, 1.0 - d0 * _curvature(seg, 0.0))
+    f1 = max(0.0, 1.0 - d1 * _curvature(seg, 1.0))
+    q1 = (q0[0] + (x1 - x0) * f0, q0[1] + (y1 - y0) * f0)
+    q2 = (q3[0] + (x2 - x3) * f1, q3[1] + (y2 - y3) * f1)
+    if callable(d):
+        # Épaisseur qui varie : la normale entre dans la dérivée (n · d'/3)
+        g0, g1 = _slope(d, 0.0) / 3.0, _slope(d, 1.0) / 3.0
+        (t0x, t0y), (t1x, t1y) = _tangent(seg, 0.0), _tangent(seg, 1.0)
+        q1 = (q1[0] - t0y * g0, q1[1] + t0x * g0)
+        q2 = (q2[0] + t1y * g1, q2[1] - t1x * g1)
+    return q0, q1, q2, q3
+
+def _offset_error(seg, approx, d):
+    error = 0.0
+    for t in (0.25, 0.5, 0.75):
+        ox, oy = _offset_point(seg, t, _at(d, t))
+        ax, ay = _point(approx, t)
+        error = max(error, math.hypot(ax - ox, ay - oy))
+    return error
+
+def _folds(seg, d):
+    # Virage plus serré que la demi-épaisseur, côté intérieur : le décalage se
+    # replie sur lui-même, sous le reste du trait ; inutile de le suivre
+    return any(1.0 - _at(d, t) * _curvature(seg, t) <= 0.0 for t in (0.0, 0.5, 1.0))
+
+def offset_segment(seg, d, tolerance=TOLERANCE, max_depth=MAX_DEPTH):
+    # [(morceau du segment, son décalage)] dans l'ordre du segment. Un morceau
+    # plus court que la tolérance (rebroussement) est omis : son décalage est
+    # un arc autour d'un point, que _side trace comme une jonction. `d` est un
+    # nombre, ou une fonction de t (épaisseur variable).
+    out = []
+    # Pile de (segment, profondeur, t0, t1) : la moitié gauche est dépilée en premier
+    stack = [(seg, 0, 0.0, 1.0)]
+    while stack:
+        piece, depth, t0, t1 = stack.pop()
+        if _polygon_length(piece) < tolerance:
+            continue
+        local = _restrict(d, t0, t1)
+        approx = _offset_cubic(piece, local)
+        if depth >= max_depth or _folds(piece, local) or _offset_error(piece, approx, local) <= tolerance:
+            out.append((piece, approx, _at(local, 0.0)))
+            continue
+        first, second = _split(piece)
+        middle = (t0 + t1) * 0.5
+        stack.append((second, depth + 1, middle, t1))
+        stack.append((first, depth + 1, t0, middle))
+    return out
+
+
+# ----------------------------------------------------------
+# Arcs, bouts et jonctions
+# ----------------------------------------------------------
+def _arc(cx, cy, radius, start, sweep, end_radius=None):
+    # Arc de cercle en cubiques de 90° au plus ; avec end_radius, le rayon
+    # varie linéairement avec l'angle (jonction entre deux épaisseurs)
+    if end_radius is None:
+        end_radius = radius
+    count = max(1, int(math.ceil(abs(sweep) / (math.pi / 2) - 1e-9)))
+    step = sweep / count
+    k = 4.0 / 3.0 * math.tan(step / 4.0)
+    out = []
+    angle = start
+    for i in range(count):
+        a0, a1 = angle, angle + step
+        r0 = radius + (end_radius - radius) * i / count
+        r1 = radius + (end_radius - radius) * (i + 1) / count
+        c0, s0, c1, s1 = math.cos(a0), math.sin(a0), math.cos(a1), math.sin(a1)
+        p0 = (cx + r0 * c0, cy + r0 * s0)
+        p3 = (cx + r1 * c1, cy + r1 * s1)
+        out.append((p0, (p0[0] - k * r0 * s0, p0[1] + k * r0 * c0), (p3[0] + k * r1 * s1, p3[1] - k * r1 * c1), p3))
+        angle = a1
+    return out
+
+def _arc_between(end, start, node, sweep):
+    # Arc autour du nœud, de la fin réelle d'un décalage au début du suivant :
+    # leurs distances au nœud diffèrent quand l'épaisseur varie, ou quand un
+    # morceau trop court a été omis. Extrémités recopiées telles quelles, pour
+    # un contour fermé au bit près.
+    a0 = math.atan2(end[1] - node[1], end[0] - node[0])
+    r0 = math.hypot(end[0] - node[0], end[1] - node[1])
+    r1 = math.hypot(start[0] - node[0], start[1] - node[1])
+    out = _arc(node[0], node[1], r0, a0, sweep, r1)
+    first = out[0]
+    out[0] = (end, (first[1][0] + end[0] - first[0][0], first[1][1] + end[1] - first[0][1])) + first[2:]
+    last = out[-1]
+    out[-1] = last[:2] + ((last[2][0] + start[0] - last[3][0], last[2][1] + start[1] - last[3][1]), start)
+    return out
+
+def _join(out, node, incoming, outgoing, start, d):
+    # Raccord entre deux décalages qui ne se touchent pas, autour du nœud
+    px, py = node
+    end = out[-1][-1]
+    if math.hypot(start[0] - end[0], start[1] - end[1]) <= JOIN_EPSILON:
+        return
+    ix, iy = incoming
+    ox, oy = outgoing
+    cross = ix * oy - iy * ox
+    # Extérieur du virage (ou demi-tour) : arc autour du nœud
+    if cross * d < 0.0 or abs(cross) < 1e-6 and ix * ox + iy * oy < 0.0:
+        a0 = math.atan2(end[1] - py, end[0] - px)
+        a1 = math.atan2(start[1] - py, start[0] - px)
+        sweep = a1 - a0
+        if d < 0.0 and sweep <= 0.0:
+            sweep += 2.0 * math.pi
+        elif d > 0.0 and sweep >= 0.0:
+            sweep -= 2.0 * math.pi
+        out.extend(_arc_between(end, start, node, sweep))
+    else:
+        out.append((end, (px, py)))
+        out.append(((px, py), start))
+
+def _negate(radius):
+    if callable(radius):
+        return lambda t: -radius(t)
+    return -radius
+
+def _side(segments, radii, tolerance):
+    # Côté droit d'une chaîne de segments, jonctions comprises ; radii : une
+    # demi-épaisseur par segment (nombre ou fonction de t). Les raccords
+    # valent aussi entre les morceaux d'un même segment (point de
+    # rebroussement au milieu d'une cubique).
+    out = []
+    previous = None
+    for seg, radius in zip(segments, radii):
+        for piece, approx, d in offset_segment(seg, _negate(radius), tolerance):
+            if out:
+                _join(out, piece[0], previous, _tangent(piece, 0.0), approx[0], d)
+                # Départ recollé sur la fin du contour (écart sous JOIN_EPSILON)
+                end = out[-1][-1]
+                approx = (end, (approx[1][0] + end[0] - approx[0][0], approx[1][1] + end[1] - approx[0][1])) + approx[2:]
+            out.append(approx)
+            previous = _tangent(piece, 1.0)
+    return out
+
+def _cap(end, start, node):
+    # Bout rond autour de l'extrémité du tracé, de la fin d'un côté au début
+    # de l'autre, dans le sens inverse des aiguilles d'une montre
+    a0 = math.atan2(end[1] - node[1], end[0] - node[0])
+    a1 = math.atan2(start[1] - node[1], start[0] - node[0])
+    sweep = a1 - a0
+    if sweep <= 0.0:
+        sweep += 2.0 * math.pi
+    return _arc_between(end, start, node, sweep)
+
+def _reverse(seg):
+    return seg[::-1]
+
+
+# ----------------------------------------------------------
+# Contour complet
+# ----------------------------------------------------------
+def stroke_segments(nodes):
+    # Nœuds d'un chemin ouvert [(x, y, type)] → cubiques ; les lignes sont
+    # converties en cubiques aux tiers pour être décalées de la même façon
+    segments = []
+    start = None
+    controls = []
+    for x, y, node_type in nodes:
+        if node_type == OFFCURVE:
+            controls.append((x, y))
+            continue
+        if start is not None:
+            if node_type == CURVE and len(controls) == 2:
+                seg = (start, controls[0], controls[1], (x, y))
+            else:
+                (x0, y0) = start
+                seg = (start, (x0 + (x - x0) / 3.0, y0 + (y - y0) / 3.0), (x0 + (x - x0) * 2.0 / 3.0, y0 + (y - y0) * 2.0 / 3.0), (x, y))
+            if not _is_degenerate(seg):
+                segments.append(seg)
+        start = (x, y)
+        controls = []
+    return segments
+
+def _segment_length(seg, steps=8):
+    length = 0.0
+    x0, y0 = seg[0]
+    for k in range(1, steps + 1):
+        x1, y1 = _point(seg, k / steps)
+        length += math.hypot(x1 - x0, y1 - y0)
+        x0, y0 = x1, y1
+    return length
+
+def _radius_profile(segments, radius, keyframes):
+    # (segments, demi-épaisseur de chacun en fonction de t) : clés
+    # [(u, facteur)] placées à l'abscisse curviligne relative u du tracé, t
+    # supposé proportionnel à la longueur dans un segment. Les segments sont
+    # coupés aux clés : l'épaisseur y est linéaire, son décalage sans angle.
+    lengths = [_segment_length(seg) for seg in segments]
+    total = sum(lengths)
+    if total <= 0.0:
+        return segments, [radius * width_at(keyframes, 0.0)] * len(segments)
+    pieces, radii = [], []
+    u = 0.0
+    for seg, length in zip(segments, lengths):
+        u0, u1 = u, u + length / total
+        u = u1
+        # Clés strictement dans le segment, en t croissant
+        cuts = [(key - u0) / (u1 - u0) for key, _ in keyframes if u0 < key < u1] if u1 > u0 else []
+        t0 = 0.0
+        for t1 in cuts + [1.0]:
+            if t1 - t0 < 1e-6:
+                continue
+            if t1 < 1.0:
+                piece, seg = _split_at(seg, (t1 - t0) / (1.0 - t0))
+            else:
+                piece = seg
+            a, b = u0 + (u1 - u0) * t0, u0 + (u1 - u0) * t1
+            pieces.append(piece)
+            radii.append(lambda t, a=a, b=b: radius * width_at(keyframes, a + (b - a) * t))
+            t0 = t1
+    return pieces, radii
+
+def expand_stroke(segments, width, tolerance=TOLERANCE, keyframes=None):
+    # Segments du contour fermé (lignes : 2 points, cubiques : 4), dans
+    # l'ordre ; chacun commence où le précédent finit, le dernier finit au début
+    segments = [seg for seg in segments if not _is_degenerate(seg)]
+    if not segments or width <= 0:
+        return []
+    radius = width * 0.5
+    if keyframes:
+        segments, radii = _radius_profile(segments, radius, keyframes)
+        start_radius, end_radius = _at(radii[0], 0.0), _at(radii[-1], 1.0)
+        reversed_radii = [lambda t, r=r: r(1.0 - t) if callable(r) else r for r in reversed(radii)]
+    else:
+        radii = reversed_radii = [radius] * len(segments)
+        start_radius = end_radius = radius
+    right = _side(segments, radii, tolerance)
+    left = _side([_reverse(seg) for seg in reversed(segments)], reversed_radii, tolerance)
+    if not right or not left:
+        # Tracé plus court que la tolérance : un point rond
+        x, y = segments[0][0]
+        return _arc(x, y, max(start_radius, end_radius), 0.0, 2.0 * math.pi)
+    start, end = segments[0][0], segments[-1][-1]
+    return right + _cap(right[-1][-1], left[0][0], end) + left + _cap(left[-1][-1], right[0][0], start)
+
+def outline_nodes(contour):
+    # Nœuds d'un GSPath fermé [(Point, type, smooth)] : le dernier nœud est le
+    # point de départ, comme dans Glyphs
+    nodes = []
+    count = len(contour)
+    for i, seg in enumerate(contour):
+        following = contour[(i + 1) % count]
+        if len(seg) == 4:
+            nodes.append((Point(*seg[1]), OFFCURVE, False))
+            nodes.append((Point(*seg[2]), OFFCURVE, False))
+        incoming = _unit(seg[-1][0] - seg[-2][0], seg[-1][1] - seg[-2][1])
+        outgoing = _unit(following[1][0] - following[0][0], following[1][1] - following[0][1])
+        smooth = incoming is not None and outgoing is not None and incoming[0] * outgoing[0] + incoming[1] * outgoing[1] > 0.9999
+        nodes.append((Point(*seg[-1]), CURVE if len(seg) == 4 else LINE, smooth))
+    return nodes
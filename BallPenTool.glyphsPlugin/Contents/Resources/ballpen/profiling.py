@@ -0,0 +1,177 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — mesure du temps passé dans chaque étape (optionnelle)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import json, time
+from array import array
+from collections import OrderedDict
+
+# Désactivée, la mesure ne coûte rien : les étapes de ballpen.core sont
+# remplacées par des versions chronométrées seulement pendant install(), et
+# les fonctions d'origine sont remises par uninstall(). Chaque étape garde ses
+# derniers appels dans un tampon circulaire (durée, éléments en entrée / en
+# sortie), sans allocation par appel.
+CAPACITY = 512
+
+# Ordre d'affichage : pipeline, puis étapes mesurées par plugin.py
+STAGES = (
+    "simplify_ends", "simplify", "cleanup_endpoints", "trim_ends", "b_spline_to_bezier",
+    "least_squares_to_bezier", "apply_clamping", "preview", "draw", "fit", "nodes", "widths", "outline", "commit",
+)
+
+
+class RingBuffer(object):
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.calls = 0            # nombre total d'appels, y compris ceux écrasés
+        self.seconds = array("d", bytes(8 * capacity))
+        self.counts_in = array("l", [0] * capacity)
+        self.counts_out = array("l", [0] * capacity)
+
+    def __len__(self):
+        return min(self.calls, self.capacity)
+
+    def add(self, seconds, count_in, count_out):
+        i = self.calls % self.capacity
+        self.seconds[i] = seconds
+        self.counts_in[i] = count_in
+        self.counts_out[i] = count_out
+        self.calls += 1
+
+    def percentile(self, q):
+        n = len(self)
+        if not n:
+            return None
+        values = sorted(self.seconds[:n])
+        return values[min(n - 1, int(q * n))]
+
+    def samples(self):
+        # Du plus ancien au plus récent
+        n = len(self)
+        start = self.calls % self.capacity if self.calls > self.capacity else 0
+        order = [(start + k) % self.capacity for k in range(n)]
+        return [(self.seconds[i], self.counts_in[i], self.counts_out[i]) for i in order]
+
+
+def _first_len(result):
+    return len(result[0])
+
+def _timed(profiler, stage, func, count_arg, count_out):
+    clock = time.perf_counter
+    record = profiler.record
+    def timed(*args, **kwargs):
+        t0 = clock()
+        result = func(*args, **kwargs)
+        record(stage, clock() - t0, len(args[count_arg]), count_out(result))
+        return result
+    timed.__wrapped__ = func
+    return timed
+
+
+class Profiler(object):
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.stages = OrderedDict((stage, RingBuffer(capacity)) for stage in STAGES)
+        self.frames = array("d", bytes(8 * capacity))   # horodatage des redessins
+        self.frame_count = 0
+        self.started = time.time()
+        self._installed = []
+
+    def record(self, stage, seconds, count_in=0, count_out=0):
+        ring = self.stages.get(stage)
+        if ring is None:
+            ring = self.stages[stage] = RingBuffer(self.capacity)
+        ring.add(seconds, count_in, count_out)
+
+    def frame(self, timestamp=None):
+        self.frames[self.frame_count % self.capacity] = time.perf_counter() if timestamp is None else timestamp
+        self.frame_count += 1
+
+    def redraw_rate(self):
+        # Redessins par seconde sur les derniers horodatages
+        n = min(self.frame_count, self.capacity)
+        if n < 2:
+            return 0.0
+        last = (self.frame_count - 1) % self.capacity
+        first = (self.frame_count - n) % self.capacity
+        span = self.frames[last] - self.frames[first]
+        return (n - 1) / span if span > 0 else 0.0
+
+    # ----------------------------------------------------------
+    # Branchement sur ballpen.core (et le noyau NumPy s'il est disponible)
+    # ----------------------------------------------------------
+    def hooks(self):
+        from ballpen import core
+        hooks = [
+            # (objet, attribut, étape, argument compté en entrée, compte en sortie)
+            (core, "simplify_ends_indices", "simplify_ends", 0, len),
+            (core, "simplify_indices", "simplify", 0, len),
+            (core, "cleanup_endpoints", "cleanup_endpoints", 0, len),
+            (core, "trim_ends", "trim_ends", 0, len),
+            (core, "b_spline_to_bezier", "b_spline_to_bezier", 0, len),
+            (core, "least_squares_to_bezier", "least_squares_to_bezier", 0, len),
+            (core, "apply_clamping", "apply_clamping", 0, _first_len),
+            (core.StrokeEngine, "_end_indices", "simplify_ends", 1, len),
+            (core.StrokeEngine, "_simplify", "simplify", 1, len),
+        ]
+        vectorized = core.vectorized_backend()
+        if vectorized is not None:
+            hooks += [
+                (vectorized, "simplify_ends", "simplify_ends", 0, len),
+                (vectorized, "rdp_simplify", "simplify", 0, len),
+                (vectorized, "cleanup_endpoints", "cleanup_endpoints", 0, len),
+                (vectorized, "trim_ends", "trim_ends", 0, len),
+                (vectorized, "b_spline_to_bezier", "b_spline_to_bezier", 0, len),
+                (vectorized, "apply_clamping", "apply_clamping", 0, _first_len),
+            ]
+        return hooks
+
+    def install(self):
+        if self._installed:
+            return
+        for owner, name, stage, count_arg, count_out in self.hooks():
+            func = owner.__dict__[name]
+            setattr(owner, name, _timed(self, stage, func, count_arg, count_out))
+            self._installed.append((owner, name, func))
+
+    def uninstall(self):
+        while self._installed:
+            owner, name, func = self._installed.pop()
+            setattr(owner, name, func)
+
+    # ----------------------------------------------------------
+    # Rapport
+    # ----------------------------------------------------------
+    def summary(self):
+        # [(étape, appels, p50 ms, p95 ms)] pour les étapes déjà appelées
+        rows = []
+        for stage, ring in self.stages.items():
+            if len(ring):
+                rows.append((stage, ring.calls, ring.percentile(0.5) * 1000.0, ring.percentile(0.95) * 1000.0))
+        return rows
+
+    def report(self):
+        stages = OrderedDict()
+        for stage, ring in self.stages.items():
+            if not len(ring):
+                continue
+            samples = ring.samples()
+            stages[stage] = {
+                "calls": ring.calls,
+                "p50_ms": ring.percentile(0.5) * 1000.0,
+                "p95_ms": ring.percentile(0.95) * 1000.0,
+                "max_ms": max(s[0] for s in samples) * 1000.0,
+                "mean_in": sum(s[1] for s in samples) / len(samples),
+                "mean_out": sum(s[2] for s in samples) / len(samples),
+                "samples": [[s[0] * 1000.0, s[1], s[2]] for s in samples],
+            }
+        return {"started": self.started, "redraws": self.frame_count, "redraws_per_second": self.redraw_rate(), "stages": stages}
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
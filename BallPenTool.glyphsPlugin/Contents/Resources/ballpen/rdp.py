@@ -0,0 +1,91 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — simplification Ramer-Douglas-Peucker itérative
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+
+# ----------------------------------------------------------
+# RDP sur un tampon partagé
+# ----------------------------------------------------------
+# Les coordonnées sont lues dans xs / ys par plages d'index : pas de copie de
+# liste, pas de récursion (les longs traits presque droits dépassaient la
+# limite de récursion de Python). Le résultat est identique à la version
+# récursive : mêmes calculs de distance, même choix du point le plus éloigné.
+def rdp_indices(xs, ys, epsilon, first=0, last=None):
+    if last is None:
+        last = len(xs) - 1
+    if last - first < 2:
+        return list(range(first, last + 1))
+    kept = []
+    # La plage de gauche est dépilée en premier : les index sortent triés
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        x1, y1 = xs[a], ys[a]
+        dx = xs[b] - x1
+        dy = ys[b] - y1
+        length2 = dx * dx + dy * dy
+        dmax = 0.0
+        index = 0
+        for i in range(a + 1, b):
+            x, y = xs[i], ys[i]
+            if dx == 0 and dy == 0:
+                d = math.hypot(x - x1, y - y1)
+            else:
+                t = ((x - x1) * dx + (y - y1) * dy) / length2
+                t = max(0.0, min(1.0, t))
+                d = math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+            if d > dmax:
+                index = i
+                dmax = d
+        if dmax > epsilon:
+            stack.append((index, b))
+            stack.append((a, index))
+        else:
+            kept.append(a)
+    kept.append(last)
+    return kept
+
+# ----------------------------------------------------------
+# Hiérarchie de simplification
+# ----------------------------------------------------------
+# Même découpage que rdp_indices, poussé jusqu'au bout une seule fois : chaque
+# point reçoit l'epsilon à partir duquel RDP le supprime (la plus petite
+# distance maximale de son découpage et de ceux qui l'ont précédé). Pour tout
+# epsilon, rdp_indices(xs, ys, epsilon) == [i for i, w in enumerate(levels) if w > epsilon].
+def rdp_importance(xs, ys):
+    n = len(xs)
+    levels = [0.0] * n
+    if n:
+        levels[0] = levels[-1] = float("inf")
+    stack = [(0, n - 1, float("inf"))]
+    while stack:
+        a, b, bound = stack.pop()
+        if b - a < 2:
+            continue
+        x1, y1 = xs[a], ys[a]
+        dx = xs[b] - x1
+        dy = ys[b] - y1
+        length2 = dx * dx + dy * dy
+        dmax = 0.0
+        index = 0
+        for i in range(a + 1, b):
+            x, y = xs[i], ys[i]
+            if dx == 0 and dy == 0:
+                d = math.hypot(x - x1, y - y1)
+            else:
+                t = ((x - x1) * dx + (y - y1) * dy) / length2
+                t = max(0.0, min(1.0, t))
+                d = math.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+            if d > dmax:
+                index = i
+                dmax = d
+        if dmax > 0.0:
+            level = min(dmax, bound)
+            levels[index] = level
+            stack.append((index, b, level))
+            stack.append((a, index, level))
+    return levels
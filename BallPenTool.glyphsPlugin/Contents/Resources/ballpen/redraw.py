@@ -0,0 +1,125 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — regroupement des redessins pendant le tracé
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+
+# Une tablette envoie 200 mouseDragged_ par seconde ou plus : les échantillons
+# reçus pendant une image sont regroupés en un seul redessin, limité aux
+# segments de l'aperçu qui ont changé depuis l'image précédente (anciens et
+# nouveaux, pour effacer les uns et dessiner les autres). Les segments sont
+# comparés par valeur : apply_clamping et trim_ends recréent le premier
+# segment à chaque image sans le changer. La queue n'est pas seule à bouger
+# (cleanup_endpoints peut retirer un point ancien quand la fin du tracé
+# repasse près de lui, la simplification peut déplacer un point du milieu) :
+# chaque suite de segments modifiés consécutifs a son propre rectangle, pour
+# ne pas invalider tout le tracé entre deux changements éloignés. Avec une
+# épaisseur variable, chaque segment est comparé avec son épaisseur : elle
+# dépend de l'abscisse relative, qui change pour tout le tracé quand il
+# s'allonge, même si le segment ne bouge pas. Coordonnées du calque ; la
+# conversion vers la vue et la temporisation restent dans plugin.py.
+FRAME_INTERVAL = 1.0 / 60
+MAX_RECTS = 8             # au-delà, un seul rectangle : autant d'appels coûtent plus qu'ils n'économisent
+
+
+def segment_bounds(segments, skip):
+    # Boîte des segments absents de `skip` (ensemble de segments), ou None ;
+    # une cubique reste dans l'enveloppe convexe de ses points de contrôle
+    xmin = ymin = float("inf")
+    xmax = ymax = float("-inf")
+    for seg in segments:
+        if seg in skip:
+            continue
+        for p in seg:
+            if p.x < xmin: xmin = p.x
+            if p.x > xmax: xmax = p.x
+            if p.y < ymin: ymin = p.y
+            if p.y > ymax: ymax = p.y
+    if xmin > xmax:
+        return None
+    return xmin, ymin, xmax, ymax
+
+def changed_runs(segments, skip, keys=None):
+    # Boîtes des suites consécutives de segments dont la clé (le segment
+    # lui-même par défaut) est absente de `skip`
+    rects = []
+    run = []
+    for seg, key in zip(segments, segments if keys is None else keys):
+        if key in skip:
+            if run:
+                rects.append(segment_bounds(run, ()))
+                run = []
+        else:
+            run.append(seg)
+    if run:
+        rects.append(segment_bounds(run, ()))
+    return rects
+
+def union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+def inflate(rect, padding):
+    return rect[0] - padding, rect[1] - padding, rect[2] + padding, rect[3] + padding
+
+def overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def merge(rects):
+    # Fusionne les rectangles qui se recouvrent (il y en a peu par image)
+    merged = []
+    for rect in rects:
+        while True:
+            for i, other in enumerate(merged):
+                if overlaps(rect, other):
+                    rect = union(rect, merged.pop(i))
+                    break
+            else:
+                break
+        merged.append(rect)
+    return merged
+
+
+class RedrawScheduler(object):
+
+    def __init__(self, interval=FRAME_INTERVAL):
+        self.interval = interval
+        self.pending = False      # un redessin est déjà programmé pour cette image
+        self._last_flush = None
+        self._drawn = []          # segments de l'image précédente
+        self._keys = []           # et leurs clés de comparaison
+
+    def reset(self):
+        self.pending = False
+        self._drawn = []
+        self._keys = []
+
+    def delay(self, now):
+        # Attente avant le prochain redessin (0 : tout de suite)
+        if self._last_flush is None:
+            return 0.0
+        return max(0.0, self._last_flush + self.interval - now)
+
+    def flush(self, now, segments, padding, widths=None):
+        # Rectangles à invalider [(xmin, ymin, xmax, ymax)], vide si rien n'a
+        # changé ; widths : épaisseur de chaque segment si elle varie
+        self.pending = False
+        self._last_flush = now
+        keys = segments if widths is None else list(zip(segments, widths))
+        drawn, drawn_keys = self._drawn, self._keys
+        old = changed_runs(drawn, set(keys), drawn_keys)
+        new = changed_runs(segments, set(drawn_keys), keys)
+        self._drawn = segments
+        self._keys = keys
+        rects = merge([inflate(rect, padding) for rect in old + new])
+        if len(rects) > MAX_RECTS:
+            dirty = None
+            for rect in rects:
+                dirty = union(dirty, rect)
+            rects = [dirty]
+        return rects
@@ -0,0 +1,196 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — ajustement de courbes de Bézier par moindres carrés (Schneider)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+
+# ----------------------------------------------------------
+# Ajustement à erreur bornée
+# ----------------------------------------------------------
+# D'après P. J. Schneider, « An Algorithm for Automatically Fitting Digitized
+# Curves » (Graphics Gems, 1990) : une cubique par plage de points, ajustée par
+# moindres carrés avec des tangentes imposées aux extrémités ; si l'écart
+# maximal dépasse la tolérance, quelques itérations de Newton-Raphson sur le
+# paramétrage, puis découpe au point le plus éloigné. Les deux moitiés
+# partagent la même tangente au point de découpe (continuité G1). Pile au lieu
+# de récursion, comme rdp_indices. Les segments sont rendus en tuples de
+# quatre couples (x, y), dans l'ordre du tracé.
+#
+# L'écart n'est pas mesuré qu'aux points : des poignées très longues font
+# passer la cubique par chaque point mais boucler entre deux. Les poignées
+# sont donc limitées à MAX_HANDLE × la corde (au-delà, heuristique), et la
+# cubique est aussi évaluée au milieu de deux paramètres consécutifs, à
+# comparer au segment qui relie les deux points (les points d'entrée sont
+# assez serrés pour que ce segment suive la courbe d'origine).
+MAX_ITERATIONS = 4       # Newton-Raphson avant de découper
+ITERATION_FACTOR = 4.0   # au-delà de 4× la tolérance, découpe directe
+MAX_HANDLE = 2.0         # longueur de poignée maximale, en cordes
+MAX_SHORTENING = 8       # divisions par deux des poignées d'une plage de deux points
+
+def _normalize(x, y):
+    length = math.hypot(x, y)
+    if length < 1e-12:
+        return 0.0, 0.0
+    return x / length, y / length
+
+def _tangent(xs, ys, i, step, stop, radius):
+    # Direction de i vers le premier point distant d'au moins `radius` :
+    # le bruit de la tablette ne décide pas seul de la tangente
+    j = i + step
+    while j != stop and math.hypot(xs[j] - xs[i], ys[j] - ys[i]) < radius:
+        j += step
+    if j == stop:
+        j -= step
+    return _normalize(xs[j] - xs[i], ys[j] - ys[i])
+
+def _center_tangent(xs, ys, i, first, last, radius):
+    lx, ly = _tangent(xs, ys, i, -1, first - 1, radius)
+    rx, ry = _tangent(xs, ys, i, 1, last + 1, radius)
+    tx, ty = _normalize(lx - rx, ly - ry)
+    if tx == 0.0 and ty == 0.0:
+        # Rebroussement : la tangente de gauche suffit
+        return lx, ly
+    return tx, ty
+
+def _chord_parameters(xs, ys, first, last):
+    u = [0.0]
+    for i in range(first + 1, last + 1):
+        u.append(u[-1] + math.hypot(xs[i] - xs[i - 1], ys[i] - ys[i - 1]))
+    total = u[-1]
+    if total == 0.0:
+        return [k / (last - first) for k in range(last - first + 1)]
+    return [v / total for v in u]
+
+def _bezier_point(bez, t):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = bez
+    s = 1.0 - t
+    b0, b1, b2, b3 = s * s * s, 3.0 * s * s * t, 3.0 * s * t * t, t * t * t
+    return b0 * x0 + b1 * x1 + b2 * x2 + b3 * x3, b0 * y0 + b1 * y1 + b2 * y2 + b3 * y3
+
+def _heuristic(x0, y0, x3, y3, t1, t2, alpha=None):
+    if alpha is None:
+        alpha = math.hypot(x3 - x0, y3 - y0) / 3.0
+    return ((x0, y0), (x0 + t1[0] * alpha, y0 + t1[1] * alpha), (x3 + t2[0] * alpha, y3 + t2[1] * alpha), (x3, y3))
+
+def _generate(xs, ys, first, last, u, t1, t2):
+    x0, y0, x3, y3 = xs[first], ys[first], xs[last], ys[last]
+    c00 = c01 = c11 = x0_ = x1_ = 0.0
+    for k, t in enumerate(u):
+        s = 1.0 - t
+        b0, b1, b2, b3 = s * s * s, 3.0 * s * s * t, 3.0 * s * t * t, t * t * t
+        a1x, a1y = t1[0] * b1, t1[1] * b1
+        a2x, a2y = t2[0] * b2, t2[1] * b2
+        c00 += a1x * a1x + a1y * a1y
+        c01 += a1x * a2x + a1y * a2y
+        c11 += a2x * a2x + a2y * a2y
+        i = first + k
+        tx = xs[i] - (x0 * (b0 + b1) + x3 * (b2 + b3))
+        ty = ys[i] - (y0 * (b0 + b1) + y3 * (b2 + b3))
+        x0_ += a1x * tx + a1y * ty
+        x1_ += a2x * tx + a2y * ty
+    det = c00 * c11 - c01 * c01
+    if abs(det) > 1e-12:
+        alpha_l = (x0_ * c11 - x1_ * c01) / det
+        alpha_r = (c00 * x1_ - c01 * x0_) / det
+    else:
+        alpha_l = alpha_r = 0.0
+    # Poignées nulles, retournées ou démesurées : retour à l'heuristique de
+    # Wu / Barsky (l'écart mesuré ensuite décide s'il faut découper)
+    seg_length = math.hypot(x3 - x0, y3 - y0)
+    if alpha_l < 1e-6 * seg_length or alpha_r < 1e-6 * seg_length:
+        return _heuristic(x0, y0, x3, y3, t1, t2)
+    if alpha_l > MAX_HANDLE * seg_length or alpha_r > MAX_HANDLE * seg_length:
+        return _heuristic(x0, y0, x3, y3, t1, t2)
+    return ((x0, y0), (x0 + t1[0] * alpha_l, y0 + t1[1] * alpha_l), (x3 + t2[0] * alpha_r, y3 + t2[1] * alpha_r), (x3, y3))
+
+def _segment_distance2(x, y, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0.0 else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length2))
+    return (x - ax - t * dx) ** 2 + (y - ay - t * dy) ** 2
+
+def _max_error(xs, ys, first, last, bez, u):
+    # Carré de l'écart maximal, aux points et entre eux, et point de découpe
+    # (intérieur à la plage)
+    max_dist = 0.0
+    split = (first + last) // 2
+    for k in range(1, len(u) - 1):
+        x, y = _bezier_point(bez, u[k])
+        dist = (x - xs[first + k]) ** 2 + (y - ys[first + k]) ** 2
+        if dist >= max_dist:
+            max_dist = dist
+            split = first + k
+    for k in range(len(u) - 1):
+        i = first + k
+        x, y = _bezier_point(bez, (u[k] + u[k + 1]) * 0.5)
+        dist = _segment_distance2(x, y, xs[i], ys[i], xs[i + 1], ys[i + 1])
+        if dist > max_dist:
+            max_dist = dist
+            split = min(max(i + 1, first + 1), last - 1)
+    return max_dist, split
+
+def _reparameterize(xs, ys, first, bez, u):
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = bez
+    # Dérivées première et seconde (coefficients constants sur la plage)
+    d1 = ((x1 - x0) * 3.0, (y1 - y0) * 3.0), ((x2 - x1) * 3.0, (y2 - y1) * 3.0), ((x3 - x2) * 3.0, (y3 - y2) * 3.0)
+    d2 = ((d1[1][0] - d1[0][0]) * 2.0, (d1[1][1] - d1[0][1]) * 2.0), ((d1[2][0] - d1[1][0]) * 2.0, (d1[2][1] - d1[1][1]) * 2.0)
+    result = []
+    for k, t in enumerate(u):
+        s = 1.0 - t
+        px, py = _bezier_point(bez, t)
+        q1x = s * s * d1[0][0] + 2.0 * s * t * d1[1][0] + t * t * d1[2][0]
+        q1y = s * s * d1[0][1] + 2.0 * s * t * d1[1][1] + t * t * d1[2][1]
+        q2x = s * d2[0][0] + t * d2[1][0]
+        q2y = s * d2[0][1] + t * d2[1][1]
+        dx, dy = px - xs[first + k], py - ys[first + k]
+        numerator = dx * q1x + dy * q1y
+        denominator = q1x * q1x + q1y * q1y + dx * q2x + dy * q2y
+        result.append(t - numerator / denominator if denominator != 0.0 else t)
+    return result
+
+def fit_cubics(xs, ys, error, first=0, last=None):
+    if last is None:
+        last = len(xs) - 1
+    if last - first < 1:
+        return []
+    error2 = error * error
+    radius = max(error, 1.0)
+    t1 = _tangent(xs, ys, first, 1, last + 1, radius)
+    t2 = _tangent(xs, ys, last, -1, first - 1, radius)
+    beziers = []
+    # La plage de gauche est dépilée en premier : les segments sortent dans l'ordre
+    stack = [(first, last, t1, t2)]
+    while stack:
+        a, b, t1, t2 = stack.pop()
+        if b - a == 1:
+            # Plus rien à découper : poignées raccourcies (même direction, G1
+            # gardée) jusqu'à rester à la tolérance de la corde
+            alpha = math.hypot(xs[b] - xs[a], ys[b] - ys[a]) / 3.0
+            bez = _heuristic(xs[a], ys[a], xs[b], ys[b], t1, t2, alpha)
+            for _ in range(MAX_SHORTENING):
+                if _max_error(xs, ys, a, b, bez, (0.0, 1.0))[0] <= error2:
+                    break
+                alpha *= 0.5
+                bez = _heuristic(xs[a], ys[a], xs[b], ys[b], t1, t2, alpha)
+            beziers.append(bez)
+            continue
+        u = _chord_parameters(xs, ys, a, b)
+        bez = _generate(xs, ys, a, b, u, t1, t2)
+        max_dist, split = _max_error(xs, ys, a, b, bez, u)
+        if max_dist > error2 and max_dist < error2 * ITERATION_FACTOR:
+            for _ in range(MAX_ITERATIONS):
+                u = _reparameterize(xs, ys, a, bez, u)
+                bez = _generate(xs, ys, a, b, u, t1, t2)
+                max_dist, split = _max_error(xs, ys, a, b, bez, u)
+                if max_dist <= error2:
+                    break
+        if max_dist <= error2:
+            beziers.append(bez)
+            continue
+        tx, ty = _center_tangent(xs, ys, split, a, b, radius)
+        stack.append((split, b, (-tx, -ty), t2))
+        stack.append((a, split, t1, (tx, ty)))
+    return beziers
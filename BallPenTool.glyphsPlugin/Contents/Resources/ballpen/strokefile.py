@@ -0,0 +1,214 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — format d'enregistrement des tracés bruts (.bpstroke)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import base64, os, struct, sys
+from array import array
+
+# Un fichier = un tracé, tel que reçu par mouseDown_ / mouseDragged_ :
+#
+#   en-tête  "BPS1", version (H), drapeaux (H), nombre de points (I),
+#            strokeWidth (d), simplifyEpsilon (d)        — little-endian
+#   données  x[n], y[n] en float32, puis t[n] (secondes depuis mouseDown_)
+#            et pression[n] en float32 si les drapeaux les annoncent
+MAGIC = b"BPS1"
+VERSION = 1
+HAS_TIMES = 1
+HAS_PRESSURES = 2
+EXTENSION = ".bpstroke"
+_HEADER = struct.Struct("<4sHHIdd")
+
+# Variante compacte, gardée dans les userData du GSPath créé par mouseUp_ :
+# même en-tête (magie "BPQ1"), puis chaque colonne quantifiée en entiers,
+# codée en différences successives (zigzag + varint) ; le tout en base64.
+PACKED_MAGIC = b"BPQ1"
+COORDINATE_STEP = 1.0 / 64   # unités de fonte
+TIME_STEP = 0.001            # secondes
+PRESSURE_STEP = 1.0 / 1024
+
+
+class RecordedStroke(object):
+
+    def __init__(self, xs, ys, times=None, pressures=None, stroke_width=20.0, simplify_epsilon=2.0):
+        self.xs = xs
+        self.ys = ys
+        self.times = times
+        self.pressures = pressures
+        self.strokeWidth = stroke_width
+        self.simplifyEpsilon = simplify_epsilon
+
+    def __len__(self):
+        return len(self.xs)
+
+    def to_buffer(self):
+        from ballpen.buffer import StrokeBuffer
+        buffer = StrokeBuffer(max(1, len(self.xs)), pressures=self.pressures is not None, times=self.times is not None)
+        times = self.times or [0.0] * len(self.xs)
+        pressures = self.pressures or [0.0] * len(self.xs)
+        for x, y, t, p in zip(self.xs, self.ys, times, pressures):
+            buffer.append(x, y, p, t)
+        return buffer
+
+    def reversed(self):
+        # Même tracé parcouru à l'envers, horodatage toujours croissant
+        times = None
+        if self.times:
+            end = self.times[-1]
+            times = [end - t for t in reversed(self.times)]
+        pressures = list(reversed(self.pressures)) if self.pressures else None
+        return RecordedStroke(list(reversed(self.xs)), list(reversed(self.ys)), times, pressures, self.strokeWidth, self.simplifyEpsilon)
+
+    def joined(self, other):
+        # Tracé suivi de `other` (chemins raccordés, voir ballpen/endpoints.py)
+        times = pressures = None
+        if self.times and other.times:
+            end = self.times[-1]
+            times = list(self.times) + [end + t for t in other.times]
+        if self.pressures and other.pressures:
+            pressures = list(self.pressures) + list(other.pressures)
+        return RecordedStroke(list(self.xs) + list(other.xs), list(self.ys) + list(other.ys), times, pressures, self.strokeWidth, self.simplifyEpsilon)
+
+    @classmethod
+    def from_buffer(cls, buffer, stroke_width=20.0, simplify_epsilon=2.0):
+        xs, ys = buffer.coordinates()
+        times = buffer.times()
+        if times:
+            # Horodatage relatif au premier échantillon
+            t0 = times[0]
+            times = [t - t0 for t in times]
+        return cls(xs, ys, times, buffer.pressures(), stroke_width, simplify_epsilon)
+
+
+def _column(values, count):
+    column = array("f", values)
+    if len(column) != count:
+        raise ValueError("Column has %d values, expected %d" % (len(column), count))
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+def dumps(stroke):
+    count = len(stroke.xs)
+    flags = (HAS_TIMES if stroke.times else 0) | (HAS_PRESSURES if stroke.pressures else 0)
+    chunks = [_HEADER.pack(MAGIC, VERSION, flags, count, stroke.strokeWidth, stroke.simplifyEpsilon), _column(stroke.xs, count), _column(stroke.ys, count)]
+    if flags & HAS_TIMES:
+        chunks.append(_column(stroke.times, count))
+    if flags & HAS_PRESSURES:
+        chunks.append(_column(stroke.pressures, count))
+    return b"".join(chunks)
+
+def loads(data):
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated stroke header")
+    magic, version, flags, count, stroke_width, simplify_epsilon = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a BallPen stroke file")
+    if version > VERSION:
+        raise ValueError("Unsupported stroke file version %d" % version)
+    columns = []
+    offset = _HEADER.size
+    for _ in range(2 + bool(flags & HAS_TIMES) + bool(flags & HAS_PRESSURES)):
+        column = array("f")
+        column.frombytes(data[offset:offset + 4 * count])
+        if len(column) != count:
+            raise ValueError("Truncated stroke data")
+        if sys.byteorder != "little":
+            column.byteswap()
+        columns.append(column.tolist())
+        offset += 4 * count
+    xs, ys = columns[0], columns[1]
+    times = columns[2] if flags & HAS_TIMES else None
+    pressures = columns[-1] if flags & HAS_PRESSURES else None
+    return RecordedStroke(xs, ys, times, pressures, stroke_width, simplify_epsilon)
+
+def write_stroke(path, stroke):
+    with open(path, "wb") as f:
+        f.write(dumps(stroke))
+
+def read_stroke(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def iter_stroke_files(directory):
+    # Parcours trié et paresseux : le corpus n'est jamais chargé en entier
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(EXTENSION):
+                yield os.path.join(root, name)
+
+
+# ----------------------------------------------------------
+# Variante compacte (userData)
+# ----------------------------------------------------------
+# Colonne quantifiée au pas `step`, écarts successifs en zigzag + varint
+# (7 bits par octet, bit de poids fort = suite) ; unpack_deltas renvoie les
+# valeurs et le décalage après la colonne
+def pack_deltas(values, step, out):
+    previous = 0
+    for value in values:
+        q = int(round(value / step))
+        delta = q - previous
+        previous = q
+        delta = (delta << 1) ^ (delta >> 63)   # zigzag : petits écarts, petits entiers
+        while delta > 0x7F:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+
+def unpack_deltas(data, offset, count, step):
+    values = []
+    current = 0
+    for _ in range(count):
+        delta = shift = 0
+        while True:
+            if offset >= len(data):
+                raise ValueError("Truncated stroke data")
+            byte = data[offset]
+            offset += 1
+            delta |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        current += (delta >> 1) ^ -(delta & 1)
+        values.append(current * step)
+    return values, offset
+
+def dumps_packed(stroke):
+    count = len(stroke.xs)
+    flags = (HAS_TIMES if stroke.times else 0) | (HAS_PRESSURES if stroke.pressures else 0)
+    out = bytearray(_HEADER.pack(PACKED_MAGIC, VERSION, flags, count, stroke.strokeWidth, stroke.simplifyEpsilon))
+    pack_deltas(stroke.xs, COORDINATE_STEP, out)
+    pack_deltas(stroke.ys, COORDINATE_STEP, out)
+    if flags & HAS_TIMES:
+        pack_deltas(stroke.times, TIME_STEP, out)
+    if flags & HAS_PRESSURES:
+        pack_deltas(stroke.pressures, PRESSURE_STEP, out)
+    return bytes(out)
+
+def loads_packed(data):
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated stroke header")
+    magic, version, flags, count, stroke_width, simplify_epsilon = _HEADER.unpack_from(data)
+    if magic != PACKED_MAGIC:
+        raise ValueError("Not a packed BallPen stroke")
+    if version > VERSION:
+        raise ValueError("Unsupported stroke file version %d" % version)
+    offset = _HEADER.size
+    xs, offset = unpack_deltas(data, offset, count, COORDINATE_STEP)
+    ys, offset = unpack_deltas(data, offset, count, COORDINATE_STEP)
+    times = pressures = None
+    if flags & HAS_TIMES:
+        times, offset = unpack_deltas(data, offset, count, TIME_STEP)
+    if flags & HAS_PRESSURES:
+        pressures, offset = unpack_deltas(data, offset, count, PRESSURE_STEP)
+    return RecordedStroke(xs, ys, times, pressures, stroke_width, simplify_epsilon)
+
+def encode_user_data(stroke):
+    return base64.b64encode(dumps_packed(stroke)).decode("ascii")
+
+def decode_user_data(text):
+    return loads_packed(bytearray(base64.b64decode(text)))
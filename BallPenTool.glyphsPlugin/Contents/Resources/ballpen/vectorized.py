@@ -0,0 +1,209 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — noyau géométrique NumPy (optionnel)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+import numpy as np
+from ballpen.core import MIN_SEGMENT_LENGTH, PINCH_FACTOR, NUM_END_POINTS
+
+# Les traits sont des tableaux (N, 2) en float64, les segments de Bézier des
+# tableaux (M, 4, 2). Chaque étape reproduit l'ordre des opérations de la
+# version pur Python de ballpen/core.py pour donner les mêmes coordonnées.
+
+def as_array(points):
+    if hasattr(points, "coordinates"):
+        # StrokeBuffer : les colonnes sont déjà des float64 contigus
+        xs, ys = points.coordinates()
+        return np.column_stack((np.frombuffer(xs, dtype=np.float64), np.frombuffer(ys, dtype=np.float64)))
+    return np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+# ----------------------------------------------------------
+# Simplification
+# ----------------------------------------------------------
+def segment_distances(xy, a, b):
+    x1, y1 = xy[a]
+    dx = xy[b, 0] - x1
+    dy = xy[b, 1] - y1
+    x = xy[a + 1:b, 0]
+    y = xy[a + 1:b, 1]
+    if dx == 0 and dy == 0:
+        return np.hypot(x - x1, y - y1)
+    t = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+def rdp_indices(xy, epsilon, first=0, last=None):
+    if last is None:
+        last = len(xy) - 1
+    if last - first < 2:
+        return np.arange(first, last + 1)
+    kept = []
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            kept.append(a)
+            continue
+        d = segment_distances(xy, a, b)
+        i = int(np.argmax(d))
+        if d[i] > epsilon:
+            index = a + 1 + i
+            stack.append((index, b))
+            stack.append((a, index))
+        else:
+            kept.append(a)
+    kept.append(last)
+    return np.array(kept, dtype=np.intp)
+
+def rdp_simplify(xy, epsilon):
+    return xy[rdp_indices(xy, epsilon)] if len(xy) else xy
+
+def drop_close(xy, previous=None, tolerance=0.1):
+    # Supprime les points à moins de `tolerance` du dernier point conservé
+    if len(xy) == 0:
+        return xy
+    if previous is None:
+        gaps = np.hypot(*(xy[1:] - xy[:-1]).T)
+        if (gaps > tolerance).all():
+            return xy
+    else:
+        chained = np.vstack((previous.reshape(1, 2), xy))
+        gaps = np.hypot(*(chained[1:] - chained[:-1]).T)
+        if (gaps > tolerance).all():
+            return xy
+    # Cas rare (points confondus) : parcours séquentiel comme la version Python
+    kept = []
+    last = previous
+    for i in range(len(xy)):
+        if last is None or math.hypot(xy[i, 0] - last[0], xy[i, 1] - last[1]) > tolerance:
+            kept.append(i)
+            last = xy[i]
+    return xy[kept]
+
+def simplify_ends(xy, num_points_to_process=NUM_END_POINTS, epsilon_ends=1.0):
+    n = len(xy)
+    if n < 2:
+        return xy.copy()
+    if n <= num_points_to_process * 2:
+        return xy[rdp_indices(xy, epsilon_ends)]
+    simplified_start = xy[rdp_indices(xy[:num_points_to_process], epsilon_ends)]
+    simplified_end = xy[n - num_points_to_process:][rdp_indices(xy[n - num_points_to_process:], epsilon_ends)]
+    new_points = drop_close(simplified_start)
+    junction_start_index = len(simplified_start) - 1
+    junction_end_index = n - len(simplified_end)
+    middle = drop_close(xy[junction_start_index:junction_end_index], new_points[-1])
+    if len(middle):
+        new_points = np.vstack((new_points, middle))
+    end = drop_close(simplified_end, new_points[-1])
+    if len(end):
+        new_points = np.vstack((new_points, end))
+    return new_points
+
+def cleanup_endpoints(xy, min_distance=5.0):
+    if len(xy) < 3:
+        return xy.copy()
+    start_point = xy[0]
+    end_point = xy[-1]
+    inner = xy[1:-1]
+    keep = ~((np.hypot(*(inner - start_point).T) < min_distance) | (np.hypot(*(inner - end_point).T) < min_distance))
+    cleaned = np.vstack((xy[:1], inner[keep]))
+    if math.hypot(end_point[0] - cleaned[-1, 0], end_point[1] - cleaned[-1, 1]) > 1e-6:
+        cleaned = np.vstack((cleaned, xy[-1:]))
+    return cleaned
+
+def trim_ends(xy, trim_length=2.0):
+    if len(xy) < 3:
+        return xy.copy()
+    trim = trim_length * 2.0
+    # Seuls quelques points sont parcourus à chaque extrémité
+    points = xy
+    d = 0
+    for i in range(len(points) - 1):
+        seg_len = math.hypot(points[i + 1, 0] - points[i, 0], points[i + 1, 1] - points[i, 1])
+        if d + seg_len >= trim:
+            ratio = (trim - d) / seg_len
+            new_p = points[i] + (points[i + 1] - points[i]) * ratio
+            points = np.vstack((new_p.reshape(1, 2), points[i + 1:]))
+            break
+        d += seg_len
+    d = 0
+    for i in range(len(points) - 1, 0, -1):
+        seg_len = math.hypot(points[i - 1, 0] - points[i, 0], points[i - 1, 1] - points[i, 1])
+        if d + seg_len >= trim:
+            ratio = (trim - d) / seg_len
+            new_p = points[i] + (points[i - 1] - points[i]) * ratio
+            points = np.vstack((points[:i], new_p.reshape(1, 2)))
+            break
+        d += seg_len
+    if len(points) > 2 and math.hypot(*(points[1] - points[0])) < 0.1:
+        points = points[1:]
+    if len(points) > 2 and math.hypot(*(points[-2] - points[-1])) < 0.1:
+        points = points[:-1]
+    return points
+
+# ----------------------------------------------------------
+# Bézier
+# ----------------------------------------------------------
+def b_spline_to_bezier(xy):
+    n = len(xy)
+    if n < 2:
+        return np.empty((0, 4, 2))
+    if n == 2:
+        p0, p1 = xy
+        return np.array([(p0, p0 + (p1 - p0) * (1 / 3), p0 + (p1 - p0) * (2 / 3), p1)])
+    padded = np.vstack((xy[:1], xy[:1], xy, xy[-1:], xy[-1:]))
+    P0, P1, P2, P3 = padded[:-3], padded[1:-2], padded[2:-1], padded[3:]
+    beziers = np.stack((
+        ((P0 + P1 * 4.0) + P2) / 6.0,
+        (P1 * 4.0 + P2 * 2.0) / 6.0,
+        (P1 * 2.0 + P2 * 4.0) / 6.0,
+        ((P1 + P2 * 4.0) + P3) / 6.0,
+    ), axis=1)
+    moving = (np.abs(beziers[:, 0, 0] - beziers[:, 3, 0]) > 1e-6) | (np.abs(beziers[:, 0, 1] - beziers[:, 3, 1]) > 1e-6)
+    return beziers[moving]
+
+def _clamp_end(anchor, other, handle):
+    # Renvoie la nouvelle poignée et le repère visuel (ou None)
+    vec = other - anchor
+    length = math.hypot(vec[0], vec[1])
+    if length < MIN_SEGMENT_LENGTH:
+        if math.hypot(handle[0] - anchor[0], handle[1] - anchor[1]) > 0.1:
+            return anchor.copy(), anchor.copy()
+        return handle, None
+    if length > 1e-6:
+        max_len = length * PINCH_FACTOR
+        vec_handle = handle - anchor
+        unit = vec / length
+        if vec_handle[0] * unit[0] + vec_handle[1] * unit[1] < 0:
+            handle = anchor + unit * max_len
+            return handle, handle.copy()
+        handle_len = math.hypot(vec_handle[0], vec_handle[1])
+        if handle_len > max_len and handle_len > 1e-6:
+            vec_handle = vec_handle * (max_len / handle_len)
+        new_handle = anchor + vec_handle
+        if math.hypot(new_handle[0] - handle[0], new_handle[1] - handle[1]) > 0.1:
+            return new_handle, new_handle.copy()
+    return handle, None
+
+def apply_clamping(beziers):
+    if not len(beziers):
+        return beziers, None, None
+    beziers = beziers.copy()
+    beziers[0, 1], start = _clamp_end(beziers[0, 0], beziers[0, 3], beziers[0, 1])
+    beziers[-1, 2], end = _clamp_end(beziers[-1, 3], beziers[-1, 0], beziers[-1, 2])
+    return beziers, start, end
+
+# ----------------------------------------------------------
+# Pipeline complet (même ordre que fit_stroke)
+# ----------------------------------------------------------
+def fit_stroke(xy, simplify_epsilon, stroke_width):
+    pre_simplified = simplify_ends(xy, num_points_to_process=NUM_END_POINTS, epsilon_ends=1.0)
+    simplified = rdp_simplify(pre_simplified, simplify_epsilon)
+    if len(simplified) < 2:
+        simplified = pre_simplified.copy()
+    simplified = cleanup_endpoints(simplified, min_distance=5.0)
+    simplified = trim_ends(simplified, trim_length=stroke_width * 0.05)
+    return simplified, b_spline_to_bezier(simplified)
@@ -0,0 +1,71 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — simplification Visvalingam-Whyatt (file de priorité)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import heapq
+
+# ----------------------------------------------------------
+# Suppression par aire effective
+# ----------------------------------------------------------
+# Le point dont le triangle formé avec ses voisins a la plus petite aire est
+# supprimé, puis l'aire de ses deux voisins est recalculée. Voisins chaînés
+# par index (before / after), tas avec entrées périmées ignorées : O(n log n).
+# Les aires sont rendues croissantes (aire effective) : un point n'est jamais
+# supprimé avant un point moins important que lui, et le résultat pour un
+# seuil donné est un filtre sur l'aire effective (visvalingam_levels).
+def _triangle_area(xs, ys, a, b, c):
+    return abs((xs[b] - xs[a]) * (ys[c] - ys[a]) - (xs[c] - xs[a]) * (ys[b] - ys[a])) * 0.5
+
+def _removals(xs, ys, first, last):
+    # Produit (aire effective, index) dans l'ordre de suppression
+    before = {}
+    after = {}
+    heap = []
+    for i in range(first + 1, last):
+        before[i] = i - 1
+        after[i] = i + 1
+        heap.append((_triangle_area(xs, ys, i - 1, i, i + 1), i))
+    heapq.heapify(heap)
+    area = dict((i, a) for a, i in heap)
+    effective = 0.0
+    while heap:
+        a, i = heapq.heappop(heap)
+        if area.get(i) != a:
+            continue
+        del area[i]
+        effective = max(effective, a)
+        yield effective, i
+        p, n = before.pop(i), after.pop(i)
+        if p in after:
+            after[p] = n
+            area[p] = _triangle_area(xs, ys, before[p], p, n)
+            heapq.heappush(heap, (area[p], p))
+        if n in before:
+            before[n] = p
+            area[n] = _triangle_area(xs, ys, p, n, after[n])
+            heapq.heappush(heap, (area[n], n))
+
+def visvalingam_indices(xs, ys, min_area, first=0, last=None):
+    if last is None:
+        last = len(xs) - 1
+    if last - first < 2:
+        return list(range(first, last + 1))
+    removed = set()
+    for effective, i in _removals(xs, ys, first, last):
+        if effective >= min_area:
+            break
+        removed.add(i)
+    return [i for i in range(first, last + 1) if i not in removed]
+
+def visvalingam_levels(xs, ys):
+    # Aire effective de chaque point (extrémités : infinie) ; pour tout seuil,
+    # visvalingam_indices(xs, ys, a) == [i for i, w in enumerate(levels) if w >= a]
+    n = len(xs)
+    levels = [float("inf")] * n
+    if n > 2:
+        for effective, i in _removals(xs, ys, 0, n - 1):
+            levels[i] = effective
+    return levels
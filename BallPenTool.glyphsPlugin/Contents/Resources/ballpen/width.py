@@ -0,0 +1,215 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — épaisseur variable (pression du stylet ou vitesse de la souris)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math
+from array import array
+from bisect import bisect_right
+
+# Chaque échantillon du tampon de capture donne un facteur d'épaisseur entre
+# MIN_FACTOR et 1 : la pression pour un stylet, la vitesse pour une souris
+# (plus vite, plus fin, comme l'encre d'un stylo bille). Le facteur est lissé
+# (moyenne exponentielle, calculée au fil de la capture) et repéré par
+# l'abscisse curviligne relative du tracé brut, de 0 au début à 1 à la fin.
+#
+# Le chemin n'en garde que quelques images clés [(u, facteur)] : l'épaisseur
+# interpolée linéairement entre deux clés reste à WIDTH_TOLERANCE × epsilon
+# de celle des échantillons (Douglas-Peucker sur le profil). Elles sont
+# appliquées le long de la courbe ajustée, à la même abscisse relative.
+#
+# Le facteur ne dépasse jamais 1 : le trait reste dans la boîte de l'épaisseur
+# nominale (marges du redessin et du contour inchangées).
+MIN_FACTOR = 0.35
+SPEED_REFERENCE = 1500.0  # unités de fonte par seconde : facteur à mi-course à cette vitesse
+SMOOTHING = 0.3           # poids du nouvel échantillon dans la moyenne exponentielle
+WIDTH_TOLERANCE = 0.5     # erreur maximale d'épaisseur = tolérance × epsilon
+KEYFRAME_DIGITS = 4       # arrondi des clés gardées dans les userData
+
+
+def is_stylus(pressure):
+    # Même règle que mouseDown_ : une souris appuyée donne 0 ou 1
+    return 0.0 < pressure < 1.0
+
+def pressure_factor(pressure):
+    return MIN_FACTOR + (1.0 - MIN_FACTOR) * min(1.0, max(0.0, pressure))
+
+def speed_factor(speed):
+    return MIN_FACTOR + (1.0 - MIN_FACTOR) / (1.0 + speed / SPEED_REFERENCE)
+
+
+class WidthTracker(object):
+
+    def __init__(self, points):
+        # points : StrokeBuffer avec pressions et horodatage, None une fois figé
+        self.points = points
+        self.stylus = None
+        self.lengths = array("d")     # abscisse curviligne cumulée, par échantillon
+        self.factors = array("d")     # facteur lissé, par échantillon
+        self._speeds = array("d")     # vitesse retenue, par échantillon (souris)
+        self._version = None          # version du tampon au dernier update
+
+    def __len__(self):
+        return len(self.factors)
+
+    def update(self):
+        # Traite les échantillons reçus depuis le dernier appel ; le dernier
+        # est toujours recalculé (extrémité flottante de la capture décimée).
+        # Rien à faire si le tampon n'a pas changé, ou s'il a été vidé ou
+        # raccourci : le profil déjà calculé est gardé tel quel
+        points = self.points
+        if points is None or points.version == self._version:
+            return
+        count = len(points)
+        if count < len(self.factors) or count == 0:
+            return
+        self._version = points.version
+        start = max(0, len(self.factors) - 1)
+        del self.lengths[start:]
+        del self.factors[start:]
+        del self._speeds[start:]
+        xs, ys = points.coordinates()
+        pressures = points.pressures()
+        times = points.times()
+        if self.stylus is None:
+            self.stylus = pressures is not None and is_stylus(pressures[0])
+        for i in range(start, count):
+            if i == 0:
+                self.lengths.append(0.0)
+                self._speeds.append(0.0)
+                raw = pressure_factor(pressures[0]) if self.stylus else 1.0
+                self.factors.append(raw)
+                continue
+            step = math.hypot(xs[i] - xs[i - 1], ys[i] - ys[i - 1])
+            self.lengths.append(self.lengths[i - 1] + step)
+            # Horodatage identique (événements groupés) : vitesse précédente
+            dt = times[i] - times[i - 1] if times is not None else 0.0
+            speed = step / dt if dt > 0.0 else self._speeds[i - 1]
+            self._speeds.append(speed)
+            raw = pressure_factor(pressures[i]) if self.stylus else speed_factor(speed)
+            previous = self.factors[i - 1]
+            self.factors.append(previous + SMOOTHING * (raw - previous))
+
+    def frozen(self):
+        # Copie détachée du tampon (réutilisé par le tracé suivant), pour
+        # l'aperçu du dernier tracé validé
+        self.update()
+        copy = WidthTracker(None)
+        copy.stylus = self.stylus
+        copy.lengths = array("d", self.lengths)
+        copy.factors = array("d", self.factors)
+        copy._speeds = array("d", self._speeds)
+        return copy
+
+    def total_length(self):
+        return self.lengths[-1] if self.lengths else 0.0
+
+    def factor_at(self, u):
+        # Facteur à l'abscisse relative u (0..1), interpolé entre échantillons
+        lengths, factors = self.lengths, self.factors
+        if not factors:
+            return 1.0
+        total = lengths[-1]
+        if total <= 0.0:
+            return factors[-1]
+        s = min(1.0, max(0.0, u)) * total
+        i = bisect_right(lengths, s)
+        if i >= len(lengths):
+            return factors[-1]
+        if i == 0:
+            return factors[0]
+        span = lengths[i] - lengths[i - 1]
+        if span <= 0.0:
+            return factors[i]
+        k = (s - lengths[i - 1]) / span
+        return factors[i - 1] + (factors[i] - factors[i - 1]) * k
+
+    def keyframes(self, tolerance):
+        # [(u, facteur)] réduites à l'erreur `tolerance` (en facteur)
+        count = len(self.factors)
+        total = self.total_length()
+        if count < 2 or total <= 0.0:
+            factor = self.factors[-1] if count else 1.0
+            return [(0.0, factor), (1.0, factor)]
+        us = [length / total for length in self.lengths]
+        return [(us[i], self.factors[i]) for i in simplify_profile(us, self.factors, tolerance)]
+
+
+def segment_widths(segments, tracker, stroke_width, step):
+    # Épaisseur au milieu de chaque segment de l'aperçu (abscisse relative par
+    # les cordes), arrondie au pas `step` : les segments voisins de même
+    # épaisseur peuvent être tracés ensemble
+    lengths = [math.hypot(p1.x - p0.x, p1.y - p0.y) for p0, _, _, p1 in segments]
+    total = sum(lengths) or 1.0
+    widths = []
+    u = 0.0
+    for length in lengths:
+        width = stroke_width * tracker.factor_at((u + length * 0.5) / total)
+        widths.append(max(step, round(width / step) * step))
+        u += length
+    return widths
+
+
+def simplify_profile(us, factors, tolerance):
+    # Douglas-Peucker sur le profil (u, facteur), écart mesuré verticalement :
+    # c'est l'erreur d'épaisseur à abscisse donnée. Pile explicite.
+    last = len(us) - 1
+    keep = [0, last]
+    stack = [(0, last)]
+    while stack:
+        first, end = stack.pop()
+        if end - first < 2:
+            continue
+        u0, f0 = us[first], factors[first]
+        span = us[end] - u0
+        slope = (factors[end] - f0) / span if span > 0.0 else 0.0
+        worst, index = tolerance, -1
+        for i in range(first + 1, end):
+            error = abs(factors[i] - (f0 + slope * (us[i] - u0)))
+            if error > worst:
+                worst, index = error, i
+        if index >= 0:
+            keep.append(index)
+            stack.append((first, index))
+            stack.append((index, end))
+    keep.sort()
+    return keep
+
+def width_at(keyframes, u):
+    # Facteur interpolé entre les clés encadrant u
+    if not keyframes:
+        return 1.0
+    if u <= keyframes[0][0]:
+        return keyframes[0][1]
+    for (u0, f0), (u1, f1) in zip(keyframes, keyframes[1:]):
+        if u <= u1:
+            return f0 if u1 <= u0 else f0 + (f1 - f0) * (u - u0) / (u1 - u0)
+    return keyframes[-1][1]
+
+def width_tolerance(simplify_epsilon, stroke_width):
+    # Tolérance en facteur pour une erreur d'épaisseur de WIDTH_TOLERANCE × epsilon
+    return WIDTH_TOLERANCE * simplify_epsilon / stroke_width if stroke_width > 0 else 0.0
+
+def stroke_keyframes(points, simplify_epsilon, stroke_width):
+    tracker = WidthTracker(points)
+    tracker.update()
+    return tracker.keyframes(width_tolerance(simplify_epsilon, stroke_width))
+
+
+# ----------------------------------------------------------
+# userData : liste plate [u0, f0, u1, f1, ...]
+# ----------------------------------------------------------
+def encode_keyframes(keyframes):
+    out = []
+    for u, factor in keyframes:
+        out.append(round(u, KEYFRAME_DIGITS))
+        out.append(round(factor, KEYFRAME_DIGITS))
+    return out
+
+def decode_keyframes(values):
+    values = [float(value) for value in values]
+    if len(values) < 4 or len(values) % 2:
+        raise ValueError("Invalid width keyframes")
+    return list(zip(values[0::2], values[1::2]))
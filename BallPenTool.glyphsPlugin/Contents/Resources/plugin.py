@@ -5,237 +5,58 @@
 #
 ###########################################################################################################
 from __future__ import division, print_function, unicode_literals
-import objc, os, math
-from GlyphsApp import Glyphs, GSPath, GSNode, GSOFFCURVE, GSCURVE, GSLINE, UPDATEINTERFACE
+import objc, os, time
+from GlyphsApp import Glyphs, UPDATEINTERFACE
 from GlyphsApp.plugins import SelectTool, PalettePlugin
-from AppKit import NSImage, NSColor, NSBezierPath, NSPoint
+# La géométrie ne dépend ni de Glyphs ni d'AppKit (voir ballpen/core.py) ;
+# les classes Glyphs et AppKit sont importées là où elles servent.
+from ballpen.core import Point, distance, fit_stroke_clamped, stroke_nodes, StrokeEngine, StrokeLevels, RDP, VISVALINGAM, BSPLINE, LEAST_SQUARES, LINE, CURVE, OFFCURVE
+from ballpen.buffer import StrokeBuffer
+from ballpen.strokefile import RecordedStroke, write_stroke, encode_user_data, decode_user_data, EXTENSION
+from ballpen.profiling import Profiler
+from ballpen.redraw import RedrawScheduler, FRAME_INTERVAL
+from ballpen.decimate import StreamingDecimator, TOLERANCE_FACTOR, COMPACTION_FACTOR
+from ballpen.endpoints import EndpointGrid, START, END, reverse_nodes, join_nodes
+from ballpen.outline import stroke_segments, expand_stroke, outline_nodes
+from ballpen.width import WidthTracker, stroke_keyframes, segment_widths, encode_keyframes, decode_keyframes
 # ----------------------------------------------------------
 # Constantes globales
 # ----------------------------------------------------------
 DEFAULT_SIMPLIFY_EPSILON = 2.0
 DEFAULT_STROKE_WIDTH = 20.0
 MIN_DISTANCE = 4.0
-MIN_SEGMENT_LENGTH = 5.0 # Seuil pour forcer une ligne droite aux extrémités
-PINCH_FACTOR = 0.25      # 25% de la longueur du segment d'ancrage
-# ----------------------------------------------------------
-# Fonctions utilitaires
-# ----------------------------------------------------------
-def distance(p1, p2):
-    return math.hypot(p2.x - p1.x, p2.y - p1.y)
-def distance_point_segment(p, a, b):
-    x, y = p.x, p.y
-    x1, y1 = a.x, a.y
-    x2, y2 = b.x, b.y
-    dx = x2 - x1
-    dy = y2 - y1
-    if dx == 0 and dy == 0:
-        return math.hypot(x - x1, y - y1)
-    t = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
-    t = max(0.0, min(1.0, t))
-    projx = x1 + t * dx
-    projy = y1 + t * dy
-    return math.hypot(x - projx, y - projy)
-def rdp_simplify(points, epsilon):
-    if len(points) < 3:
-        return points[:]
-    dmax = 0.0
-    index = 0
-    a = points[0]
-    b = points[-1]
-    for i in range(1, len(points) - 1):
-        d = distance_point_segment(points[i], a, b)
-        if d > dmax:
-            index = i
-            dmax = d
-    if dmax > epsilon:
-        left = rdp_simplify(points[: index + 1], epsilon)
-        right = rdp_simplify(points[index:], epsilon)
-        return left[:-1] + right
-    else:
-        return [points[0], points[-1]]
-
-def simplify_ends(points, num_points_to_process=5, epsilon_ends=1.0):
-    if len(points) < 2: return points[:]
-    if len(points) <= num_points_to_process * 2: return rdp_simplify(points, epsilon_ends)
-
-    start_segment = points[:num_points_to_process]
-    simplified_start = rdp_simplify(start_segment, epsilon_ends)
-    
-    end_segment = points[len(points) - num_points_to_process:]
-    simplified_end = rdp_simplify(end_segment, epsilon_ends)
-    
-    new_points = []
-    for p in simplified_start:
-        if not new_points or distance(p, new_points[-1]) > 0.1: new_points.append(p)
-            
-    junction_start_index = len(simplified_start) - 1 if len(simplified_start) > 0 else 0
-    junction_end_index = len(points) - len(simplified_end) if len(simplified_end) > 0 else len(points)
-    
-    for i in range(junction_start_index, junction_end_index):
-        p = points[i]
-        if not new_points or distance(p, new_points[-1]) > 0.1: new_points.append(p)
-
-    for p in simplified_end:
-        if not new_points or distance(p, new_points[-1]) > 0.1: new_points.append(p)
-            
-    return new_points
-
-def cleanup_endpoints(points, min_distance=5.0):
-    if len(points) < 3: return points[:]
-    start_point = points[0]
-    end_point = points[-1]
-    cleaned_points = [start_point]
-    for i in range(1, len(points) - 1):
-        p = points[i]
-        if not (distance(p, start_point) < min_distance or distance(p, end_point) < min_distance):
-            cleaned_points.append(p)
-            
-    if distance(cleaned_points[-1], end_point) > 1e-6: cleaned_points.append(end_point)
-    return cleaned_points
-
-def ns_add(a, b): return NSPoint(a.x + b.x, a.y + b.y)
-def ns_sub(a, b): return NSPoint(a.x - b.x, a.y - b.y)
-def ns_mul(a, s): return NSPoint(a.x * s, a.y * s)
-def ns_div(a, s): return NSPoint(a.x / s, a.y / s)
-
-def ns_limit_length(vector, max_length):
-    length = distance(NSPoint(0, 0), vector)
-    if length > max_length and length > 1e-6:
-        return ns_mul(vector, max_length / length)
-    return vector
-
-def make_tangent_symmetric(p_anchor, p_control_out):
-    return ns_sub(ns_mul(p_anchor, 2.0), p_control_out)
-
-def b_spline_to_bezier(points):
-    n = len(points)
-    if n < 2: return []
-    if n == 2:
-        p0, p1 = points
-        c1 = ns_add(p0, ns_mul(ns_sub(p1, p0), 1/3))
-        c2 = ns_add(p0, ns_mul(ns_sub(p1, p0), 2/3))
-        return [(p0, c1, c2, p1)]
-    padded = [points[0], points[0]] + points[:] + [points[-1], points[-1]]
-    beziers = []
-    for i in range(len(padded) - 3):
-        P0, P1, P2, P3 = padded[i], padded[i + 1], padded[i + 2], padded[i + 3]
-        Q0 = ns_div(ns_add(ns_add(P0, ns_mul(P1, 4.0)), P2), 6.0)
-        Q1 = ns_div(ns_add(ns_mul(P1, 4.0), ns_mul(P2, 2.0)), 6.0)
-        Q2 = ns_div(ns_add(ns_mul(P1, 2.0), ns_mul(P2, 4.0)), 6.0)
-        Q3 = ns_div(ns_add(ns_add(P1, ns_mul(P2, 4.0)), P3), 6.0)
-        beziers.append((Q0, Q1, Q2, Q3))
-    return [seg for seg in beziers if abs(seg[0].x - seg[3].x) > 1e-6 or abs(seg[0].y - seg[3].y) > 1e-6]
-
-def trim_ends(points, trim_length=2.0):
-    if len(points) < 3:
-        return points[:]
-    def trim_segment(points, trim_length, from_start=True):
-        d = 0
-        if from_start:
-            for i in range(len(points) - 1):
-                seg_len = distance(points[i], points[i + 1])
-                if d + seg_len >= trim_length:
-                    ratio = (trim_length - d) / seg_len
-                    new_p = NSPoint(points[i].x + (points[i + 1].x - points[i].x) * ratio, points[i].y + (points[i + 1].y - points[i].y) * ratio)
-                    return [new_p] + points[i + 1:]
-                d += seg_len
-            return points
-        else:
-            for i in range(len(points) - 1, 0, -1):
-                seg_len = distance(points[i], points[i - 1])
-                if d + seg_len >= trim_length:
-                    ratio = (trim_length - d) / seg_len
-                    new_p = NSPoint(points[i].x + (points[i - 1].x - points[i].x) * ratio, points[i].y + (points[i - 1].y - points[i].y) * ratio)
-                    return points[:i] + [new_p]
-                d += seg_len
-            return points
-    trim = trim_length * 2.0 
-    trimmed = trim_segment(points, trim, from_start=True)
-    trimmed = trim_segment(trimmed, trim, from_start=False)
-    if distance(trimmed[0], trimmed[1]) < 0.1 and len(trimmed) > 2:
-        trimmed = trimmed[1:]
-    if distance(trimmed[-1], trimmed[-2]) < 0.1 and len(trimmed) > 2:
-        trimmed = trimmed[:-1]
-    return trimmed
-
-
-# FONCTION CLAMPING GÉNÉRIQUE (utilisée par mouseUp et background)
-def apply_clamping(beziers):
-    if not beziers:
-        return beziers, None, None
-    
-    # Le dictionnaire sera retourné pour le repère visuel
-    clamped_points = {'start': None, 'end': None}
-    
-    # --- Traitement du segment de début (p0, c1, c2, p1) ---
-    p0_first, c1_first, c2_first, p1_first = beziers[0]
-    
-    vec_p0_p1 = ns_sub(p1_first, p0_first)
-    len_p0_p1 = distance(NSPoint(0, 0), vec_p0_p1)
-    
-    if len_p0_p1 < MIN_SEGMENT_LENGTH:
-        # Segment trop court: forcer C1 = P0 pour faire une ligne droite
-        if distance(c1_first, p0_first) > 0.1:
-            c1_first = p0_first
-            clamped_points['start'] = p0_first
-    elif len_p0_p1 > 1e-6:
-        max_c1_len = len_p0_p1 * PINCH_FACTOR
-        vec_p0_c1 = ns_sub(c1_first, p0_first)
-        
-        unit_vec_p0_p1 = ns_div(vec_p0_p1, len_p0_p1)
-        dot_product = vec_p0_c1.x * unit_vec_p0_p1.x + vec_p0_c1.y * unit_vec_p0_p1.y
-        
-        if dot_product < 0:
-            c1_first = ns_add(p0_first, ns_mul(unit_vec_p0_p1, max_c1_len))
-            clamped_points['start'] = c1_first
-        else:
-            vec_p0_c1_limited = ns_limit_length(vec_p0_c1, max_c1_len)
-            c1_first_new = ns_add(p0_first, vec_p0_c1_limited)
-            if distance(c1_first_new, c1_first) > 0.1:
-                c1_first = c1_first_new
-                clamped_points['start'] = c1_first
-
-    beziers[0] = (p0_first, c1_first, c2_first, p1_first)
-
-    # --- Traitement du segment de fin (p0_last, c1_last, c2_last, p1_last) ---
-    p0_last, c1_last, c2_last, p1_last = beziers[-1]
-    
-    vec_p0_p1_last = ns_sub(p1_last, p0_last)
-    len_p0_p1_last = distance(NSPoint(0, 0), vec_p0_p1_last)
-
-    if len_p0_p1_last < MIN_SEGMENT_LENGTH:
-        # Segment trop court: forcer C2 = P1 pour faire une ligne droite
-        if distance(c2_last, p1_last) > 0.1:
-            c2_last = p1_last
-            clamped_points['end'] = p1_last
-    elif len_p0_p1_last > 1e-6:
-        max_c2_len = len_p0_p1_last * PINCH_FACTOR
-        vec_p1_c2 = ns_sub(c2_last, p1_last)
-
-        unit_vec_p0_p1_last = ns_div(vec_p0_p1_last, len_p0_p1_last)
-        unit_vec_p1_p0_last = ns_mul(unit_vec_p0_p1_last, -1) 
-        dot_product = vec_p1_c2.x * unit_vec_p1_p0_last.x + vec_p1_c2.y * unit_vec_p1_p0_last.y
-        
-        if dot_product < 0:
-            c2_last = ns_add(p1_last, ns_mul(unit_vec_p1_p0_last, max_c2_len))
-            clamped_points['end'] = c2_last
-        else:
-            vec_p1_c2_limited = ns_limit_length(vec_p1_c2, max_c2_len)
-            c2_last_new = ns_add(p1_last, vec_p1_c2_limited)
-            if distance(c2_last_new, c2_last) > 0.1:
-                c2_last = c2_last_new
-                clamped_points['end'] = c2_last
-
-    beziers[-1] = (p0_last, c1_last, c2_last, p1_last)
-    
-    # Renvoyer les beziers modifiés et les points de contrôle modifiés pour le repère
-    return beziers, clamped_points['start'], clamped_points['end']
-
-
+DOT_RADIUS = 4.0          # repères rouges du clamping
+# Dossier où enregistrer chaque tracé brut (.bpstroke) pour les benchmarks ;
+# désactivé tant que la préférence n'est pas définie
+RECORD_FOLDER_KEY = "com.jbd.BallPen.recordFolder"
+# Tracé brut compact gardé dans les userData de chaque chemin, pour le réajuster
+STROKE_DATA_KEY = "com.jbd.BallPen.stroke"
+# Contour développé du chemin (voir ballpen/outline.py), calculé au premier
+# développement puis recalculé seulement si les nœuds ou l'épaisseur ont changé
+# Simplificateur utilisé par mouseUp_ et background : RDP (défaut) ou Visvalingam
+SIMPLIFIER_KEY = "com.jbd.BallPen.simplifier"
+# Ajustement des courbes à la validation : B-spline (défaut) ou moindres carrés
+FITTER_KEY = "com.jbd.BallPen.fitter"
+# Mesure des étapes (voir ballpen/profiling.py) et relevé affiché dans la palette
+PROFILING_KEY = "com.jbd.BallPen.profiling"
+# Décimation des échantillons pendant la capture (voir ballpen/decimate.py)
+STREAMING_KEY = "com.jbd.BallPen.streamingCapture"
+# Raccord d'un nouveau tracé à l'extrémité proche d'un tracé existant (voir ballpen/endpoints.py)
+JOIN_KEY = "com.jbd.BallPen.joinStrokes"
+SNAP_DISTANCE = 8.0       # points d'écran, quel que soit le zoom
+# Épaisseur variable (pression ou vitesse, voir ballpen/width.py) : images clés
+# gardées dans les userData du chemin, appliquées au contour développé
+VARIABLE_WIDTH_KEY = "com.jbd.BallPen.variableWidth"
+WIDTHS_KEY = "com.jbd.BallPen.widths"
+WIDTH_STEP = 0.5          # aperçu : segments d'épaisseurs voisines tracés ensemble
+TIMINGS_HEIGHT = 140
+NIB_MARGIN = 8            # marge sous les contrôles les plus bas d'IBdialog
+TIMINGS_REFRESH = 0.5     # secondes entre deux mises à jour du relevé
 # ----------------------------------------------------------
 # Palette intégrée : ToolVariables
 # ----------------------------------------------------------
 class BallPenToolVariables(PalettePlugin):
+    instance = None
     dialog = objc.IBOutlet()
     thicknessSlider = objc.IBOutlet()
     smoothingSlider = objc.IBOutlet()
@@ -248,25 +69,39 @@ class BallPenToolVariables(PalettePlugin):
         self.name = Glyphs.localize({'en': 'Ballpen settings','fr': 'Paramètres du stylo','de': 'Kugelschreiber-Einstellungen','es': 'Ajustes del boli','zh': '笔设置','ja': 'ペンの設定','pt': 'Configurações da caneta','it': 'Impostazioni della penna','nl': 'Peninstellingen','ko': '펜 설정','ru': 'Настройки пера',})
         self.loadNib('IBdialog', __file__)
         self.dialog.setController_(self)
+        # Relevé des temps, ajouté sous les curseurs (le nib n'en a pas) ; placé
+        # par layoutTimings quand la mesure est activée ou arrêtée
+        from AppKit import NSTextField, NSFont, NSViewHeightSizable
+        self.timingsLabel = NSTextField.labelWithString_("")
+        self.timingsLabel.setFrame_(((8, 4), (149, 0)))
+        self.timingsLabel.setFont_(NSFont.userFixedPitchFontOfSize_(9))
+        # Hauteur suivant celle de la palette : l'écart avec les curseurs est gardé
+        self.timingsLabel.setAutoresizingMask_(NSViewHeightSizable)
+        self.timingsLabel.setHidden_(True)
+        self.dialog.addSubview_(self.timingsLabel)
+        BallPenToolVariables.instance = self
     @objc.python_method
     def start(self):
         Glyphs.addCallback(self.update, UPDATEINTERFACE)
     @objc.python_method
     def __del__(self):
         Glyphs.removeCallback(self.update)
-    def minHeight(self): return 120
-    def maxHeight(self): return 120
+    def minHeight(self): return 120 + (TIMINGS_HEIGHT if Glyphs.defaults[PROFILING_KEY] else 0)
+    def maxHeight(self): return self.minHeight()
     @objc.IBAction
     def thicknessChanged_(self, sender):
         self.thickness = round(sender.floatValue())
         if BallPen.instance:
             BallPen.instance.strokeWidth = self.thickness
+            Glyphs.redraw()
         self.update(None)
     @objc.IBAction
     def smoothingChanged_(self, sender):
         self.smoothing = round(sender.floatValue())
         if BallPen.instance:
             BallPen.instance.simplifyEpsilon = DEFAULT_SIMPLIFY_EPSILON * (1.25 ** self.smoothing)
+            # Le dernier tracé est réaffiché au nouveau niveau (voir background)
+            Glyphs.redraw()
         self.update(None)
     @objc.python_method
     def update(self, sender):
@@ -276,6 +111,29 @@ class BallPenToolVariables(PalettePlugin):
         if self.smoothingLabel:
             self.smoothingLabel.setStringValue_(f'{labels["smoothing_label"]} {int(self.smoothing)}')
     @objc.python_method
+    def layoutTimings(self):
+        # Les contrôles du nib restent collés en haut : la vue est agrandie
+        # (ou réduite) pour laisser TIMINGS_HEIGHT sous le plus bas quand le
+        # relevé est affiché, et le relevé n'occupe que cette place
+        label = self.timingsLabel
+        space = 0 if label.isHidden() else TIMINGS_HEIGHT
+        frame = self.dialog.frame()
+        bottom = min(view.frame().origin.y for view in self.dialog.subviews() if view is not label)
+        self.dialog.setFrameSize_((frame.size.width, frame.size.height + NIB_MARGIN + space - bottom))
+        label.setFrame_(((8, 4), (149, max(0, space - 8))))
+    @objc.python_method
+    def showTimings(self, profiler):
+        if self.timingsLabel.isHidden() != (profiler is None):
+            self.timingsLabel.setHidden_(profiler is None)
+            self.layoutTimings()
+        if profiler is None:
+            return
+        lines = ["%-13s %5s %5s" % ("ms", "p50", "p95")]
+        for stage, calls, p50, p95 in profiler.summary():
+            lines.append("%-13s %5.2f %5.2f" % (stage[:13], p50, p95))
+        lines.append("%-13s %5.0f/s" % ("redraw", profiler.redraw_rate()))
+        self.timingsLabel.setStringValue_("\n".join(lines))
+    @objc.python_method
     def __file__(self):
         return __file__
 # ----------------------------------------------------------
@@ -286,6 +144,7 @@ class BallPen(SelectTool):
 
     @objc.python_method
     def settings(self):
+        from AppKit import NSImage
         self.name = Glyphs.localize({'en': 'Ballpen','fr': 'Stylo','de': 'Kugelschreiber','es': 'Bolígrafo','zh': '圆珠笔','ja': 'ボールペン','pt': 'Caneta','it': 'Penna','nl': 'Balpen','ko': '볼펜','ru': 'Шариковая ручка',})
         # Note: L'icône doit être placée dans le même dossier que le plugin
         icon_path = os.path.join(os.path.dirname(__file__), "BallPenTool.pdf")
@@ -310,12 +169,36 @@ class BallPen(SelectTool):
         self.simplifyEpsilon = DEFAULT_SIMPLIFY_EPSILON
         self.minDistance = MIN_DISTANCE
         self.roundCaps = True
+        self.generalContextMenus = [
+            {"name": Glyphs.localize({'en': 'Re-fit Selected Strokes','fr': 'Réajuster les tracés sélectionnés','de': 'Ausgewählte Striche neu anpassen','es': 'Reajustar los trazos seleccionados','zh': '重新拟合所选笔画','ja': '選択したストロークを再フィット','pt': 'Reajustar os traços selecionados','it': 'Riadatta i tratti selezionati','nl': 'Geselecteerde streken opnieuw passen','ko': '선택한 획 다시 맞추기','ru': 'Перестроить выбранные штрихи',}), "action": self.refitSelectedStrokes_},
+            {"name": Glyphs.localize({'en': 'Expand All Ballpen Strokes in Font','fr': 'Développer tous les tracés Stylo bille de la fonte','de': 'Alle Kugelschreiber-Striche der Schrift in Konturen umwandeln','es': 'Expandir todos los trazos de bolígrafo de la fuente','zh': '扩展字体中的所有圆珠笔笔画','ja': 'フォント内のすべてのボールペンストロークをアウトライン化','pt': 'Expandir todos os traços de esferográfica da fonte','it': 'Espandi tutti i tratti a penna a sfera del font','nl': 'Alle balpenstreken in het font omzetten naar contouren','ko': '폰트의 모든 볼펜 획을 윤곽선으로 확장','ru': 'Преобразовать все штрихи ручки в контуры',}), "action": self.expandFontStrokes_},
+            {"name": Glyphs.localize({'en': 'Re-fit All Strokes in Font','fr': 'Réajuster tous les tracés de la fonte','de': 'Alle Striche der Schrift neu anpassen','es': 'Reajustar todos los trazos de la fuente','zh': '重新拟合字体中的所有笔画','ja': 'フォント内のすべてのストロークを再フィット','pt': 'Reajustar todos os traços da fonte','it': 'Riadatta tutti i tratti del font','nl': 'Alle streken in het font opnieuw passen','ko': '폰트의 모든 획 다시 맞추기','ru': 'Перестроить все штрихи шрифта',}), "action": self.refitFontStrokes_},
+        ]
         BallPen.instance = self
 
     @objc.python_method
     def start(self):
-        self.points = []
+        self.points = StrokeBuffer(pressures=True, times=True)
+        self.capture = self.points  # StreamingDecimator si la capture en continu est activée
         self.lastPoint = None
+        self.engine = None
+        self.lastStroke = None    # StrokeLevels du dernier tracé validé
+        self.lastStrokeLayer = None
+        self.lastStrokeParams = None
+        self.profiler = None      # Profiler si la mesure est activée, sinon rien n'est chronométré
+        self.redraw = RedrawScheduler()
+        # Aperçu mémorisé : (clé, géométrie), (clé, épaisseurs des segments) et
+        # (clé, chemins NSBezierPath), clé = version du tampon (ou dernier
+        # tracé), lissage et épaisseur ; abandonnés à la fin du tracé
+        self.previewGeometry = None
+        self.previewWidths = None
+        self.previewPaths = None
+        self.endpoints = None     # [calque, EndpointGrid, nombre de chemins] si le raccord est activé
+        self.widths = None        # WidthTracker du tracé en cours si l'épaisseur varie
+        self.lastWidths = None    # copie figée de celui du dernier tracé validé (drawLastStroke)
+        self.timingsShown = 0.0
+        if Glyphs.defaults[PROFILING_KEY]:
+            self.setProfiling(True)
 
     @objc.python_method
     def activate(self):
@@ -324,12 +207,31 @@ class BallPen(SelectTool):
     @objc.python_method
     def deactivate(self):
         self.tool_bar_image = self.default_image
+        self.lastStroke = None
+        self.endpoints = None
 
     def mouseDown_(self, theEvent):
         view = self.editViewController().graphicView()
         loc = view.getActiveLocation_(theEvent)
-        self.points = [loc]
+        self.points.clear()
+        if Glyphs.defaults[STREAMING_KEY]:
+            self.capture = StreamingDecimator(self.points, TOLERANCE_FACTOR * self.simplifyEpsilon, compaction=COMPACTION_FACTOR * self.simplifyEpsilon)
+        else:
+            self.capture = self.points
+        self.capture.append(loc.x, loc.y, theEvent.pressure(), theEvent.timestamp())
         self.lastPoint = loc
+        self.engine = StrokeEngine(self.points, self.simplifier())
+        self.widths = WidthTracker(self.points) if Glyphs.defaults[VARIABLE_WIDTH_KEY] else None
+        self.lastStroke = None
+        self.lastWidths = None
+        self.redraw.reset()
+        self.previewGeometry = None
+        self.previewWidths = None
+        self.previewPaths = None
+        # Une image par rafraîchissement de l'écran (ProMotion : jusqu'à 120 Hz)
+        screen = view.window().screen() if view.window() else None
+        fps = screen.maximumFramesPerSecond() if screen is not None and hasattr(screen, "maximumFramesPerSecond") else 0
+        self.redraw.interval = 1.0 / fps if fps > 0 else FRAME_INTERVAL
 
         # --- Détection du type d'entrée ---
         self.usingStylus = False
@@ -361,134 +263,645 @@ class BallPen(SelectTool):
         view = self.editViewController().graphicView()
         loc = view.getActiveLocation_(theEvent)
         if distance(self.lastPoint, loc) >= self.minDistance:
-            self.points.append(loc)
+            compactions = getattr(self.capture, "compactions", 0)
+            self.capture.append(loc.x, loc.y, theEvent.pressure(), theEvent.timestamp())
+            if getattr(self.capture, "compactions", 0) != compactions:
+                # Tampon compacté : les index gardés par l'aperçu ne valent plus
+                self.engine = StrokeEngine(self.points, self.simplifier())
+                if self.widths is not None:
+                    self.widths = WidthTracker(self.points)
             self.lastPoint = loc
-            view.setNeedsDisplay_(True)
+            self.scheduleRedraw()
 
     def mouseUp_(self, theEvent):
         objc.super(BallPen, self).mouseUp_(theEvent)
+        from AppKit import NSObject
+        NSObject.cancelPreviousPerformRequestsWithTarget_selector_object_(self, "flushRedraw:", None)
+        self.redraw.reset()
+        self.previewGeometry = None
+        self.previewWidths = None
+        self.previewPaths = None
         view = self.editViewController().graphicView()
         if len(self.points) < 2:
-            self.points = []
+            self.points.clear()
             self.lastPoint = None
+            self.engine = None
+            self.widths = None
             view.setNeedsDisplay_(True)
             return
+        from GlyphsApp import GSPath
+        profiler = self.profiler
+        if profiler is not None:
+            t0 = time.perf_counter()
+        stroke = RecordedStroke.from_buffer(self.points, self.strokeWidth, self.simplifyEpsilon)
+        self.recordStroke(stroke)
         layer = view.activeLayer()
+        glyph = layer.parent
+        font = glyph.parent if glyph is not None else None
+        # Chemin complet construit hors du calque, puis ajouté (ou raccordé) en
+        # une seule étape d'annulation, interface mise à jour une fois à la fin
         path = GSPath()
         path.closed = False
-        
-        # 1. Pré-simplification des extrémités 
-        pre_simplified_points = simplify_ends(self.points, num_points_to_process=5, epsilon_ends=1.0)
-        
-        # 2. Simplification RDP globale
-        simplified_points = rdp_simplify(pre_simplified_points, self.simplifyEpsilon)
-        if len(simplified_points) < 2:
-            simplified_points = pre_simplified_points[:]
-        
-        # 3. Nettoyage des points d'ancrage près des extrémités (distance=5.0)
-        simplified_points = cleanup_endpoints(simplified_points, min_distance=5.0)
+        self.fitPath(path, self.points)
+        # Tracé brut conservé sur le chemin (voir refitStrokes)
+        try:
+            path.userData[STROKE_DATA_KEY] = encode_user_data(stroke)
+        except Exception as e:
+            print("Stroke data could not be stored:", e)
+        if font is not None:
+            font.disableUpdateInterface()
+        if glyph is not None:
+            glyph.beginUndo()
+        try:
+            joinable = Glyphs.defaults[JOIN_KEY] and path.attributes["strokeWidth"] is not None
+            if joinable and self.joinStroke(layer, path, stroke, SNAP_DISTANCE / view.scale()):
+                # Le tracé prolonge un chemin existant : pas d'aperçu du dernier tracé seul
+                self.lastStroke = None
+            else:
+                # Grille à jour pour ce calque : le nouveau chemin y est ajouté
+                # directement (endpointIndex la reconstruirait, le nombre de
+                # chemins ayant changé)
+                index = self.endpoints
+                current = Glyphs.defaults[JOIN_KEY] and index is not None and index[0] == layer and index[2] == len(layer.paths)
+                layer.paths.append(path)
+                if current:
+                    self.indexEndpoints(index[1], path)
+                    index[2] = len(layer.paths)
+                # Tracé gardé pour le curseur Lissage : sa hiérarchie de
+                # simplification n'est calculée qu'au premier mouvement
+                self.lastStroke = StrokeLevels(self.points, self.simplifier(), self.fitter())
+                if self.widths is not None:
+                    self.lastWidths = self.widths.frozen()
+        finally:
+            if glyph is not None:
+                glyph.endUndo()
+            if font is not None:
+                font.enableUpdateInterface()
+        if profiler is not None:
+            profiler.record("commit", time.perf_counter() - t0, len(self.points), len(path.nodes))
+            self.refreshTimings(force=True)
+        self.lastStrokeLayer = layer
+        self.lastStrokeParams = (self.simplifyEpsilon, self.strokeWidth)
+        self.points.clear()
+        self.lastPoint = None
+        self.engine = None
+        self.widths = None
+        view.setNeedsDisplay_(True)
 
-        # 4. Trim et Bézier
-        simplified_points = trim_ends(simplified_points, trim_length=self.strokeWidth * 0.05)
-        beziers = b_spline_to_bezier(simplified_points)
-        
-        if not beziers:
-            for pt in simplified_points:
-                path.nodes.append(GSNode(NSPoint(round(pt.x), round(pt.y)), type=GSLINE))
-            layer.paths.append(path)
-            self.points = []
-            self.lastPoint = None
+    # ----------------------------------------------------------
+    # Redessin pendant le tracé : une image au plus par rafraîchissement
+    # ----------------------------------------------------------
+    @objc.python_method
+    def scheduleRedraw(self):
+        redraw = self.redraw
+        if redraw.pending:
+            return
+        delay = redraw.delay(time.perf_counter())
+        if delay > 0:
+            redraw.pending = True
+            self.performSelector_withObject_afterDelay_("flushRedraw:", None, delay)
+        else:
+            self.flushRedraw_(None)
+
+    def flushRedraw_(self, sender):
+        if self.engine is None:
+            self.redraw.reset()
+            return
+        view = self.editViewController().graphicView()
+        # L'aperçu est calculé ici pour connaître les segments modifiés ;
+        # background le reprend tel quel s'il correspond encore au tracé
+        key = self.previewKey()
+        geometry = self.previewGeometry
+        if geometry is None or geometry[0] != key:
+            profiler = self.profiler
+            if profiler is not None:
+                t0 = time.perf_counter()
+            preview = self.engine.preview(self.simplifyEpsilon, self.strokeWidth)
+            if profiler is not None:
+                profiler.record("preview", time.perf_counter() - t0, len(self.points), len(preview[0]))
+            geometry = self.previewGeometry = (key, preview)
+        preview = geometry[1]
+        # Segments modifiés (coordonnées du calque), élargis de l'épaisseur du trait
+        # (et d'épaisseur, qui suit l'abscisse relative et change donc aussi
+        # pour des segments immobiles)
+        widths = self.previewSegmentWidths(key, preview[0], self.widths)
+        rects = self.redraw.flush(time.perf_counter(), preview[0], self.strokeWidth + DOT_RADIUS, widths)
+        if not rects:
+            return
+        try:
+            origin = view.activePosition()
+            scale = view.scale()
+        except AttributeError:
             view.setNeedsDisplay_(True)
             return
+        for x0, y0, x1, y1 in rects:
+            view.setNeedsDisplayInRect_(((origin.x + x0 * scale, origin.y + y0 * scale), ((x1 - x0) * scale, (y1 - y0) * scale)))
+
+    @objc.python_method
+    def fitPath(self, path, points):
+        # 1-5. Simplification, trim, Bézier et clamping sur le tracé complet
+        profiler = self.profiler
+        if profiler is not None:
+            t0 = time.perf_counter()
+        fitter = self.fitter()
+        simplified_points, beziers, _, _ = fit_stroke_clamped(points, self.simplifyEpsilon, self.strokeWidth, self.simplifier(), fitter)
+        if profiler is not None:
+            t1 = time.perf_counter()
+            profiler.record("fit", t1 - t0, len(points), len(beziers))
         
-        # 5. Correction du clampage des tangentes 
-        beziers, _, _ = apply_clamping(beziers)
-        
-        first = True
-        previous_c2 = None
-        
-        # 6. Construction des nœuds Glyphs avec alignement C1 symétrique
-        for i, (p0, c1, c2, p1) in enumerate(beziers):
-            p0_rounded = NSPoint(round(p0.x), round(p0.y))
-            p1_rounded = NSPoint(round(p1.x), round(p1.y))
-
-            if first:
-                path.nodes.append(GSNode(p0_rounded, type=GSLINE))
-                path.nodes[-1].smooth = True 
-                
-                path.nodes.append(GSNode(c1, type=GSOFFCURVE))
-                path.nodes.append(GSNode(c2, type=GSOFFCURVE))
-                path.nodes.append(GSNode(p1_rounded, type=GSCURVE))
-                path.nodes[-1].smooth = True
-                
-                previous_c2 = c2 
-                first = False
-            else:
-                c1_new = make_tangent_symmetric(p0_rounded, previous_c2) 
-                
-                path.nodes.append(GSNode(c1_new, type=GSOFFCURVE))
-                path.nodes.append(GSNode(c2, type=GSOFFCURVE))
-                path.nodes.append(GSNode(p1_rounded, type=GSCURVE))
-                path.nodes[-1].smooth = True
-                
-                previous_c2 = c2 
-        
-        # 7. Attributs de trait
+        # 6. Construction des nœuds Glyphs avec alignement C1 (symétrique pour la B-spline)
+        self.setNodes(path, stroke_nodes(simplified_points, beziers, fitter == BSPLINE))
+        if profiler is not None:
+            t2 = time.perf_counter()
+            profiler.record("nodes", t2 - t1, len(beziers), len(path.nodes))
+
+        # 7. Attributs de trait et images clés d'épaisseur ; le contour développé
+        # n'est calculé qu'au développement (strokeOutline)
+        if beziers:
+            try:
+                path.attributes["strokeWidth"] = self.strokeWidth
+                path.attributes["lineCapStart"] = 1
+                path.attributes["lineCapEnd"] = 1
+            except:
+                pass
+            self.setKeyframes(path, points)
+            if profiler is not None:
+                profiler.record("widths", time.perf_counter() - t2, len(points), len(path.userData[WIDTHS_KEY] or ()) // 2)
+        if profiler is not None:
+            self.refreshTimings(force=True)
+
+    @objc.python_method
+    def setNodes(self, path, nodes):
+        from GlyphsApp import GSNode, GSOFFCURVE, GSCURVE, GSLINE
+        from AppKit import NSPoint
+        # Nœuds construits hors du chemin puis affectés d'un bloc : une seule
+        # traversée du pont PyObjC et une seule notification de modification
+        node_types = {LINE: GSLINE, CURVE: GSCURVE, OFFCURVE: GSOFFCURVE}
+        gs_nodes = []
+        for position, node_type, smooth in nodes:
+            node = GSNode(NSPoint(position.x, position.y), type=node_types[node_type])
+            if smooth:
+                node.smooth = True
+            gs_nodes.append(node)
+        path.nodes = gs_nodes
+
+    @objc.python_method
+    def pathNodes(self, path):
+        # Nœuds du chemin au format de stroke_nodes [(Point, type, smooth)]
+        from GlyphsApp import GSOFFCURVE, GSCURVE
+        node_types = {GSCURVE: CURVE, GSOFFCURVE: OFFCURVE}
+        return [(Point(node.position.x, node.position.y), node_types.get(node.type, LINE), bool(node.smooth)) for node in path.nodes]
+
+    @objc.python_method
+    def setKeyframes(self, path, points):
+        # Images clés d'épaisseur du tracé, ou aucune (épaisseur constante)
+        keyframes = None
+        if Glyphs.defaults[VARIABLE_WIDTH_KEY]:
+            keyframes = encode_keyframes(stroke_keyframes(points, self.simplifyEpsilon, self.strokeWidth))
         try:
-            path.attributes["strokeWidth"] = self.strokeWidth
-            path.attributes["lineCapStart"] = 1
-            path.attributes["lineCapEnd"] = 1
-        except:
-            pass
-        layer.paths.append(path)
-        self.points = []
-        self.lastPoint = None
-        view.setNeedsDisplay_(True)
+            path.userData[WIDTHS_KEY] = keyframes
+        except Exception as e:
+            print("Width keyframes could not be stored:", e)
+
+    @objc.python_method
+    def pathKeyframes(self, path):
+        values = path.userData[WIDTHS_KEY]
+        if not values:
+            return None
+        try:
+            return decode_keyframes(values)
+        except Exception as e:
+            print("Width keyframes could not be read:", e)
+            return None
+
+    @objc.python_method
+    def strokeOutline(self, path, width):
+        # Nœuds du contour fermé, calculés à chaque développement : le chemin
+        # ouvert est remplacé aussitôt, un contour gardé dans ses userData ne
+        # serait jamais relu
+        nodes = [(position.x, position.y, node_type) for position, node_type, _ in self.pathNodes(path)]
+        return outline_nodes(expand_stroke(stroke_segments(nodes), width, keyframes=self.pathKeyframes(path)))
+
+    @objc.python_method
+    def simplifier(self):
+        return VISVALINGAM if Glyphs.defaults[SIMPLIFIER_KEY] == VISVALINGAM else RDP
+
+    @objc.python_method
+    def fitter(self):
+        return LEAST_SQUARES if Glyphs.defaults[FITTER_KEY] == LEAST_SQUARES else BSPLINE
+
+    @objc.python_method
+    def conditionalContextMenus(self):
+        # Les libellés proposent l'autre simplificateur / l'autre ajustement
+        if self.simplifier() == VISVALINGAM:
+            name = Glyphs.localize({'en': 'Simplify with Ramer–Douglas–Peucker','fr': 'Simplifier avec Ramer–Douglas–Peucker','de': 'Mit Ramer–Douglas–Peucker vereinfachen','es': 'Simplificar con Ramer–Douglas–Peucker','zh': '使用 Ramer–Douglas–Peucker 简化','ja': 'Ramer–Douglas–Peucker で単純化','pt': 'Simplificar com Ramer–Douglas–Peucker','it': 'Semplifica con Ramer–Douglas–Peucker','nl': 'Vereenvoudigen met Ramer–Douglas–Peucker','ko': 'Ramer–Douglas–Peucker로 단순화','ru': 'Упрощать методом Рамера–Дугласа–Пекера',})
+        else:
+            name = Glyphs.localize({'en': 'Simplify with Visvalingam–Whyatt','fr': 'Simplifier avec Visvalingam–Whyatt','de': 'Mit Visvalingam–Whyatt vereinfachen','es': 'Simplificar con Visvalingam–Whyatt','zh': '使用 Visvalingam–Whyatt 简化','ja': 'Visvalingam–Whyatt で単純化','pt': 'Simplificar com Visvalingam–Whyatt','it': 'Semplifica con Visvalingam–Whyatt','nl': 'Vereenvoudigen met Visvalingam–Whyatt','ko': 'Visvalingam–Whyatt로 단순화','ru': 'Упрощать методом Висвалингам–Уайетта',})
+        if self.fitter() == LEAST_SQUARES:
+            fitter_name = Glyphs.localize({'en': 'Fit Curves with B-spline','fr': 'Ajuster les courbes par B-spline','de': 'Kurven per B-Spline anpassen','es': 'Ajustar curvas con B-spline','zh': '使用 B 样条拟合曲线','ja': 'B スプラインで曲線をフィット','pt': 'Ajustar curvas com B-spline','it': 'Adatta le curve con B-spline','nl': 'Curves passen met B-spline','ko': 'B-스플라인으로 곡선 맞추기','ru': 'Строить кривые B-сплайном',})
+        else:
+            fitter_name = Glyphs.localize({'en': 'Fit Curves with Fewest Nodes (Least Squares)','fr': 'Ajuster les courbes avec le moins de nœuds (moindres carrés)','de': 'Kurven mit möglichst wenigen Punkten anpassen (kleinste Quadrate)','es': 'Ajustar curvas con el mínimo de nodos (mínimos cuadrados)','zh': '以最少节点拟合曲线（最小二乘）','ja': '最少のポイントで曲線をフィット（最小二乗法）','pt': 'Ajustar curvas com o mínimo de nós (mínimos quadrados)','it': 'Adatta le curve con meno nodi (minimi quadrati)','nl': 'Curves passen met zo min mogelijk punten (kleinste kwadraten)','ko': '최소 노드로 곡선 맞추기 (최소제곱)','ru': 'Строить кривые с минимумом узлов (наименьшие квадраты)',})
+        menus = [{"name": name, "action": self.toggleSimplifier_}, {"name": fitter_name, "action": self.toggleFitter_}]
+        if Glyphs.defaults[STREAMING_KEY]:
+            menus.append({"name": Glyphs.localize({'en': 'Keep All Samples While Drawing','fr': 'Garder tous les échantillons pendant le tracé','de': 'Beim Zeichnen alle Messpunkte behalten','es': 'Conservar todas las muestras al dibujar','zh': '绘制时保留所有采样点','ja': '描画中にすべてのサンプルを保持','pt': 'Manter todas as amostras ao desenhar','it': 'Conserva tutti i campioni durante il tracciamento','nl': 'Alle samples bewaren tijdens het tekenen','ko': '그리는 동안 모든 샘플 유지','ru': 'Сохранять все точки при рисовании',}), "action": self.toggleStreaming_})
+        else:
+            menus.append({"name": Glyphs.localize({'en': 'Decimate Samples While Drawing','fr': 'Décimer les échantillons pendant le tracé','de': 'Messpunkte beim Zeichnen ausdünnen','es': 'Reducir muestras al dibujar','zh': '绘制时精简采样点','ja': '描画中にサンプルを間引く','pt': 'Reduzir amostras ao desenhar','it': 'Sfoltisci i campioni durante il tracciamento','nl': 'Samples uitdunnen tijdens het tekenen','ko': '그리는 동안 샘플 줄이기','ru': 'Прореживать точки при рисовании',}), "action": self.toggleStreaming_})
+        if Glyphs.defaults[JOIN_KEY]:
+            menus.append({"name": Glyphs.localize({'en': 'Keep New Strokes Separate','fr': 'Garder les nouveaux tracés séparés','de': 'Neue Striche getrennt lassen','es': 'Mantener separados los trazos nuevos','zh': '新笔画保持独立','ja': '新しいストロークを分けたままにする','pt': 'Manter os novos traços separados','it': 'Mantieni separati i nuovi tratti','nl': 'Nieuwe streken apart houden','ko': '새 획을 따로 유지','ru': 'Не соединять новые штрихи',}), "action": self.toggleJoin_})
+        else:
+            menus.append({"name": Glyphs.localize({'en': 'Join New Strokes to Nearby Ends','fr': 'Raccorder les nouveaux tracés aux extrémités proches','de': 'Neue Striche an nahe Enden anschließen','es': 'Unir los trazos nuevos a extremos cercanos','zh': '将新笔画连接到附近端点','ja': '新しいストロークを近くの端点につなげる','pt': 'Unir os novos traços a extremidades próximas','it': 'Unisci i nuovi tratti alle estremità vicine','nl': 'Nieuwe streken aan nabije uiteinden koppelen','ko': '새 획을 가까운 끝점에 잇기','ru': 'Присоединять новые штрихи к близким концам',}), "action": self.toggleJoin_})
+        if Glyphs.defaults[VARIABLE_WIDTH_KEY]:
+            menus.append({"name": Glyphs.localize({'en': 'Keep Thickness Constant','fr': 'Garder une épaisseur constante','de': 'Konstante Dicke beibehalten','es': 'Mantener el grosor constante','zh': '保持粗细不变','ja': '太さを一定に保つ','pt': 'Manter a espessura constante','it': 'Mantieni lo spessore costante','nl': 'Dikte constant houden','ko': '두께를 일정하게 유지','ru': 'Постоянная толщина',}), "action": self.toggleVariableWidth_})
+        else:
+            menus.append({"name": Glyphs.localize({'en': 'Vary Thickness with Pressure or Speed','fr': 'Faire varier l’épaisseur selon la pression ou la vitesse','de': 'Dicke nach Druck oder Geschwindigkeit variieren','es': 'Variar el grosor según la presión o la velocidad','zh': '根据压力或速度改变粗细','ja': '筆圧または速度で太さを変える','pt': 'Variar a espessura com a pressão ou a velocidade','it': 'Varia lo spessore con la pressione o la velocità','nl': 'Dikte laten variëren met druk of snelheid','ko': '압력 또는 속도에 따라 두께 변경','ru': 'Менять толщину по нажиму или скорости',}), "action": self.toggleVariableWidth_})
+        if self.profiler is None:
+            menus.append({"name": Glyphs.localize({'en': 'Record Stage Timings','fr': 'Mesurer les temps par étape','de': 'Zeiten pro Schritt messen','es': 'Medir tiempos por etapa','zh': '记录各阶段耗时','ja': '段階ごとの時間を計測','pt': 'Medir tempos por etapa','it': 'Misura i tempi per fase','nl': 'Tijden per stap meten','ko': '단계별 시간 측정','ru': 'Замерять время этапов',}), "action": self.toggleProfiling_})
+        else:
+            menus.append({"name": Glyphs.localize({'en': 'Stop Recording Timings','fr': 'Arrêter la mesure des temps','de': 'Zeitmessung beenden','es': 'Detener la medición de tiempos','zh': '停止记录耗时','ja': '時間の計測を停止','pt': 'Parar de medir tempos','it': 'Interrompi la misura dei tempi','nl': 'Tijdmeting stoppen','ko': '시간 측정 중지','ru': 'Остановить замер времени',}), "action": self.toggleProfiling_})
+            menus.append({"name": Glyphs.localize({'en': 'Export Timings…','fr': 'Exporter les temps…','de': 'Zeiten exportieren…','es': 'Exportar tiempos…','zh': '导出耗时…','ja': '時間を書き出す…','pt': 'Exportar tempos…','it': 'Esporta i tempi…','nl': 'Tijden exporteren…','ko': '시간 내보내기…','ru': 'Экспортировать замеры…',}), "action": self.exportTimings_})
+        return menus
+
+    def toggleSimplifier_(self, sender):
+        Glyphs.defaults[SIMPLIFIER_KEY] = RDP if self.simplifier() == VISVALINGAM else VISVALINGAM
+        self.lastStroke = None
+
+    def toggleFitter_(self, sender):
+        Glyphs.defaults[FITTER_KEY] = BSPLINE if self.fitter() == LEAST_SQUARES else LEAST_SQUARES
+        self.lastStroke = None
+
+    def toggleStreaming_(self, sender):
+        Glyphs.defaults[STREAMING_KEY] = not Glyphs.defaults[STREAMING_KEY]
+
+    def toggleJoin_(self, sender):
+        Glyphs.defaults[JOIN_KEY] = not Glyphs.defaults[JOIN_KEY]
+        self.endpoints = None
+
+    def toggleVariableWidth_(self, sender):
+        Glyphs.defaults[VARIABLE_WIDTH_KEY] = not Glyphs.defaults[VARIABLE_WIDTH_KEY]
+        self.lastStroke = None
+
+    # ----------------------------------------------------------
+    # Mesure des étapes (menu contextuel, relevé dans la palette)
+    # ----------------------------------------------------------
+    def toggleProfiling_(self, sender):
+        self.setProfiling(self.profiler is None)
+
+    @objc.python_method
+    def setProfiling(self, enabled):
+        Glyphs.defaults[PROFILING_KEY] = bool(enabled)
+        if enabled and self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler.install()
+        elif not enabled and self.profiler is not None:
+            self.profiler.uninstall()
+            self.profiler = None
+        self.refreshTimings(force=True)
+
+    @objc.python_method
+    def refreshTimings(self, force=False):
+        palette = BallPenToolVariables.instance
+        if palette is None:
+            return
+        now = time.time()
+        if force or now - self.timingsShown >= TIMINGS_REFRESH:
+            self.timingsShown = now
+            palette.showTimings(self.profiler)
+
+    def exportTimings_(self, sender):
+        if self.profiler is None:
+            return
+        from GlyphsApp import GetSaveFile
+        path = GetSaveFile(message="Export BallPen timings", ProposedFileName="ballpen-timings.json", filetypes=["json"])
+        if path:
+            try:
+                self.profiler.export(path)
+            except Exception as e:
+                print("Timings export failed:", e)
+
+    # ----------------------------------------------------------
+    # Réajustement des tracés existants (menu contextuel)
+    # ----------------------------------------------------------
+    def refitSelectedStrokes_(self, sender):
+        layer = self.editViewController().graphicView().activeLayer()
+        if layer is None:
+            return
+        self.refitStrokes(layer.parent.parent, [(layer.parent, [layer])], selected_only=True)
+
+    def refitFontStrokes_(self, sender):
+        font = Glyphs.font
+        if font is None:
+            return
+        self.refitStrokes(font, [(glyph, glyph.layers) for glyph in font.glyphs], selected_only=False)
+
+    @objc.python_method
+    def refitStrokes(self, font, glyph_layers, selected_only):
+        # Un seul lot : interface mise à jour une fois à la fin, une étape
+        # d'annulation par glyphe (Glyphs tient un historique par glyphe)
+        count = 0
+        font.disableUpdateInterface()
+        try:
+            for glyph, layers in glyph_layers:
+                paths = [path for layer in layers for path in layer.paths if path.userData[STROKE_DATA_KEY] and (path.selected or not selected_only)]
+                if not paths:
+                    continue
+                glyph.beginUndo()
+                try:
+                    for path in paths:
+                        try:
+                            stroke = decode_user_data(path.userData[STROKE_DATA_KEY])
+                        except Exception as e:
+                            print("Stroke data could not be read:", e)
+                            continue
+                        self.fitPath(path, stroke.to_buffer())
+                        count += 1
+                finally:
+                    glyph.endUndo()
+        finally:
+            font.enableUpdateInterface()
+        # L'aperçu du dernier tracé ne correspond plus au chemin réajusté
+        self.lastStroke = None
+        return count
+
+    # ----------------------------------------------------------
+    # Raccord des nouveaux tracés aux extrémités proches
+    # ----------------------------------------------------------
+    @objc.python_method
+    def endpointIndex(self, layer):
+        # Grille construite au premier tracé sur le calque, puis tenue à jour ;
+        # reconstruite si des chemins ont été ajoutés ou supprimés autrement
+        index = self.endpoints
+        if index is None or index[0] != layer or index[2] != len(layer.paths):
+            grid = EndpointGrid()
+            for path in layer.paths:
+                self.indexEndpoints(grid, path)
+            self.endpoints = index = [layer, grid, len(layer.paths)]
+        return index[1]
+
+    @objc.python_method
+    def indexEndpoints(self, grid, path):
+        # Seuls les tracés Stylo bille ouverts peuvent être prolongés
+        if path.closed or len(path.nodes) < 2 or not path.userData[STROKE_DATA_KEY]:
+            return
+        first, last = path.nodes[0].position, path.nodes[-1].position
+        grid.add((path, START), first.x, first.y)
+        grid.add((path, END), last.x, last.y)
+
+    @objc.python_method
+    def joinStroke(self, layer, path, stroke, tolerance):
+        # Prolonge le chemin existant dont une extrémité est à moins de
+        # `tolerance` d'une extrémité du nouveau tracé ; False si aucun
+        grid = self.endpointIndex(layer)
+        width = self.strokeWidth
+
+        def accept(key):
+            other, end = key
+            try:
+                if other.closed or abs(float(other.attributes["strokeWidth"] or 0.0) - width) > 1e-6:
+                    return False
+                # Chemin modifié depuis son indexation : position mise à jour, candidat écarté
+                position = (other.nodes[0] if end == START else other.nodes[-1]).position
+            except (AttributeError, IndexError, TypeError):
+                return False
+            if grid.position(key) != (position.x, position.y):
+                grid.add(key, position.x, position.y)
+                return False
+            return True
+
+        nodes = self.pathNodes(path)
+        best = None
+        for new_end, (position, _, _) in ((START, nodes[0]), (END, nodes[-1])):
+            hit = grid.nearest(position.x, position.y, tolerance, accept)
+            if hit is not None and (best is None or hit[1] < best[1]):
+                best = (hit[0], hit[1], new_end)
+        if best is None:
+            return False
+        (other, other_end), _, new_end = best
+        try:
+            other_stroke = decode_user_data(other.userData[STROKE_DATA_KEY])
+        except Exception as e:
+            print("Stroke data could not be read:", e)
+            return False
+
+        # Le nouveau tracé est orienté pour commencer (ou finir) au raccord ;
+        # le chemin existant garde son sens et son extrémité
+        if other_end == END:
+            if new_end == END:
+                nodes, stroke = reverse_nodes(nodes), stroke.reversed()
+            merged = join_nodes(self.pathNodes(other), nodes, keep_head=True)
+            joined = other_stroke.joined(stroke)
+        else:
+            if new_end == START:
+                nodes, stroke = reverse_nodes(nodes), stroke.reversed()
+            merged = join_nodes(nodes, self.pathNodes(other), keep_head=False)
+            joined = stroke.joined(other_stroke)
+
+        grid.discard((other, START))
+        grid.discard((other, END))
+        self.setNodes(other, merged)
+        try:
+            other.userData[STROKE_DATA_KEY] = encode_user_data(joined)
+        except Exception as e:
+            print("Stroke data could not be stored:", e)
+        self.setKeyframes(other, joined.to_buffer())
+        self.indexEndpoints(grid, other)
+        return True
+
+    # ----------------------------------------------------------
+    # Contours développés (menu contextuel)
+    # ----------------------------------------------------------
+    def expandFontStrokes_(self, sender):
+        font = Glyphs.font
+        if font is None:
+            return
+        self.expandStrokes(font, [(glyph, glyph.layers) for glyph in font.glyphs])
+
+    @objc.python_method
+    def expandStrokes(self, font, glyph_layers):
+        # Chaque tracé Stylo bille est remplacé par son contour fermé, à la
+        # même place dans le calque ; même lot que refitStrokes
+        from GlyphsApp import GSPath
+        profiler = self.profiler
+        count = 0
+        font.disableUpdateInterface()
+        try:
+            for glyph, layers in glyph_layers:
+                strokes = [(layer, path) for layer in layers for path in layer.paths if path.userData[STROKE_DATA_KEY] and not path.closed]
+                if not strokes:
+                    continue
+                glyph.beginUndo()
+                try:
+                    for layer, path in strokes:
+                        width = path.attributes["strokeWidth"]
+                        if not width:
+                            continue
+                        if profiler is not None:
+                            t0 = time.perf_counter()
+                        outline = self.strokeOutline(path, float(width))
+                        if profiler is not None:
+                            profiler.record("outline", time.perf_counter() - t0, len(path.nodes), len(outline))
+                        if not outline:
+                            continue
+                        expanded = GSPath()
+                        self.setNodes(expanded, outline)
+                        expanded.closed = True
+                        layer.shapes[layer.shapes.index(path)] = expanded
+                        count += 1
+                finally:
+                    glyph.endUndo()
+        finally:
+            font.enableUpdateInterface()
+        if profiler is not None:
+            self.refreshTimings(force=True)
+        self.lastStroke = None
+        return count
+
+    @objc.python_method
+    def recordStroke(self, stroke):
+        folder = Glyphs.defaults[RECORD_FOLDER_KEY]
+        if not folder:
+            return
+        try:
+            name = "stroke-%.3f%s" % (self.points.times()[0], EXTENSION)
+            write_stroke(os.path.join(os.path.expanduser(folder), name), stroke)
+        except Exception as e:
+            print("Stroke recording failed:", e)
     
+    @objc.python_method
+    def previewKey(self):
+        # Version du tampon : change à chaque échantillon ajouté ou remplacé,
+        # jamais remise à zéro, donc propre à un état d'un tracé
+        return (self.points.version, self.simplifyEpsilon, self.strokeWidth)
+
     @objc.python_method
     def background(self, layer):
-        if len(self.points) < 2:
+        if len(self.points) < 2 or self.engine is None:
+            self.drawLastStroke(layer)
             return
 
-        # 1. Prétraitement des points (identique à mouseUp)
-        pre_simplified_points = simplify_ends(self.points, num_points_to_process=5, epsilon_ends=1.0)
-        simplified_points_bg = rdp_simplify(pre_simplified_points, self.simplifyEpsilon)
-        simplified_points_bg = cleanup_endpoints(simplified_points_bg, min_distance=5.0)
-        simplified_points_bg = trim_ends(simplified_points_bg, trim_length=self.strokeWidth * 0.05)
-        beziers = b_spline_to_bezier(simplified_points_bg)
-        
-        if not beziers:
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.frame()
+
+        # 1-2. Prétraitement incrémental et clamping (seule la queue du tracé est recalculée),
+        # seulement si le tracé ou les réglages ont changé depuis le dernier calcul
+        key = self.previewKey()
+        geometry = self.previewGeometry
+        if geometry is None or geometry[0] != key:
+            if profiler is not None:
+                t0 = time.perf_counter()
+            preview = self.engine.preview(self.simplifyEpsilon, self.strokeWidth)
+            if profiler is not None:
+                profiler.record("preview", time.perf_counter() - t0, len(self.points), len(preview[0]))
+            geometry = self.previewGeometry = (key, preview)
+        if profiler is not None:
+            t1 = time.perf_counter()
+        count = self.drawPreview(geometry, 0.5, self.widths)
+        if profiler is not None:
+            profiler.record("draw", time.perf_counter() - t1, count, count)
+            self.refreshTimings()
+
+    @objc.python_method
+    def drawLastStroke(self, layer):
+        # Aperçu du dernier tracé aux réglages courants de la palette, tant
+        # qu'ils diffèrent de ceux avec lesquels il a été validé
+        if self.lastStroke is None or layer != self.lastStrokeLayer:
+            return
+        if self.lastStrokeParams == (self.simplifyEpsilon, self.strokeWidth):
             return
+        # Le tracé lui-même sert de version : gardé dans la clé, il ne peut
+        # pas être confondu avec un suivant
+        key = (self.lastStroke, self.simplifyEpsilon, self.strokeWidth)
+        geometry = self.previewGeometry
+        if geometry is None or geometry[0] != key:
+            geometry = self.previewGeometry = (key, self.lastStroke.preview(self.simplifyEpsilon, self.strokeWidth))
+        self.drawPreview(geometry, 0.25, self.lastWidths)
 
-        # 2. Application du clamping (pour obtenir les points modifiés)
-        beziers_clamped, start_clamped_point, end_clamped_point = apply_clamping(beziers)
+    @objc.python_method
+    def drawPreview(self, geometry, alpha, widths=None):
+        # Chemins NSBezierPath construits une fois par état du tracé (même clé
+        # que la géométrie) ; les redessins sans nouvel échantillon (défilement,
+        # zoom, palette) ne font que les tracer. Renvoie le nombre de segments.
+        key, (beziers_clamped, start_clamped_point, end_clamped_point) = geometry
+        if not beziers_clamped:
+            return 0
+        from AppKit import NSColor
+        paths = self.previewPaths
+        if paths is None or paths[0] != key:
+            widths = self.previewSegmentWidths(key, beziers_clamped, widths)
+            paths = self.previewPaths = (key, self.buildPreview(beziers_clamped, start_clamped_point, end_clamped_point, widths))
+        strokes, dots = paths[1]
 
         # 3. Dessin du chemin temporaire
-        color = NSColor.blackColor().colorWithAlphaComponent_(0.5)
-        color.set()
-        bezier = NSBezierPath.bezierPath()
-        bezier.setLineWidth_(self.strokeWidth)
-        bezier.setLineCapStyle_(1)
-        
-        bezier.moveToPoint_(beziers_clamped[0][0])
-        for p0, c1, c2, p1 in beziers_clamped:
-            bezier.curveToPoint_controlPoint1_controlPoint2_(p1, c1, c2)
-        bezier.stroke()
-        
-        # 4. Affichage des repères visuels
-        dot_color = NSColor.redColor()
-        dot_color.set()
-        dot_radius = 4.0
+        NSColor.blackColor().colorWithAlphaComponent_(alpha).set()
+        for bezier in strokes:
+            bezier.stroke()
 
-        if start_clamped_point:
-            # Dessine un cercle rouge sur le point de contrôle de début modifié
-            dot_path = NSBezierPath.bezierPathWithOvalInRect_(((start_clamped_point.x - dot_radius), (start_clamped_point.y - dot_radius), dot_radius * 2, dot_radius * 2))
-            dot_path.fill()
-            
-        if end_clamped_point:
-            # Dessine un cercle rouge sur le point de contrôle de fin modifié
-            dot_path = NSBezierPath.bezierPathWithOvalInRect_(((end_clamped_point.x - dot_radius), (end_clamped_point.y - dot_radius), dot_radius * 2, dot_radius * 2))
+        # 4. Affichage des repères visuels
+        NSColor.redColor().set()
+        for dot_path in dots:
             dot_path.fill()
+        return len(beziers_clamped)
+
+    @objc.python_method
+    def previewSegmentWidths(self, key, beziers_clamped, widths):
+        # Épaisseur de chaque segment de l'aperçu, ou None si elle est
+        # constante ; calculée une fois par état, pour flushRedraw_ et le dessin
+        if widths is None:
+            return None
+        cached = self.previewWidths
+        if cached is None or cached[0] != key:
+            # Seuls les échantillons reçus depuis le dernier état sont traités
+            widths.update()
+            cached = self.previewWidths = (key, segment_widths(beziers_clamped, widths, self.strokeWidth, WIDTH_STEP))
+        return cached[1]
+
+    @objc.python_method
+    def buildPreview(self, beziers_clamped, start_clamped_point, end_clamped_point, widths):
+        # ([traits], [repères rouges du clamping])
+        from AppKit import NSBezierPath
+        if widths is None:
+            bezier = NSBezierPath.bezierPath()
+            bezier.setLineWidth_(self.strokeWidth)
+            bezier.setLineCapStyle_(1)
+
+            bezier.moveToPoint_(beziers_clamped[0][0])
+            for p0, c1, c2, p1 in beziers_clamped:
+                bezier.curveToPoint_controlPoint1_controlPoint2_(p1, c1, c2)
+            strokes = [bezier]
+        else:
+            strokes = self.variableWidthPaths(beziers_clamped, widths)
+
+        dot_radius = DOT_RADIUS
+        dots = []
+        for point in (start_clamped_point, end_clamped_point):
+            if point:
+                # Cercle rouge sur le point de contrôle de début / de fin modifié
+                dots.append(NSBezierPath.bezierPathWithOvalInRect_(((point.x - dot_radius), (point.y - dot_radius), dot_radius * 2, dot_radius * 2)))
+        return strokes, dots
+
+    @objc.python_method
+    def variableWidthPaths(self, beziers_clamped, widths):
+        # widths : épaisseur de chaque segment (segment_widths) ; les segments
+        # consécutifs de même épaisseur forment un seul chemin : quelques
+        # traits par image au lieu d'un par segment
+        from AppKit import NSBezierPath
+        runs = []
+        for seg, width in zip(beziers_clamped, widths):
+            if runs and runs[-1][0] == width:
+                runs[-1][1].append(seg)
+            else:
+                runs.append((width, [seg]))
+        strokes = []
+        for width, segments in runs:
+            bezier = NSBezierPath.bezierPath()
+            bezier.setLineWidth_(width)
+            bezier.setLineCapStyle_(1)
+            bezier.setLineJoinStyle_(1)
+            bezier.moveToPoint_(segments[0][0])
+            for p0, c1, c2, p1 in segments:
+                bezier.curveToPoint_controlPoint1_controlPoint2_(p1, c1, c2)
+            strokes.append(bezier)
+        return strokes
 
     @objc.python_method
     def __file__(self):
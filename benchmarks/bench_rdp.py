@@ -0,0 +1,115 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — benchmark RDP : version récursive d'origine / version itérative
+#
+#   python benchmarks/bench_rdp.py [--repeat N]
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import argparse, math, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+from ballpen.rdp import rdp_indices
+
+EPSILON = 2.0 * (1.25 ** 6)   # valeur par défaut du curseur de lissage
+SIZES = (1000, 10000, 100000)
+
+
+# ----------------------------------------------------------
+# Référence : rdp_simplify tel qu'il était dans plugin.py
+# ----------------------------------------------------------
+def distance_point_segment(p, a, b):
+    x, y = p
+    x1, y1 = a
+    x2, y2 = b
+    dx = x2 - x1
+    dy = y2 - y1
+    if dx == 0 and dy == 0:
+        return math.hypot(x - x1, y - y1)
+    t = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
+    t = max(0.0, min(1.0, t))
+    projx = x1 + t * dx
+    projy = y1 + t * dy
+    return math.hypot(x - projx, y - projy)
+
+def rdp_recursive(points, epsilon):
+    if len(points) < 3:
+        return points[:]
+    dmax = 0.0
+    index = 0
+    a = points[0]
+    b = points[-1]
+    for i in range(1, len(points) - 1):
+        d = distance_point_segment(points[i], a, b)
+        if d > dmax:
+            index = i
+            dmax = d
+    if dmax > epsilon:
+        left = rdp_recursive(points[: index + 1], epsilon)
+        right = rdp_recursive(points[index:], epsilon)
+        return left[:-1] + right
+    else:
+        return [points[0], points[-1]]
+
+
+# ----------------------------------------------------------
+# Traits de tablette enregistrés (générés de façon déterministe)
+# ----------------------------------------------------------
+def tablet_stroke(n, seed, kind):
+    rnd = random.Random(seed)
+    points = []
+    x, y, heading = 0.0, 0.0, 0.0
+    for i in range(n):
+        if kind == "calligraphic":
+            heading += 0.05 * math.sin(i / 37.0) + rnd.gauss(0.0, 0.02)
+        elif kind == "straight":
+            heading = 0.001 * math.sin(i / 500.0)
+        else:
+            heading += 0.15 * math.sin(i / 9.0)
+        x += 2.0 * math.cos(heading)
+        y += 2.0 * math.sin(heading)
+        points.append((x + rnd.gauss(0.0, 0.3), y + rnd.gauss(0.0, 0.3)))
+    return points
+
+def best_of(repeat, func, *args):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare l'ancien RDP récursif et rdp_indices.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("%-13s %7s %7s %14s %12s %10s %10s %5s" % ("stroke", "points", "kept", "recursive", "iterative", "rec. peak", "iter. peak", "same"))
+    for kind in ("calligraphic", "wiggly", "straight"):
+        for n in SIZES:
+            points = tablet_stroke(n, n, kind)
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            t_iter, indices = best_of(args.repeat, rdp_indices, xs, ys, EPSILON)
+            iter_peak = "%8.0fkB" % (peak_memory(rdp_indices, xs, ys, EPSILON) / 1024.0)
+            try:
+                t_rec, reference = best_of(args.repeat, rdp_recursive, points, EPSILON)
+                rec = "%12.2fms" % (t_rec * 1000.0)
+                rec_peak = "%8.0fkB" % (peak_memory(rdp_recursive, points, EPSILON) / 1024.0)
+                same = "yes" if reference == [points[i] for i in indices] else "NO"
+            except RecursionError:
+                rec, rec_peak, same = "RecursionError", "-", "-"
+            print("%-13s %7d %7d %14s %10.2fms %10s %10s %5s" % (kind, n, len(indices), rec, t_iter * 1000.0, rec_peak, iter_peak, same))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — benchmark des simplificateurs : RDP / Visvalingam-Whyatt
+#
+#   python benchmarks/bench_simplifiers.py [corpus...] [--repeat N]
+#
+# Pour chaque tracé (corpus enregistré, puis traits générés comme dans
+# bench_rdp.py) : temps de la simplification seule, points conservés, temps
+# de fit_stroke complet et nombre de nœuds que mouseUp_ ajouterait au calque.
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import argparse, os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+from ballpen import core
+from ballpen.buffer import StrokeBuffer
+from ballpen.strokefile import read_stroke, iter_stroke_files
+from bench_rdp import tablet_stroke, best_of, EPSILON
+from replay import DEFAULT_CORPUS
+
+SIMPLIFIERS = (core.RDP, core.VISVALINGAM)
+GENERATED = (("wiggly", 10000), ("calligraphic", 10000), ("straight", 10000))
+
+
+def compare(name, xs, ys, epsilon, width, repeat):
+    points = StrokeBuffer(len(xs))
+    for x, y in zip(xs, ys):
+        points.append(x, y)
+    pre = core.simplify_ends_indices(xs, ys, num_points_to_process=core.NUM_END_POINTS, epsilon_ends=1.0)
+    pre_xs = [xs[i] for i in pre]
+    pre_ys = [ys[i] for i in pre]
+    for simplifier in SIMPLIFIERS:
+        t_simplify, kept = best_of(repeat, core.simplify_indices, pre_xs, pre_ys, epsilon, simplifier)
+        t_fit, (simplified, beziers) = best_of(repeat, core.fit_stroke, points, epsilon, width, simplifier)
+        nodes = core.stroke_nodes(simplified, beziers)
+        print("%-32s %-12s %7d %7d %10.2fms %10.2fms %6d" % (name, simplifier, len(pre), len(kept), t_simplify * 1000.0, t_fit * 1000.0, len(nodes)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare RDP et Visvalingam-Whyatt (temps et nombre de nœuds).")
+    parser.add_argument("corpus", nargs="*", default=[DEFAULT_CORPUS], help="fichiers .bpstroke ou dossiers")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print("%-32s %-12s %7s %7s %12s %12s %6s" % ("stroke", "simplifier", "points", "kept", "simplify", "fit_stroke", "nodes"))
+    for entry in args.corpus:
+        for path in (iter_stroke_files(entry) if os.path.isdir(entry) else [entry]):
+            stroke = read_stroke(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+            compare(name, stroke.xs, stroke.ys, stroke.simplifyEpsilon, stroke.strokeWidth, args.repeat)
+    for kind, n in GENERATED:
+        points = tablet_stroke(n, n, kind)
+        compare("%s-%d" % (kind, n), [p[0] for p in points], [p[1] for p in points], EPSILON, 20.0, args.repeat)
+
+if __name__ == "__main__":
+    main()
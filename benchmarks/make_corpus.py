@@ -0,0 +1,91 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — génère le corpus de tracés de référence (benchmarks/strokes)
+#
+#   python benchmarks/make_corpus.py
+#
+# Les tracés sont synthétiques mais déterministes : relancer le script
+# redonne exactement les mêmes fichiers.
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math, os, random, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+from ballpen.strokefile import RecordedStroke, write_stroke, EXTENSION
+
+SAMPLE_RATE = 200.0     # Hz, tablette
+MIN_DISTANCE = 2.0      # même filtre que mouseDragged_ avec un stylet
+
+
+def capture(samples, rnd, jitter=0.0):
+    # Reproduit le filtrage de mouseDragged_ sur un flux d'échantillons (x, y, pression)
+    xs, ys, times, pressures = [], [], [], []
+    for i, (x, y, pressure) in enumerate(samples):
+        x += rnd.gauss(0.0, jitter) if jitter else 0.0
+        y += rnd.gauss(0.0, jitter) if jitter else 0.0
+        if xs and math.hypot(x - xs[-1], y - ys[-1]) < MIN_DISTANCE:
+            continue
+        xs.append(x)
+        ys.append(y)
+        times.append(i / SAMPLE_RATE)
+        pressures.append(pressure)
+    return xs, ys, times, pressures
+
+def pen_pressure(u):
+    # Attaque, plateau, relâchement
+    return max(0.05, min(1.0, 0.35 + 0.5 * math.sin(math.pi * u) + 0.05 * math.sin(40.0 * u)))
+
+def short(n=60):
+    return [(100 + 3.0 * i, 200 + 20.0 * math.sin(i / 8.0), pen_pressure(i / n)) for i in range(n)]
+
+def long_stroke(n=20000):
+    samples = []
+    for i in range(n):
+        u = i / n
+        samples.append((300 + 2500 * u + 400 * math.cos(30 * u), 400 + 500 * math.sin(21 * u), pen_pressure(u)))
+    return samples
+
+def handwriting(n=1500):
+    # Boucles cursives : le tracé se recoupe à chaque lettre
+    samples = []
+    for i in range(n):
+        t = i / 25.0
+        samples.append((50 + 6.0 * t + 35 * math.cos(t), 300 + 70 * math.sin(t) + 15 * math.sin(2.7 * t), pen_pressure(i / n)))
+    return samples
+
+def figure_eight(n=900):
+    samples = []
+    for i in range(n):
+        t = 2 * math.pi * i / n
+        samples.append((400 + 300 * math.sin(t), 350 + 200 * math.sin(2 * t), pen_pressure(i / n)))
+    return samples
+
+def straight(n=3000):
+    return [(1.5 * i, 500 + 0.002 * i, 0.6) for i in range(n)]
+
+CORPUS = [
+    ("short", short, 0.0, 20.0),
+    ("short-jittery", short, 1.5, 20.0),
+    ("long", long_stroke, 0.2, 20.0),
+    ("long-jittery", lambda: long_stroke(5000), 2.5, 40.0),
+    ("handwriting-self-intersecting", handwriting, 0.4, 12.0),
+    ("figure-eight-self-intersecting", figure_eight, 0.8, 30.0),
+    ("straight", straight, 0.1, 20.0),
+]
+
+def main():
+    out = os.path.join(HERE, "strokes")
+    if not os.path.isdir(out):
+        os.makedirs(out)
+    for name, generator, jitter, width in CORPUS:
+        rnd = random.Random(name)
+        xs, ys, times, pressures = capture(generator(), rnd, jitter)
+        stroke = RecordedStroke(xs, ys, times, pressures, width, 2.0 * (1.25 ** 6))
+        write_stroke(os.path.join(out, name + EXTENSION), stroke)
+        print("%-32s %6d points" % (name, len(xs)))
+
+if __name__ == "__main__":
+    main()
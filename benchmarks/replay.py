@@ -0,0 +1,284 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — rejoue les tracés enregistrés à travers chaque étape du pipeline
+#
+#   python benchmarks/replay.py [corpus...] [--backend python|numpy] [--fitter bspline|least_squares]
+#                               [--repeat N]
+#                               [--json results.json] [--compare baseline.json --tolerance 0.25]
+#
+# Pour chaque tracé et chaque étape : meilleur temps sur N répétitions, pic
+# mémoire alloué (tracemalloc) et nombre d'éléments en entrée / en sortie.
+# La ligne "preview" rejoue les mouseDragged_ un par un dans StrokeEngine,
+# comme autant d'appels à background. La ligne "smoothing_levels" parcourt tous
+# les crans du curseur Lissage sur le tracé terminé (StrokeLevels). La ligne
+# "expand_outline" développe le chemin en contour fermé (ballpen/outline.py) ;
+# "streaming_capture" décime les échantillons comme la capture en continu
+# (StreamingDecimator) : "out" est le nombre de points gardés en mémoire.
+# "width_keyframes" réduit pression / vitesse aux images clés d'épaisseur
+# (ballpen/width.py), "expand_variable" développe le contour avec elles.
+# "nodes_append" et "nodes_bulk" construisent le chemin comme l'ancien et le
+# nouveau setNodes, sur des GSPath / GSNode simulés : "out" est le nombre de
+# notifications de modification du chemin. Sans Glyphs, le coût du pont PyObjC
+# n'est pas compté.
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import argparse, json, os, sys, time, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+from ballpen import core
+from ballpen.buffer import StrokeBuffer
+from ballpen.decimate import StreamingDecimator, TOLERANCE_FACTOR, COMPACTION_FACTOR
+from ballpen.outline import stroke_segments, expand_stroke, outline_nodes
+from ballpen.strokefile import read_stroke, iter_stroke_files
+from ballpen.width import stroke_keyframes
+
+DEFAULT_CORPUS = os.path.join(HERE, "strokes")
+# Crans du curseur Lissage (IBdialog.xib) et epsilon correspondant (smoothingChanged_)
+SMOOTHING_EPSILONS = [2.0 * 1.25 ** smoothing for smoothing in range(2, 13)]
+
+
+# ----------------------------------------------------------
+# Étapes (même ordre que fit_stroke / mouseUp_)
+# ----------------------------------------------------------
+def capture(stroke):
+    buffer = StrokeBuffer(len(stroke))
+    for x, y in zip(stroke.xs, stroke.ys):
+        buffer.append(x, y)
+    return buffer
+
+def python_stages(stroke, fitter=core.BSPLINE):
+    points = capture(stroke)
+    epsilon, width = stroke.simplifyEpsilon, stroke.strokeWidth
+    stages = [
+        ("simplify_ends", lambda p: core.simplify_ends(p, num_points_to_process=core.NUM_END_POINTS, epsilon_ends=1.0)),
+        ("rdp_simplify", lambda p: core.rdp_simplify(p, epsilon)),
+        ("cleanup_endpoints", lambda p: core.cleanup_endpoints(p, min_distance=5.0)),
+        ("trim_ends", lambda p: core.trim_ends(p, trim_length=width * 0.05)),
+        ("b_spline_to_bezier", core.b_spline_to_bezier),
+    ]
+    if fitter == core.LEAST_SQUARES:
+        stages.append(("least_squares_to_bezier", lambda b: core.least_squares_to_bezier(b, epsilon * core.LEAST_SQUARES_TOLERANCE)))
+    stages.append(("apply_clamping", lambda b: core.apply_clamping(list(b))[0]))
+    return points, stages
+
+def numpy_stages(stroke, fitter=core.BSPLINE):
+    from ballpen import vectorized
+    points = vectorized.as_array(capture(stroke))
+    epsilon, width = stroke.simplifyEpsilon, stroke.strokeWidth
+    return points, [
+        ("simplify_ends", lambda p: vectorized.simplify_ends(p, num_points_to_process=core.NUM_END_POINTS, epsilon_ends=1.0)),
+        ("rdp_simplify", lambda p: vectorized.rdp_simplify(p, epsilon)),
+        ("cleanup_endpoints", lambda p: vectorized.cleanup_endpoints(p, min_distance=5.0)),
+        ("trim_ends", lambda p: vectorized.trim_ends(p, trim_length=width * 0.05)),
+        ("b_spline_to_bezier", vectorized.b_spline_to_bezier),
+        ("apply_clamping", lambda b: [tuple(core.Point(x, y) for x, y in seg) for seg in vectorized.apply_clamping(b)[0].tolist()]),
+    ]
+
+def measure(func, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(arg)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        func(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+def replay_preview(stroke, repeat):
+    best = worst = None
+    for _ in range(repeat):
+        engine = core.StrokeEngine(StrokeBuffer())
+        slowest = 0.0
+        t_start = time.perf_counter()
+        for x, y in zip(stroke.xs, stroke.ys):
+            engine.points.append(x, y)
+            t0 = time.perf_counter()
+            engine.preview(stroke.simplifyEpsilon, stroke.strokeWidth)
+            slowest = max(slowest, time.perf_counter() - t0)
+        elapsed = time.perf_counter() - t_start
+        if best is None or elapsed < best:
+            best, worst = elapsed, slowest
+    return best, worst
+
+def decimate(stroke):
+    decimator = StreamingDecimator(StrokeBuffer(), TOLERANCE_FACTOR * stroke.simplifyEpsilon, compaction=COMPACTION_FACTOR * stroke.simplifyEpsilon)
+    for x, y in zip(stroke.xs, stroke.ys):
+        decimator.append(x, y)
+    return decimator.points
+
+# ----------------------------------------------------------
+# GSPath / GSNode simulés (setNodes)
+# ----------------------------------------------------------
+class StubNode(object):
+    __slots__ = ("position", "type", "smooth")
+
+    def __init__(self, position, type):
+        self.position = position
+        self.type = type
+        self.smooth = False
+
+class StubNodesProxy(object):
+    # Comme GlyphsApp : un nouvel objet à chaque lecture de path.nodes
+    def __init__(self, path):
+        self._path = path
+
+    def __len__(self):
+        return len(self._path._nodes)
+
+    def __getitem__(self, index):
+        return self._path._nodes[index]
+
+    def append(self, node):
+        self._path._nodes.append(node)
+        self._path.changes += 1
+
+class StubPath(object):
+
+    def __init__(self):
+        self._nodes = []
+        self.changes = 0          # notifications de modification du chemin
+
+    @property
+    def nodes(self):
+        return StubNodesProxy(self)
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = list(nodes)
+        self.changes += 1
+
+def nodes_append(nodes):
+    # Ancien setNodes : un ajout au chemin (et une lecture de path.nodes) par nœud
+    path = StubPath()
+    for position, node_type, smooth in nodes:
+        path.nodes.append(StubNode((position.x, position.y), node_type))
+        if smooth:
+            path.nodes[-1].smooth = True
+    return path
+
+def nodes_bulk(nodes):
+    # setNodes actuel : liste construite hors du chemin, affectée d'un bloc
+    gs_nodes = []
+    for position, node_type, smooth in nodes:
+        node = StubNode((position.x, position.y), node_type)
+        if smooth:
+            node.smooth = True
+        gs_nodes.append(node)
+    path = StubPath()
+    path.nodes = gs_nodes
+    return path
+
+def scrub_levels(points, width):
+    levels = core.StrokeLevels(points)
+    for epsilon in SMOOTHING_EPSILONS:
+        levels.preview(epsilon, width)
+    return levels
+
+def replay(stroke, backend, repeat, fitter=core.BSPLINE):
+    data, stages = (numpy_stages if backend == "numpy" else python_stages)(stroke, fitter)
+    rows = []
+    for name, func in stages:
+        elapsed, peak, result = measure(func, data, repeat)
+        rows.append({"stage": name, "in": len(data), "out": len(result), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+        data = result
+    beziers = data
+    # Le nombre de nœuds est celui que mouseUp_ ajouterait au calque
+    elapsed, peak, nodes = measure(lambda b: core.stroke_nodes([], b, fitter == core.BSPLINE), beziers, repeat)
+    rows.append({"stage": "stroke_nodes", "in": len(beziers), "out": len(nodes), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    for name, func in (("nodes_append", nodes_append), ("nodes_bulk", nodes_bulk)):
+        elapsed, peak, path = measure(func, nodes, repeat)
+        rows.append({"stage": name, "in": len(nodes), "out": path.changes, "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    node_list = [(p.x, p.y, node_type) for p, node_type, _ in nodes]
+    elapsed, peak, outline = measure(lambda n: outline_nodes(expand_stroke(stroke_segments(n), stroke.strokeWidth)), node_list, repeat)
+    rows.append({"stage": "expand_outline", "in": len(nodes), "out": len(outline), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    elapsed, peak, keyframes = measure(lambda p: stroke_keyframes(p, stroke.simplifyEpsilon, stroke.strokeWidth), stroke.to_buffer(), repeat)
+    rows.append({"stage": "width_keyframes", "in": len(stroke), "out": len(keyframes), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    elapsed, peak, outline = measure(lambda n: outline_nodes(expand_stroke(stroke_segments(n), stroke.strokeWidth, keyframes=keyframes)), node_list, repeat)
+    rows.append({"stage": "expand_variable", "in": len(nodes), "out": len(outline), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    elapsed, peak, levels = measure(lambda p: scrub_levels(p, stroke.strokeWidth), capture(stroke), repeat)
+    rows.append({"stage": "smoothing_levels", "in": len(stroke), "out": len(levels), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    elapsed, peak, kept = measure(decimate, stroke, repeat)
+    rows.append({"stage": "streaming_capture", "in": len(stroke), "out": len(kept), "ms": elapsed * 1000.0, "peak_kb": peak / 1024.0})
+    total, worst = replay_preview(stroke, repeat)
+    rows.append({"stage": "preview", "in": len(stroke), "out": len(stroke), "ms": total * 1000.0, "peak_kb": 0.0, "worst_redraw_ms": worst * 1000.0})
+    return rows
+
+
+# ----------------------------------------------------------
+# Rapport et comparaison
+# ----------------------------------------------------------
+def print_rows(name, rows):
+    print(name)
+    for row in rows:
+        extra = "  worst redraw %.2fms" % row["worst_redraw_ms"] if "worst_redraw_ms" in row else ""
+        print("  %-24s %7d -> %-7d %10.3fms %9.1fkB%s" % (row["stage"], row["in"], row["out"], row["ms"], row["peak_kb"], extra))
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, rows in results.items():
+        if name not in baseline:
+            continue
+        old = dict((row["stage"], row) for row in baseline[name])
+        for row in rows:
+            before = old.get(row["stage"])
+            if before is None:
+                continue
+            if row["out"] != before["out"]:
+                regressions.append("%s / %s: output %d -> %d" % (name, row["stage"], before["out"], row["out"]))
+            # Les étapes trop rapides pour être mesurées de façon fiable sont ignorées
+            if before["ms"] > 0.05 and row["ms"] > before["ms"] * (1.0 + tolerance):
+                regressions.append("%s / %s: %.3fms -> %.3fms" % (name, row["stage"], before["ms"], row["ms"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejoue des tracés .bpstroke à travers le pipeline BallPen.")
+    parser.add_argument("corpus", nargs="*", default=[DEFAULT_CORPUS], help="fichiers .bpstroke ou dossiers")
+    parser.add_argument("--backend", choices=("python", "numpy"), default="python")
+    parser.add_argument("--fitter", choices=(core.BSPLINE, core.LEAST_SQUARES), default=core.BSPLINE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="enregistre les résultats dans ce fichier")
+    parser.add_argument("--compare", help="résultats de référence (--json d'une version précédente)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement toléré (0.25 = +25%%)")
+    args = parser.parse_args()
+    if args.backend == "numpy" and args.fitter != core.BSPLINE:
+        parser.error("--fitter %s n'existe qu'avec --backend python" % args.fitter)
+
+    files = []
+    for entry in args.corpus:
+        files.extend(iter_stroke_files(entry) if os.path.isdir(entry) else [entry])
+
+    results = {}
+    totals = {}
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        rows = replay(read_stroke(path), args.backend, args.repeat, args.fitter)
+        results[name] = rows
+        print_rows(name, rows)
+        for row in rows:
+            totals[row["stage"]] = totals.get(row["stage"], 0.0) + row["ms"]
+    print("total")
+    for stage, ms in totals.items():
+        print("  %-24s %29.3fms" % (stage, ms))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "fitter": args.fitter, "results": results}, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — tests du paquet ballpen (sans Glyphs)
+#
+#   python -m pytest -q
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import glob, os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+
+# Corpus de référence (benchmarks/make_corpus.py)
+CORPUS = sorted(glob.glob(os.path.join(HERE, "..", "benchmarks", "strokes", "*.bpstroke")))
+
+
+def pytest_generate_tests(metafunc):
+    # Tout test qui demande `corpus_path` est répété sur chaque tracé du corpus
+    if "corpus_path" in metafunc.fixturenames:
+        metafunc.parametrize("corpus_path", CORPUS, ids=[os.path.basename(path)[:-len(".bpstroke")] for path in CORPUS])
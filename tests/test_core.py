@@ -0,0 +1,55 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — ajustement des tracés (ballpen/core.py, ballpen/rdp.py)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import pytest
+
+from ballpen import core
+from ballpen.rdp import rdp_indices, rdp_importance
+from ballpen.strokefile import read_stroke
+
+TOLERANCE = 1e-9
+
+
+def _flatten(points):
+    return [c for p in points for c in p]
+
+def _same(a, b):
+    a, b = _flatten(a), _flatten(b)
+    return len(a) == len(b) and all(abs(x - y) <= TOLERANCE for x, y in zip(a, b))
+
+
+@pytest.mark.parametrize("fitter", [core.BSPLINE, core.LEAST_SQUARES])
+def test_vectorized_matches_python(corpus_path, fitter, monkeypatch):
+    pytest.importorskip("numpy")
+    stroke = read_stroke(corpus_path)
+    points = stroke.to_buffer()
+    # Les tracés courts passent aussi par NumPy
+    monkeypatch.setattr(core, "VECTORIZED_MIN_POINTS", 0)
+    fast = core.fit_stroke_clamped(points, stroke.simplifyEpsilon, stroke.strokeWidth, fitter=fitter)
+    monkeypatch.setattr(core, "vectorized_backend", lambda: None)
+    slow = core.fit_stroke_clamped(points, stroke.simplifyEpsilon, stroke.strokeWidth, fitter=fitter)
+    assert _same(fast[0], slow[0])
+    assert _same([c for seg in fast[1] for c in seg], [c for seg in slow[1] for c in seg])
+    for a, b in zip(fast[2:], slow[2:]):
+        assert (a is None) == (b is None)
+        if a is not None:
+            assert _same([a], [b])
+
+def test_importance_matches_rdp(corpus_path):
+    # Un seul calcul de niveaux donne RDP pour tout epsilon
+    levels = core.StrokeLevels(read_stroke(corpus_path).to_buffer())
+    xs, ys = levels.coordinates()
+    importance = rdp_importance(xs, ys)
+    for epsilon in (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 32.0):
+        assert [i for i, level in enumerate(importance) if level > epsilon] == rdp_indices(xs, ys, epsilon)
+
+def test_importance_degenerate():
+    assert rdp_importance([], []) == []
+    assert rdp_importance([1.0], [1.0])[0] == float("inf")
+    # Points confondus : seules les extrémités comptent
+    levels = rdp_importance([0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0])
+    assert [i for i, level in enumerate(levels) if level > 0.0] == rdp_indices([0.0] * 4, [0.0] * 4, 0.0) == [0, 3]
@@ -0,0 +1,115 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — index des extrémités et raccord des tracés (ballpen/endpoints.py)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math, random
+
+from ballpen.core import Point, LINE, CURVE, OFFCURVE, fit_stroke, stroke_nodes
+from ballpen.endpoints import EndpointGrid, START, END, reverse_nodes, join_nodes
+from ballpen.strokefile import read_stroke
+
+
+def _cross(o, a, b):
+    return (a.x - o.x) * (b.y - o.y) - (a.y - o.y) * (b.x - o.x)
+
+def _curve(p0, c1, c2, p1):
+    return [(p0, LINE, False), (c1, OFFCURVE, False), (c2, OFFCURVE, False), (p1, CURVE, False)]
+
+
+# ----------------------------------------------------------
+# EndpointGrid
+# ----------------------------------------------------------
+def test_grid_matches_brute_force():
+    rnd = random.Random(4)
+    grid = EndpointGrid(cell=10.0)
+    positions = {}
+    for k in range(300):
+        key = (k, rnd.choice((START, END)))
+        positions[key] = (rnd.uniform(-200, 200), rnd.uniform(-200, 200))
+        grid.add(key, *positions[key])
+    assert len(grid) == len(positions)
+    for _ in range(200):
+        x, y, radius = rnd.uniform(-220, 220), rnd.uniform(-220, 220), rnd.uniform(0, 40)
+        candidates = [(math.hypot(px - x, py - y), key) for key, (px, py) in positions.items()]
+        candidates = [c for c in candidates if c[0] <= radius]
+        found = grid.nearest(x, y, radius)
+        if not candidates:
+            assert found is None
+        else:
+            assert found[1] == min(candidates)[0]
+
+def test_grid_update():
+    grid = EndpointGrid()
+    grid.add("a", 0.0, 0.0)
+    grid.add("b", 100.0, 0.0)
+    assert grid.nearest(90.0, 0.0, 20.0) == ("b", 10.0)
+    # Une clé rajoutée est déplacée, pas dupliquée
+    grid.add("b", 1000.0, 0.0)
+    assert len(grid) == 2 and grid.position("b") == (1000.0, 0.0)
+    assert grid.nearest(90.0, 0.0, 20.0) is None
+    grid.discard("a")
+    grid.discard("a")
+    assert "a" not in grid and grid.position("a") is None
+    assert grid.nearest(0.0, 0.0, 50.0) is None
+    assert not grid._cells.get(grid._cell(0.0, 0.0))
+
+def test_grid_accept():
+    grid = EndpointGrid()
+    grid.add("near", 1.0, 0.0)
+    grid.add("far", 5.0, 0.0)
+    assert grid.nearest(0.0, 0.0, 10.0, accept=lambda key: key != "near") == ("far", 5.0)
+    assert grid.nearest(0.0, 0.0, 10.0, accept=lambda key: False) is None
+
+
+# ----------------------------------------------------------
+# Nœuds
+# ----------------------------------------------------------
+def test_reverse_twice(corpus_path):
+    stroke = read_stroke(corpus_path)
+    nodes = stroke_nodes(*fit_stroke(stroke.to_buffer(), stroke.simplifyEpsilon, stroke.strokeWidth))
+    reversed_nodes = reverse_nodes(nodes)
+    assert [n[0] for n in reversed_nodes] == [n[0] for n in reversed(nodes)]
+    assert reversed_nodes[0][1] == LINE
+    assert reverse_nodes(reversed_nodes) == nodes
+
+def test_join_curves():
+    head = _curve(Point(0, 0), Point(30, 0), Point(70, 20), Point(100, 20))
+    tail = _curve(Point(102, 21), Point(130, 50), Point(170, 50), Point(200, 0))
+    joined = join_nodes(head, tail)
+    assert len(joined) == len(head) + len(tail) - 1
+    anchor = joined[3]
+    assert anchor == (Point(100, 20), CURVE, True)
+    # Poignée du côté ajouté symétrique de celle du côté gardé
+    assert joined[4] == (Point(130, 20), OFFCURVE, False)
+    # Le reste du côté ajouté suit le déplacement du point raccordé
+    assert joined[5:] == tail[2:]
+    assert joined[:3] == head[:3]
+
+def test_join_keep_tail():
+    head = _curve(Point(0, 0), Point(30, 0), Point(70, 20), Point(98, 19))
+    tail = _curve(Point(100, 20), Point(130, 20), Point(170, 50), Point(200, 0))
+    joined = join_nodes(head, tail, keep_head=False)
+    assert joined[3] == (Point(100, 20), CURVE, True)
+    assert joined[2] == (Point(70, 20), OFFCURVE, False)
+    assert joined[4:] == tail[1:]
+    assert joined[:2] == head[:2]
+
+def test_join_line_to_curve():
+    # Segment droit du côté gardé : la poignée ajoutée le prolonge, sa longueur est conservée
+    head = [(Point(0, 0), LINE, False), (Point(100, 0), LINE, False)]
+    tail = _curve(Point(100, 0), Point(110, 30), Point(170, 50), Point(200, 0))
+    joined = join_nodes(head, tail)
+    anchor, handle = joined[1][0], joined[2][0]
+    assert joined[1][2]
+    assert abs(_cross(anchor, head[0][0], handle)) < 1e-9 and handle.x > anchor.x
+    assert abs(math.hypot(handle.x - anchor.x, handle.y - anchor.y) - math.hypot(10, 30)) < 1e-9
+
+def test_join_curve_to_line():
+    # Côté ajouté droit : le raccord reste anguleux, rien n'est aligné
+    head = _curve(Point(0, 0), Point(30, 0), Point(70, 20), Point(100, 20))
+    tail = [(Point(101, 20), LINE, False), (Point(200, 0), LINE, False)]
+    joined = join_nodes(head, tail)
+    assert joined == head[:-1] + [(Point(100, 20), CURVE, False), tail[1]]
@@ -0,0 +1,54 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — contour développé (ballpen/outline.py)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import math, random
+
+from ballpen import core
+from ballpen.outline import stroke_segments, expand_stroke
+from ballpen.strokefile import read_stroke
+from ballpen.width import stroke_keyframes
+
+
+def _segments(stroke):
+    simplified_points, beziers = core.fit_stroke(stroke.to_buffer(), stroke.simplifyEpsilon, stroke.strokeWidth)
+    return stroke_segments([(p.x, p.y, node_type) for p, node_type, _ in core.stroke_nodes(simplified_points, beziers)])
+
+def _gap(contour):
+    # Plus grand écart entre la fin d'un segment et le début du suivant
+    return max(math.hypot(a[-1][0] - b[0][0], a[-1][1] - b[0][1]) for a, b in zip(contour, contour[1:] + contour[:1]))
+
+def _random_keyframes(rnd):
+    inner = sorted((rnd.random(), rnd.uniform(0.3, 1.0)) for _ in range(rnd.randint(1, 8)))
+    return [(0.0, rnd.uniform(0.3, 1.0))] + inner + [(1.0, rnd.uniform(0.3, 1.0))]
+
+
+def test_closed_constant_width(corpus_path):
+    stroke = read_stroke(corpus_path)
+    contour = expand_stroke(_segments(stroke), stroke.strokeWidth)
+    assert contour
+    assert _gap(contour) == 0.0
+
+def test_closed_recorded_width(corpus_path):
+    stroke = read_stroke(corpus_path)
+    keyframes = stroke_keyframes(stroke.to_buffer(), stroke.simplifyEpsilon, stroke.strokeWidth)
+    contour = expand_stroke(_segments(stroke), stroke.strokeWidth, keyframes=keyframes)
+    assert _gap(contour) == 0.0
+
+def test_closed_variable_width(corpus_path):
+    # Jonctions et bouts entre deux épaisseurs très différentes
+    stroke = read_stroke(corpus_path)
+    segments = _segments(stroke)
+    rnd = random.Random(corpus_path)
+    for _ in range(10):
+        contour = expand_stroke(segments, stroke.strokeWidth, keyframes=_random_keyframes(rnd))
+        assert _gap(contour) == 0.0
+
+def test_closed_dot():
+    # Tracé plus court que la tolérance : un cercle
+    contour = expand_stroke([((0.0, 0.0), (0.05, 0.0), (0.1, 0.0), (0.15, 0.0))], 20.0)
+    assert len(contour) == 4
+    assert _gap(contour) < 1e-9
@@ -0,0 +1,98 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — fichiers .bpstroke et variante compacte (ballpen/strokefile.py)
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import pytest
+
+from ballpen.strokefile import (RecordedStroke, dumps, loads, dumps_packed, loads_packed,
+                                encode_user_data, decode_user_data, read_stroke,
+                                pack_deltas, unpack_deltas,
+                                COORDINATE_STEP, TIME_STEP, PRESSURE_STEP)
+
+
+def _columns(stroke):
+    return stroke.xs, stroke.ys, stroke.times, stroke.pressures
+
+def _close(a, b, step):
+    # Quantification au pas près (arrondi au plus proche)
+    return len(a) == len(b) and all(abs(x - y) <= step / 2 + 1e-9 for x, y in zip(a, b))
+
+
+def test_round_trip(corpus_path):
+    # Les colonnes sont déjà en float32 : l'aller-retour est exact
+    stroke = read_stroke(corpus_path)
+    again = loads(dumps(stroke))
+    assert _columns(again) == _columns(stroke)
+    assert (again.strokeWidth, again.simplifyEpsilon) == (stroke.strokeWidth, stroke.simplifyEpsilon)
+
+def test_packed_round_trip(corpus_path):
+    stroke = read_stroke(corpus_path)
+    again = decode_user_data(encode_user_data(stroke))
+    assert _close(again.xs, stroke.xs, COORDINATE_STEP)
+    assert _close(again.ys, stroke.ys, COORDINATE_STEP)
+    if stroke.times:
+        assert _close(again.times, stroke.times, TIME_STEP)
+    if stroke.pressures:
+        assert _close(again.pressures, stroke.pressures, PRESSURE_STEP)
+    assert (again.strokeWidth, again.simplifyEpsilon) == (stroke.strokeWidth, stroke.simplifyEpsilon)
+    # Un tracé déjà quantifié ne bouge plus
+    assert _columns(loads_packed(dumps_packed(again))) == _columns(again)
+
+def test_optional_columns():
+    stroke = RecordedStroke([0.0, 1.5, -2.25], [3.0, 2.0, 1.0])
+    for again in (loads(dumps(stroke)), loads_packed(dumps_packed(stroke))):
+        assert again.times is None and again.pressures is None
+        assert again.xs == stroke.xs and again.ys == stroke.ys
+
+
+# ----------------------------------------------------------
+# Écarts zigzag + varint
+# ----------------------------------------------------------
+@pytest.mark.parametrize("values", [
+    [],
+    [0, 0, 0],
+    [1, -1, 2, -2, 63, -64, 64, -65],
+    [2 ** 20, -2 ** 20, 2 ** 40, -2 ** 40, 0],
+    [-3, -300, -30000, -3000000],
+])
+def test_deltas_round_trip(values):
+    out = bytearray()
+    pack_deltas(values, 1, out)
+    again, offset = unpack_deltas(out, 0, len(values), 1)
+    assert again == values
+    assert offset == len(out)
+
+def test_deltas_encoding():
+    # Écarts 0, -1, +1, +64 : zigzag 0, 1, 2, 128 ; 128 tient sur deux octets
+    out = bytearray()
+    pack_deltas([0, -1, 0, 64], 1, out)
+    assert bytes(out) == b"\x00\x01\x02\x80\x01"
+
+def test_deltas_step():
+    values = [k * COORDINATE_STEP for k in (0, 5, -7, 12800)]
+    out = bytearray()
+    pack_deltas(values, COORDINATE_STEP, out)
+    assert unpack_deltas(out, 0, len(values), COORDINATE_STEP)[0] == values
+
+def test_deltas_offset():
+    # Lecture à partir d'un décalage, suivie d'une deuxième colonne
+    out = bytearray(b"head")
+    pack_deltas([5, 1000], 1, out)
+    pack_deltas([-5], 1, out)
+    first, offset = unpack_deltas(out, 4, 2, 1)
+    second, offset = unpack_deltas(out, offset, 1, 1)
+    assert (first, second, offset) == ([5, 1000], [-5], len(out))
+
+def test_truncated():
+    stroke = RecordedStroke([0.0, 100.0, 200.0], [0.0, 50.0, 0.0])
+    data = dumps(stroke)
+    with pytest.raises(ValueError):
+        loads(data[:-1])
+    packed = dumps_packed(stroke)
+    with pytest.raises(ValueError):
+        loads_packed(packed[:-1])
+    with pytest.raises(ValueError):
+        loads_packed(data)
@@ -0,0 +1,173 @@
+# encoding: utf-8
+###########################################################################################################
+#
+# BallPen Tool Plugin — conversion par lots des tracés enregistrés (.bpstroke) en chemins de glyphes
+#
+#   python tools/convert_strokes.py corpus... -o sortie [--format glif|glyphs] [--contours stroke|outline]
+#                                   [--simplifier rdp|visvalingam] [--fitter bspline|least_squares]
+#                                   [--width W] [--epsilon E] [--jobs N]
+#
+# Même pipeline que mouseUp_ (fit_stroke_clamped puis stroke_nodes), sans
+# Glyphs. Chaque tracé donne un fichier dans le dossier de sortie, à la même
+# place relative que dans le corpus :
+#
+#   glif    glyphe UFO (format 2) ; contour fermé développé par défaut, l'UFO
+#           n'ayant pas d'épaisseur de trait
+#   glyphs  chemin au format Glyphs 3 (.txt, à coller dans un calque) ; chemin
+#           ouvert avec strokeWidth et bouts ronds par défaut, comme mouseUp_
+#
+# Les tracés sont répartis sur les cœurs (multiprocessing) : chaque processus
+# lit, ajuste et écrit ses tracés lui-même, seul un résumé revient ; le corpus
+# n'est jamais chargé en entier.
+#
+###########################################################################################################
+from __future__ import division, print_function, unicode_literals
+import argparse, io, multiprocessing, os, sys, time
+from xml.sax.saxutils import quoteattr
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "BallPenTool.glyphsPlugin", "Contents", "Resources"))
+from ballpen import core
+from ballpen.outline import stroke_segments, expand_stroke, outline_nodes
+from ballpen.strokefile import read_stroke, iter_stroke_files, EXTENSION
+
+GLIF = "glif"
+GLYPHS = "glyphs"
+STROKE = "stroke"
+OUTLINE = "outline"
+EXTENSIONS = {GLIF: ".glif", GLYPHS: ".txt"}
+DEFAULT_CONTOURS = {GLIF: OUTLINE, GLYPHS: STROKE}
+CHUNKSIZE = 32           # tracés envoyés à la fois à un processus
+PROGRESS = 1000          # tracés entre deux lignes de progression
+
+
+# ----------------------------------------------------------
+# Ajustement (mouseUp_ / fitPath)
+# ----------------------------------------------------------
+def stroke_path(stroke, options):
+    # (nœuds [(Point, type, smooth)], fermé, épaisseur)
+    width = options.width if options.width is not None else stroke.strokeWidth
+    epsilon = options.epsilon if options.epsilon is not None else stroke.simplifyEpsilon
+    points = stroke.to_buffer()
+    simplified_points, beziers, _, _ = core.fit_stroke_clamped(points, epsilon, width, options.simplifier, options.fitter)
+    nodes = core.stroke_nodes(simplified_points, beziers, options.fitter == core.BSPLINE)
+    if options.contours == OUTLINE and beziers:
+        return outline_nodes(expand_stroke(stroke_segments([(p.x, p.y, node_type) for p, node_type, _ in nodes]), width)), True, width
+    # Sans segment, mouseUp_ ne pose pas d'épaisseur
+    return nodes, False, width if beziers else None
+
+
+# ----------------------------------------------------------
+# Écriture
+# ----------------------------------------------------------
+def _number(value):
+    text = "%.3f" % value
+    text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+def glif(name, nodes, closed, width=None):
+    types = {core.LINE: "line", core.CURVE: "curve"}
+    out = io.StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<glyph name=%s format="2">\n' % quoteattr(name))
+    out.write('  <outline>\n')
+    if nodes:
+        out.write('    <contour>\n')
+        for i, (position, node_type, smooth) in enumerate(nodes):
+            attributes = 'x="%s" y="%s"' % (_number(position.x), _number(position.y))
+            if node_type != core.OFFCURVE:
+                # Contour ouvert : le premier point est un « move »
+                attributes += ' type="%s"' % ("move" if i == 0 and not closed else types[node_type])
+                if smooth and (closed or i > 0):
+                    attributes += ' smooth="yes"'
+            out.write('      <point %s/>\n' % attributes)
+        out.write('    </contour>\n')
+    out.write('  </outline>\n')
+    if width is not None and not closed:
+        out.write('  <lib>\n    <dict>\n      <key>com.jbd.BallPen.strokeWidth</key>\n      <real>%s</real>\n    </dict>\n  </lib>\n' % _number(width))
+    out.write('</glyph>\n')
+    return out.getvalue()
+
+def glyphs_path(nodes, closed, width=None):
+    types = {core.LINE: "l", core.CURVE: "c", core.OFFCURVE: "o"}
+    out = io.StringIO()
+    out.write("(\n{\n")
+    if width is not None and not closed:
+        out.write("attr = {\nlineCapEnd = 1;\nlineCapStart = 1;\nstrokeWidth = %s;\n};\n" % _number(width))
+    out.write("closed = %d;\nnodes = (\n" % (1 if closed else 0))
+    for position, node_type, smooth in nodes:
+        out.write("(%s,%s,%s%s),\n" % (_number(position.x), _number(position.y), types[node_type], "s" if smooth else ""))
+    out.write(");\n}\n)\n")
+    return out.getvalue()
+
+
+# ----------------------------------------------------------
+# Un tracé (dans un processus du pool)
+# ----------------------------------------------------------
+def convert(task):
+    # (chemin du tracé, nombre de nœuds ou None, erreur ou None)
+    path, relative, options = task
+    try:
+        nodes, closed, width = stroke_path(read_stroke(path), options)
+        name = os.path.splitext(os.path.basename(relative))[0]
+        target = os.path.join(options.output, os.path.splitext(relative)[0] + EXTENSIONS[options.format])
+        folder = os.path.dirname(target)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        text = glif(name, nodes, closed, width) if options.format == GLIF else glyphs_path(nodes, closed, width)
+        with io.open(target, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path, len(nodes), None
+    except Exception as e:
+        return path, None, "%s: %s" % (type(e).__name__, e)
+
+def tasks(entries, options):
+    # Générateur : seuls les chemins des fichiers sont mis en file
+    for entry in entries:
+        if os.path.isdir(entry):
+            for path in iter_stroke_files(entry):
+                yield path, os.path.relpath(path, entry), options
+        else:
+            yield entry, os.path.basename(entry), options
+
+def main():
+    parser = argparse.ArgumentParser(description="Convertit des tracés enregistrés (.bpstroke) en glyphes UFO ou en chemins Glyphs.")
+    parser.add_argument("corpus", nargs="+", help="fichiers %s ou dossiers" % EXTENSION)
+    parser.add_argument("-o", "--output", required=True, help="dossier de sortie")
+    parser.add_argument("--format", choices=(GLIF, GLYPHS), default=GLIF)
+    parser.add_argument("--contours", choices=(STROKE, OUTLINE), default=None, help="chemin ouvert avec épaisseur, ou contour fermé développé")
+    parser.add_argument("--simplifier", choices=(core.RDP, core.VISVALINGAM), default=core.RDP)
+    parser.add_argument("--fitter", choices=(core.BSPLINE, core.LEAST_SQUARES), default=core.BSPLINE)
+    parser.add_argument("--width", type=float, default=None, help="épaisseur (par défaut celle de l'enregistrement)")
+    parser.add_argument("--epsilon", type=float, default=None, help="lissage (par défaut celui de l'enregistrement)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    if args.contours is None:
+        args.contours = DEFAULT_CONTOURS[args.format]
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    converted = failed = nodes = 0
+    started = time.perf_counter()
+    pool = multiprocessing.Pool(args.jobs) if args.jobs > 1 else None
+    try:
+        results = pool.imap_unordered(convert, tasks(args.corpus, args), CHUNKSIZE) if pool else map(convert, tasks(args.corpus, args))
+        for path, count, error in results:
+            if error is not None:
+                failed += 1
+                print("%s: %s" % (path, error), file=sys.stderr)
+                continue
+            converted += 1
+            nodes += count
+            if converted % PROGRESS == 0:
+                print("%d strokes, %.0f/s" % (converted, converted / (time.perf_counter() - started)))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - started
+    print("%d strokes converted, %d failed, %d nodes, %.2fs (%.0f strokes/s, %d jobs)" % (converted, failed, nodes, elapsed, converted / elapsed if elapsed > 0 else 0.0, args.jobs))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())